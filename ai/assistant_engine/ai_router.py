@@ -1,108 +1,216 @@
+import asyncio
 import os
-import requests
+from contextlib import aclosing
+from typing import AsyncIterator, List, Optional
 from ai.core_nlp.analyzer import detect_tone
-from ai.core_nlp.intent_classifier import classify_intent
+from ai.core_nlp.pipeline import MessageAnalysis, analyze_message
 from ai.assistant_engine.reply_generator import generate_local_reply
-from ai.memory.session_context import get_context, update_context
+from ai.memory.session_context import batched_updates_async, get_context_async, update_context
 from ai.memory.learning_memory import add_fact
-from client.privacy.privacy_guard import enforce_privacy
-from ai.rag.rag_search import search_documents
-from ai.llm_fallback import call_llm
-from ai.plugins.loader import plugin_manager, handle_with_plugin, load_plugin_mapping
-from interfaces.api_server.routes.admin import is_plugin_enabled_for_user
+from ai.fallback.rag_search import search_documents_async
+from interfaces.api_server.ai.llm_fallback import call_llm, stream_llm, LLM_EMPTY_REPLY, LLM_UNAVAILABLE_REPLY
+from ai.assistant_engine.response_cache import response_cache
+from ai.assistant_engine.cascade import CascadeResult, Tier, TierReply, run_cascade
+from ai.plugins.loader import get_plugin_route, handle_with_plugin_async
+from interfaces.api_server.routes.admin import is_plugin_enabled_for_user_async
 from interfaces.api_server.utils import log_fallback_source
+from interfaces.api_server.core.http_client import BackendClient
+from interfaces.api_server.core.tracing import annotate, record_span, span
 
 RASA_ENABLED = os.getenv("RASA_ENABLED", "false").lower() == "true"
 RASA_API_URL = os.getenv("RASA_API_URL", "http://localhost:5005")
+RASA_TIMEOUT = float(os.getenv("RASA_TIMEOUT", "5"))
+RASA_MAX_CONCURRENCY = int(os.getenv("RASA_MAX_CONCURRENCY", "32"))
+
+# Tiers whose winning replies are written to the response cache
+CACHED_TIERS = ("RAG", "LLM")
+
+rasa_backend = BackendClient("rasa", RASA_API_URL, timeout=RASA_TIMEOUT, max_concurrency=RASA_MAX_CONCURRENCY)
 
 async def route_message(message: str, sender_id: str, receiver_id: str) -> str:
     """
     Routes message using sender's context/memory/tone.
-    Executes plugin if mapped, otherwise routes via RASA → RAG → LLM → Plugins → Local fallback.
+    Executes plugin if mapped, otherwise routes via RASA → Cache → RAG → LLM → Plugins → Local fallback.
+    The RASA/Cache/RAG/LLM tiers run as a hedged cascade (see cascade.py): a slow tier gets
+    the next one started speculatively, but the reply is still chosen in that order.
     Logs which engine handled the reply.
     """
     try:
-        # 1. Enforce privacy
-        sanitized_msg = enforce_privacy(message)
-
-        # 2. Analyze sender's tone/intent
-        sender_tone = detect_tone(sanitized_msg)
-        sender_intent = classify_intent(sanitized_msg)
+        analysis = await _prepare(message, sender_id, receiver_id)
 
-        # 3. Update sender's session/memory
-        update_context(sender_id, "last_intent", sender_intent)
-        update_context(sender_id, "last_tone", sender_tone)
-        add_fact(sender_id, sanitized_msg)
+        # 5. Plugin mapping (preferred path)
+        reply = await _reply_from_plugin(analysis, sender_id)
+        if reply:
+            return reply
 
-        # 4. Optionally analyze receiver's tone for learning (not used in reply)
-        if receiver_id:
-            receiver_context = get_context(receiver_id)
-            receiver_tone = detect_tone(receiver_context.get("last_message", "")) if receiver_context.get("last_message") else None
+        # 6-9. RASA, response cache, RAG and LLM fallbacks
+        result = await run_cascade(_fallback_tiers(analysis, sender_id))
+        _trace_cascade(result)
+        if result.reply:
+            log_fallback_source(sender_id, result.source)
+            await _cache_winner(analysis, result)
+            return result.reply
 
-        # 5. Plugin mapping (preferred path)
-        plugin_map = load_plugin_mapping()
-        if sender_intent in plugin_map:
-            if is_plugin_enabled_for_user(sender_id, plugin_map[sender_intent]):
-                try:
-                    plugin_reply = handle_with_plugin(sender_intent, sanitized_msg, sender_id)
-                    if plugin_reply:
-                        log_fallback_source(sender_id, "PLUGIN")
-                        return plugin_reply
-                except Exception as e:
-                    print(f"[PLUGIN ERROR] {e}")
-
-        # 6. RASA fallback
-        use_rasa = RASA_ENABLED and sender_intent not in ["greeting", "chitchat", "out_of_scope"]
-        if use_rasa:
-            try:
-                reply = await query_rasa(sanitized_msg, sender_id)
-                if reply and not reply.startswith("⚠️"):
-                    log_fallback_source(sender_id, "RASA")
-                    return reply
-            except Exception as rasa_error:
-                print(f"[RASA ERROR] {rasa_error}")
-
-        # 7. RAG fallback
-        try:
-            rag_reply = search_documents(sanitized_msg)
-            if rag_reply:
-                log_fallback_source(sender_id, "RAG")
-                return rag_reply
-        except Exception as rag_error:
-            print(f"[RAG ERROR] {rag_error}")
-
-        # 8. LLM fallback
-        try:
-            llm_reply = call_llm(sanitized_msg)
-            if llm_reply:
-                log_fallback_source(sender_id, "LLM")
-                return llm_reply
-        except Exception as llm_error:
-            print(f"[LLM ERROR] {llm_error}")
-
-        # 9. Plugin fallback (legacy, if not mapped above)
-        for plugin in getattr(plugin_manager, "plugins", []):
-            try:
-                if plugin.should_handle(sender_intent) and is_plugin_enabled_for_user(sender_id, plugin.meta()["name"]):
-                    plugin_reply = plugin.run(sanitized_msg, sender_id)
-                    if plugin_reply:
-                        log_fallback_source(sender_id, "PLUGIN")
-                        return plugin_reply
-            except Exception as plugin_err:
-                print(f"[PLUGIN ERROR] {getattr(plugin.meta(), 'name', 'unknown')}: {plugin_err}")
-
-        # 10. Local fallback
-        log_fallback_source(sender_id, "LOCAL")
-        return generate_local_reply(sanitized_msg, sender_intent, sender_tone, sender_id)
+        # 10-11. Legacy plugins, local fallback
+        return await _reply_after_llm(analysis, sender_id)
 
     except Exception as err:
         print(f"[route_message ERROR] {err}")
         return "🤖 Sorry, an internal error occurred while processing your message."
 
+async def route_message_stream(message: str, sender_id: str, receiver_id: str) -> AsyncIterator[str]:
+    """
+    Same routing as route_message, but streams the LLM tier chunk by chunk.
+    Other tiers yield their whole reply at once; only the tiers before the LLM are hedged. Closing the generator (e.g. when the
+    client disconnects) closes the LLM stream and frees backend capacity.
+    """
+    try:
+        analysis = await _prepare(message, sender_id, receiver_id)
+        reply = await _reply_from_plugin(analysis, sender_id)
+        if not reply:
+            result = await run_cascade(_fallback_tiers(analysis, sender_id, include_llm=False))
+            _trace_cascade(result)
+            if result.reply:
+                log_fallback_source(sender_id, result.source)
+                await _cache_winner(analysis, result)
+                reply = result.reply
+        if reply:
+            yield reply
+            return
+    except Exception as err:
+        print(f"[route_message ERROR] {err}")
+        yield "🤖 Sorry, an internal error occurred while processing your message."
+        return
+
+    parts = []
+    try:
+        with span("llm"):
+            async with aclosing(stream_llm(analysis.sanitized_text)) as chunks:
+                async for chunk in chunks:
+                    if not parts:
+                        log_fallback_source(sender_id, "LLM")
+                    parts.append(chunk)
+                    yield chunk
+        if parts:
+            await asyncio.to_thread(response_cache.put, analysis.sanitized_text, "".join(parts), "LLM")
+    except Exception as llm_error:
+        print(f"[LLM ERROR] {llm_error}")
+    if not parts:
+        yield await _reply_after_llm(analysis, sender_id)
+
+async def _prepare(message: str, sender_id: str, receiver_id: str) -> MessageAnalysis:
+    # 1-2. Enforce privacy, analyze sender's tone/intent (single pass)
+    analysis = analyze_message(message)
+    sanitized_msg = analysis.sanitized_text
+    annotate(intent=analysis.intent, confidence=analysis.confidence)
+
+    # 3. Update sender's session/memory (one store round trip, off the event loop)
+    async with batched_updates_async():
+        update_context(sender_id, "last_intent", analysis.intent)
+        update_context(sender_id, "last_tone", analysis.tone)
+    add_fact(sender_id, sanitized_msg)
+
+    # 4. Optionally analyze receiver's tone for learning (not used in reply)
+    if receiver_id:
+        receiver_context = await get_context_async(receiver_id)
+        receiver_tone = detect_tone(receiver_context.get("last_message", "")) if receiver_context.get("last_message") else None
+
+    return analysis
+
+async def _reply_from_plugin(analysis: MessageAnalysis, sender_id: str) -> Optional[str]:
+    sanitized_msg = analysis.sanitized_text
+    sender_intent = analysis.intent
+
+    route = get_plugin_route(sender_intent)
+    if route is not None and route.handler is None:
+        if await is_plugin_enabled_for_user_async(sender_id, route.plugin_name):
+            try:
+                with span("plugin"):
+                    plugin_reply = await handle_with_plugin_async(sender_intent, sanitized_msg, sender_id)
+                if plugin_reply:
+                    log_fallback_source(sender_id, "PLUGIN")
+                    return plugin_reply
+            except Exception as e:
+                print(f"[PLUGIN ERROR] {e}")
+    return None
+
+def _fallback_tiers(analysis: MessageAnalysis, sender_id: str, include_llm: bool = True) -> List[Tier]:
+    """Cascade tiers in priority order. Each returns (reply, source label) or None."""
+    sanitized_msg = analysis.sanitized_text
+    tiers = []
+
+    # 6. RASA fallback
+    async def rasa() -> TierReply:
+        reply = await query_rasa(sanitized_msg, sender_id)
+        if reply and not reply.startswith("⚠️"):
+            return reply, "RASA"
+        return None
+
+    if RASA_ENABLED and analysis.intent not in ["greeting", "chitchat", "out_of_scope"]:
+        tiers.append(Tier("RASA", rasa))
+
+    # 7. Response cache (answers previously produced by RAG/LLM for the same or a similar message;
+    #    written by _cache_winner, never by a tier that may still lose the cascade)
+    async def cache() -> TierReply:
+        cached = await asyncio.to_thread(response_cache.get, sanitized_msg)
+        return (cached.reply, cached.source) if cached else None
+
+    tiers.append(Tier("CACHE", cache))
+
+    # 8. RAG fallback
+    async def rag() -> TierReply:
+        rag_reply = await search_documents_async(sanitized_msg)
+        return (rag_reply, "RAG") if rag_reply else None
+
+    tiers.append(Tier("RAG", rag))
+
+    # 9. LLM fallback
+    async def llm() -> TierReply:
+        llm_reply = await call_llm(sanitized_msg)
+        return (llm_reply, "LLM") if llm_reply else None
+
+    if include_llm:
+        tiers.append(Tier("LLM", llm))
+    return tiers
+
+async def _reply_after_llm(analysis: MessageAnalysis, sender_id: str) -> str:
+    sanitized_msg = analysis.sanitized_text
+    sender_intent = analysis.intent
+
+    # 10. Plugin fallback (installed plugins, from the same routing table)
+    route = get_plugin_route(sender_intent)
+    if route is not None and route.handler is not None:
+        try:
+            if await is_plugin_enabled_for_user_async(sender_id, route.plugin_name):
+                with span("plugin"):
+                    plugin_reply = route.handler.run(sanitized_msg, sender_id)
+                if plugin_reply:
+                    log_fallback_source(sender_id, "PLUGIN")
+                    return plugin_reply
+        except Exception as plugin_err:
+            print(f"[PLUGIN ERROR] {route.plugin_name}: {plugin_err}")
+
+    # 11. Local fallback
+    log_fallback_source(sender_id, "LOCAL")
+    with span("local"):
+        return generate_local_reply(sanitized_msg, sender_intent, analysis.tone, sender_id)
+
+async def _cache_winner(analysis: MessageAnalysis, result: CascadeResult):
+    # Only the reply the cascade picked is cached, so a hedged tier that answered but lost
+    # can't be served later from the CACHE tier (which ranks above RAG)
+    if result.winner not in CACHED_TIERS or result.reply in (LLM_EMPTY_REPLY, LLM_UNAVAILABLE_REPLY):
+        return
+    await asyncio.to_thread(response_cache.put, analysis.sanitized_text, result.reply, result.source)
+
+def _trace_cascade(result):
+    # Tiers overlap when hedged, so they're recorded from the cascade's own timings
+    for name, seconds in result.timings.items():
+        record_span(name.lower(), seconds, result.outcomes.get(name, "ok"))
+
 async def query_rasa(message: str, sender_id: str) -> str:
     payload = {"sender": sender_id, "message": message}
     try:
-        res = requests.post(f"{RASA_API_URL}/webhooks/rest/webhook", json=payload, timeout=5)
+        res = await rasa_backend.post("/webhooks/rest/webhook", json=payload)
         if res.status_code == 200:
             data = res.json()
             if data and isinstance(data, list) and "text" in data[0]:
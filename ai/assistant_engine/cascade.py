@@ -0,0 +1,154 @@
+"""
+cascade.py - Hedged fallback cascade for the router tiers
+
+Tiers are tried in priority order, but a lower-priority tier is started speculatively once
+the tiers before it have run for `hedge_delay` seconds without answering. The answer is
+still picked in priority order: a tier wins only when every tier before it has finished
+without a reply. Tiers that can no longer win are cancelled.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Seconds to wait before starting the next tier speculatively ("" or negative = strictly sequential)
+_hedge_env = os.getenv("CASCADE_HEDGE_DELAY", "1.0")
+CASCADE_HEDGE_DELAY: Optional[float] = float(_hedge_env) if _hedge_env and float(_hedge_env) >= 0 else None
+
+# A tier returns (reply, fallback source label) or None when it has no answer
+TierReply = Optional[Tuple[str, str]]
+
+class Tier:
+    __slots__ = ("name", "run")
+
+    def __init__(self, name: str, run: Callable[[], Awaitable[TierReply]]):
+        self.name = name
+        self.run = run
+
+class CascadeResult:
+    __slots__ = ("reply", "source", "winner", "timings", "outcomes")
+
+    def __init__(self):
+        self.reply: Optional[str] = None
+        self.source: Optional[str] = None
+        self.winner: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.outcomes: Dict[str, str] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"winner": self.winner, "source": self.source, "timings": dict(self.timings),
+                "outcomes": dict(self.outcomes)}
+
+# Aggregated per-tier counters since process start
+_cascade_stats: Dict[str, Dict[str, float]] = {}
+
+def _record(result: CascadeResult):
+    for name, outcome in result.outcomes.items():
+        tier_stats = _cascade_stats.setdefault(
+            name, {"wins": 0, "answered": 0, "empty": 0, "error": 0, "cancelled": 0, "not_started": 0,
+                   "seconds_total": 0.0})
+        tier_stats[outcome] += 1
+        tier_stats["seconds_total"] += result.timings.get(name, 0.0)
+    if result.winner:
+        _cascade_stats[result.winner]["wins"] += 1
+
+def cascade_stats() -> Dict[str, Dict[str, float]]:
+    return {name: dict(values) for name, values in _cascade_stats.items()}
+
+async def run_cascade(tiers: List[Tier], hedge_delay: Optional[float] = CASCADE_HEDGE_DELAY) -> CascadeResult:
+    """
+    Run tiers with hedging and return the highest-priority reply.
+    hedge_delay=None runs tiers strictly one after another; 0 starts them all at once.
+    """
+    result = CascadeResult()
+    tasks: List[Optional[asyncio.Task]] = [None] * len(tiers)
+    started: List[float] = [0.0] * len(tiers)
+    replies: List[TierReply] = [None] * len(tiers)
+    clock = time.perf_counter
+
+    async def timed(index: int) -> TierReply:
+        try:
+            return await tiers[index].run()
+        finally:
+            result.timings[tiers[index].name] = clock() - started[index]
+
+    def start(index: int):
+        started[index] = clock()
+        tasks[index] = asyncio.ensure_future(timed(index))
+
+    def collect(index: int):
+        task = tasks[index]
+        name = tiers[index].name
+        if name in result.outcomes:
+            return
+        if task.cancelled():
+            result.outcomes[name] = "cancelled"
+        elif task.exception() is not None:
+            print(f"[{name} ERROR] {task.exception()}")
+            result.outcomes[name] = "error"
+        else:
+            replies[index] = task.result()
+            result.outcomes[name] = "answered" if replies[index] else "empty"
+
+    next_index = 0
+    last_start = clock()
+    try:
+        if tiers:
+            start(0)
+            next_index = 1
+        while True:
+            for index, task in enumerate(tasks):
+                if task is not None and task.done():
+                    collect(index)
+
+            # Decide: the first tier, in priority order, that is unfinished or answered
+            decided = None
+            for index, task in enumerate(tasks):
+                if task is None or not task.done():
+                    break
+                if replies[index]:
+                    decided = index
+                    break
+            else:
+                return result  # every tier finished without an answer
+
+            if decided is not None:
+                result.reply, result.source = replies[decided]
+                result.winner = tiers[decided].name
+                return result
+
+            running = [t for t in tasks if t is not None and not t.done()]
+            can_start = next_index < len(tiers) and not any(replies)
+            # Nothing left running, or the last speculative tier already missed: go on now
+            if can_start and (not running or (hedge_delay is not None and tasks[next_index - 1].done())):
+                start(next_index)
+                next_index += 1
+                last_start = clock()
+                continue
+
+            timeout = None
+            if can_start and hedge_delay is not None:
+                timeout = max(0.0, hedge_delay - (clock() - last_start))
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done and can_start:
+                start(next_index)
+                next_index += 1
+                last_start = clock()
+    finally:
+        cancelled = []
+        for index, task in enumerate(tasks):
+            name = tiers[index].name
+            if task is None:
+                result.outcomes.setdefault(name, "not_started")
+            elif not task.done():
+                task.cancel()
+                cancelled.append(task)
+                result.outcomes.setdefault(name, "cancelled")
+                result.timings.setdefault(name, clock() - started[index])
+            else:
+                collect(index)
+        _record(result)
+        # Let the losers unwind (close their backend requests) before returning
+        if cancelled:
+            await asyncio.gather(*cancelled, return_exceptions=True)
@@ -1,33 +1,38 @@
 from ai.core_nlp.analyzer import analyze_tone_and_purpose
-from ai.core_nlp.intent_classifier import detect_intent
-from ai.memory.session_context import SessionContext
-from ai.memory.learning_memory import LearningMemory
+from ai.core_nlp.intent_classifier import classify_intent, get_intent_response
+from ai.memory.session_context import update_context
+from ai.memory.learning_memory import add_fact
 
 class ReplyGenerator:
-    def __init__(self):
-        self.session = SessionContext()
-        self.learner = LearningMemory()
-
     def generate(self, user_id: str, message: str) -> str:
         # Analyze message
         tone, purpose = analyze_tone_and_purpose(message)
-        intent = detect_intent(message)
+        intent = classify_intent(message)
 
         # Update memory context
-        self.session.update_context(user_id, message, intent, tone)
-        self.learner.learn_from_message(user_id, message)
+        update_context(user_id, "last_intent", intent)
+        update_context(user_id, "last_tone", tone)
+        add_fact(user_id, message)
+
+        return generate_local_reply(message, intent, tone, user_id)
 
-        # Generate reply based on intent
-        if intent == "greeting":
-            return "Hello! How can I assist you today?"
-        elif intent == "help_request":
-            return "Sure, I'm here to help. Please explain what you need."
-        elif intent == "farewell":
-            return "Goodbye! Feel free to reach out anytime."
-        elif intent == "emotion":
-            return f"I sense you're feeling {tone}. Want to talk about it?"
-        else:
-            return "I’m processing your message. Let me think..."
+def generate_local_reply(message: str, intent: str, tone: str, user_id: str) -> str:
+    """
+    Rule-based reply, used when no plugin or fallback engine answered.
+    """
+    # Generate reply based on intent
+    if intent == "greeting":
+        return "Hello! How can I assist you today?"
+    elif intent == "help_request":
+        return "Sure, I'm here to help. Please explain what you need."
+    elif intent == "farewell":
+        return "Goodbye! Feel free to reach out anytime."
+    elif intent == "emotion":
+        return f"I sense you're feeling {tone}. Want to talk about it?"
+    elif intent and intent != "unknown":
+        return get_intent_response(intent)
+    else:
+        return "I’m processing your message. Let me think..."
 
 # Example usage:
 # reply_gen = ReplyGenerator()
@@ -0,0 +1,229 @@
+"""
+response_cache.py - Semantic response cache in front of the RAG and LLM fallbacks
+
+Two tiers, both keyed on the sanitized message:
+- exact: normalized text → reply (in-process, optionally shared through Redis)
+- semantic: embedding cosine similarity ≥ threshold → reply of the most similar cached message
+
+Entries expire after a TTL and are evicted LRU-first once the entry or byte budget is
+exceeded. Counters are exposed through stats() for tuning the similarity threshold.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    from interfaces.api_server.session import redis_client
+    USE_REDIS = os.getenv("RESPONSE_CACHE_REDIS", "false").lower() == "true"
+except ImportError:
+    redis_client = None
+    USE_REDIS = False
+
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+REDIS_KEY_PREFIX = "cache:reply:"
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_cache_key(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+class CachedReply:
+    __slots__ = ("reply", "source", "expires_at", "slot", "size")
+
+    def __init__(self, reply: str, source: str, expires_at: float, slot: Optional[int], size: int):
+        self.reply = reply
+        self.source = source
+        self.expires_at = expires_at
+        self.slot = slot
+        self.size = size
+
+class ResponseCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 ttl: float = CACHE_TTL, similarity_threshold: float = CACHE_SIMILARITY_THRESHOLD,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 redis=None, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self.redis = redis
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedReply]" = OrderedDict()
+        self._bytes = 0
+        # Semantic tier: one row per cache slot, unit-normalized
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[str]] = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._recent_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._stats = {"hits_exact": 0, "hits_semantic": 0, "hits_redis": 0, "misses": 0,
+                       "evictions": 0, "expirations": 0, "embedding_errors": 0}
+
+    # --- embeddings ---
+    def _embed(self, key: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        # get()/put() run in worker threads; the model call itself stays outside the lock
+        with self._lock:
+            vector = self._recent_embeddings.get(key)
+        if vector is not None:
+            return vector
+        try:
+            vector = np.asarray(self.embed_fn(key), dtype=np.float32)
+        except Exception as e:
+            with self._lock:
+                self._stats["embedding_errors"] += 1
+            print(f"[CACHE EMBED ERROR] {e}")
+            return None
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector = vector / norm
+        with self._lock:
+            self._recent_embeddings[key] = vector
+            if len(self._recent_embeddings) > 64:
+                self._recent_embeddings.popitem(last=False)
+        return vector
+
+    # --- bookkeeping (caller holds the lock) ---
+    def _remove(self, key: str, counter: Optional[str] = None):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.slot is not None:
+            self._slot_keys[entry.slot] = None
+            self._free_slots.append(entry.slot)
+        if counter:
+            self._stats[counter] += 1
+
+    def _live(self, key: str, now: float) -> Optional[CachedReply]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._remove(key, "expirations")
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _semantic_lookup(self, vector: np.ndarray, now: float) -> Optional[CachedReply]:
+        if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+            return None
+        scores = self._matrix @ vector
+        for slot in np.argsort(scores)[::-1]:
+            if scores[slot] < self.similarity_threshold:
+                return None
+            key = self._slot_keys[slot]
+            if key is not None:
+                entry = self._live(key, now)
+                if entry is not None:
+                    return entry
+        return None
+
+    # --- public API ---
+    def get(self, text: str) -> Optional[CachedReply]:
+        """Return a cached reply for this (sanitized) message, or None."""
+        key = normalize_cache_key(text)
+        now = self._clock()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is not None:
+                self._stats["hits_exact"] += 1
+                return entry
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(REDIS_KEY_PREFIX + hashlib.sha1(key.encode()).hexdigest())
+                if raw:
+                    data = json.loads(raw)
+                    with self._lock:
+                        self._stats["hits_redis"] += 1
+                    return self._store(key, data["reply"], data["source"], None, now)
+            except Exception as e:
+                print(f"[CACHE REDIS ERROR] {e}")
+
+        vector = self._embed(key)
+        if vector is not None:
+            with self._lock:
+                entry = self._semantic_lookup(vector, now)
+                if entry is not None:
+                    self._stats["hits_semantic"] += 1
+                    return entry
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, text: str, reply: str, source: str):
+        """Cache a reply produced by a fallback tier (e.g. "RAG", "LLM")."""
+        key = normalize_cache_key(text)
+        now = self._clock()
+        vector = self._embed(key)
+        self._store(key, reply, source, vector, now)
+        if self.redis is not None:
+            try:
+                self.redis.setex(REDIS_KEY_PREFIX + hashlib.sha1(key.encode()).hexdigest(), int(self.ttl),
+                                 json.dumps({"reply": reply, "source": source}))
+            except Exception as e:
+                print(f"[CACHE REDIS ERROR] {e}")
+
+    def _store(self, key: str, reply: str, source: str, vector: Optional[np.ndarray],
+               now: float) -> Optional[CachedReply]:
+        size = len(reply.encode("utf-8")) + len(key)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (len(self._entries) >= self.max_entries or self._bytes + size > self.max_bytes):
+                self._remove(next(iter(self._entries)), "evictions")
+
+            slot = None
+            if vector is not None:
+                if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                    self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                slot = self._free_slots.pop()
+                self._matrix[slot] = vector
+                self._slot_keys[slot] = key
+            entry = CachedReply(reply, source, now + self.ttl, slot, size)
+            self._entries[key] = entry
+            self._bytes += size
+            return entry
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), bytes=self._bytes)
+        hits = stats["hits_exact"] + stats["hits_semantic"] + stats["hits_redis"]
+        lookups = hits + stats["misses"]
+        stats.update({
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl,
+        })
+        return stats
+
+def _embed_with_retriever(text: str) -> List[float]:
+    # Reuse the RAG embedding model instead of loading a second copy
+    from ai.fallback.rag_search import retriever
+    return retriever.embeddings.embed_query(text)
+
+# Process-wide cache used by the router
+response_cache = ResponseCache(
+    embed_fn=_embed_with_retriever if os.getenv("RESPONSE_CACHE_SEMANTIC", "true").lower() == "true" else None,
+    redis=redis_client if USE_REDIS else None,
+)
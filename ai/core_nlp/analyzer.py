@@ -1,13 +1,15 @@
 import random
 import json
 import os
+import time
 from textblob import TextBlob
-from typing import Tuple
+from typing import Dict, Tuple
+from ai.core_nlp.keyword_matcher import KeywordMatcher
 
 TONE_PATH = os.path.join("data", "tone_rules.json")
 
-with open(TONE_PATH, "r") as f:
-    tone_data = json.load(f)["tones"]
+# Seconds between checks of tone_rules.json for changes
+TONE_RELOAD_INTERVAL = float(os.getenv("TONE_RELOAD_INTERVAL", "2"))
 
 EMOTION_KEYWORDS = {
     "happy": ["yay", "awesome", "great", "glad"],
@@ -16,13 +18,54 @@ EMOTION_KEYWORDS = {
     "curious": ["wonder", "curious", "question"]
 }
 
+def load_tone_rules(path: str = TONE_PATH) -> dict:
+    with open(path, "r") as f:
+        return json.load(f)["tones"]
+
+def build_keyword_matcher(tones: dict) -> KeywordMatcher:
+    """Compile tone and emotion keywords into one matcher (file order = priority)."""
+    return KeywordMatcher({
+        "tone": {tone: rules["keywords"] for tone, rules in tones.items()},
+        "emotion": EMOTION_KEYWORDS,
+    })
+
+tone_data = load_tone_rules()
+_keyword_matcher = build_keyword_matcher(tone_data)
+_tone_rules_mtime = os.path.getmtime(TONE_PATH)
+_last_reload_check = time.monotonic()
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """
+    Return the compiled tone/emotion matcher, recompiling it when tone_rules.json
+    has changed on disk. A broken file keeps the previous rules in service.
+    """
+    global tone_data, _keyword_matcher, _tone_rules_mtime, _last_reload_check
+    now = time.monotonic()
+    if now - _last_reload_check >= TONE_RELOAD_INTERVAL:
+        _last_reload_check = now
+        try:
+            mtime = os.path.getmtime(TONE_PATH)
+            if mtime != _tone_rules_mtime:
+                tones = load_tone_rules(TONE_PATH)
+                tone_data, _keyword_matcher, _tone_rules_mtime = tones, build_keyword_matcher(tones), mtime
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            print(f"[TONE RELOAD ERROR] {e}")
+    return _keyword_matcher
+
 def detect_tone(message: str) -> str:
-    message_lower = message.lower()
-    for tone, rules in tone_data.items():
-        for keyword in rules["keywords"]:
-            if keyword in message_lower:
-                return tone
-    return "neutral"
+    return get_keyword_matcher().first_match(message.lower()).get("tone", "neutral")
+
+def detect_tone_and_emotion(message: str) -> Tuple[str, str]:
+    """Detect keyword tone and emotion in a single pass. Returns (tone, emotion)."""
+    found = get_keyword_matcher().first_match(message.lower())
+    return found.get("tone", "neutral"), found.get("emotion", "neutral")
+
+def keyword_hits(message: str) -> Dict[str, Dict[str, int]]:
+    """
+    Every tone and emotion keyword hit with counts.
+    Example: {"tone": {"positive": 2}, "emotion": {"happy": 1}}
+    """
+    return get_keyword_matcher().hits(message.lower())
 
 def analyze_tone(message: str) -> str:
     """Detect tone using TextBlob polarity."""
@@ -36,15 +79,14 @@ def analyze_tone(message: str) -> str:
 
 def detect_emotion(message: str) -> str:
     """Detect emotion based on keywords."""
-    msg = message.lower()
-    for emotion, words in EMOTION_KEYWORDS.items():
-        if any(w in msg for w in words):
-            return emotion
-    return "neutral"
+    return get_keyword_matcher().first_match(message.lower()).get("emotion", "neutral")
 
 def detect_purpose(message: str) -> str:
     """Detect the purpose of a message (question, support, request, statement)."""
-    msg = message.lower()
+    return classify_purpose(message.lower())
+
+def classify_purpose(msg: str) -> str:
+    """detect_purpose for an already-lowercased message."""
     if "?" in msg:
         return "question"
     elif any(w in msg for w in ["help", "issue", "support"]):
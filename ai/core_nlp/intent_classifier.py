@@ -1,10 +1,16 @@
 import json
 import random
-from difflib import get_close_matches
-from typing import List, Dict
+from collections import Counter
+from functools import lru_cache
+from difflib import SequenceMatcher, get_close_matches
+import numpy as np
+from typing import List, Dict, Optional, Tuple
 
 INTENTS_PATH = "data/intents.json"
 
+MATCH_CUTOFF = 0.7
+CLASSIFY_CACHE_SIZE = 4096
+
 def load_intents(path: str = INTENTS_PATH) -> List[Dict]:
     """Load intent patterns and responses from a JSON file."""
     try:
@@ -13,17 +19,133 @@ def load_intents(path: str = INTENTS_PATH) -> List[Dict]:
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
+def normalize_message(message: str) -> str:
+    """Normalize a message the same way patterns are normalized."""
+    return message.strip().lower()
+
+class IntentIndex:
+    """
+    Precomputed classifier over all intent patterns, built once at load.
+
+    Patterns are lowercased once and stored as a character-count matrix. For a query,
+    the two cheap upper bounds difflib.get_close_matches checks per pattern
+    (real_quick_ratio and quick_ratio) are computed for every pattern in one NumPy pass,
+    and the full SequenceMatcher ratio only runs on the survivors, in intent order.
+    The result is the same intent the difflib scan returns; the winning intent's best
+    ratio is returned as the confidence. Results for repeated messages are memoized.
+    """
+
+    def __init__(self, intents: List[Dict], cutoff: float = MATCH_CUTOFF,
+                 cache_size: int = CLASSIFY_CACHE_SIZE):
+        self.cutoff = cutoff
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+        self._intent_tags = [intent.get("tag", "unknown") for intent in intents]
+        self._patterns: List[str] = []
+        orders: List[int] = []
+        for order, intent in enumerate(intents):
+            for pattern in intent.get("patterns", []):
+                self._patterns.append(pattern.lower())
+                orders.append(order)
+
+        alphabet = sorted({ch for pattern in self._patterns for ch in pattern})
+        self._columns = {ch: i for i, ch in enumerate(alphabet)}
+        self._orders = np.array(orders, dtype=np.int64)
+        self._lengths = np.array([len(p) for p in self._patterns], dtype=np.float64)
+        self._char_counts = np.zeros((len(self._patterns), len(alphabet)), dtype=np.uint16)
+        for pattern_id, pattern in enumerate(self._patterns):
+            for ch, count in Counter(pattern).items():
+                self._char_counts[pattern_id, self._columns[ch]] = count
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def _candidates(self, msg: str) -> np.ndarray:
+        """Pattern ids (in intent order) whose ratio upper bounds reach the cutoff."""
+        query = Counter(msg)
+        columns = [self._columns[ch] for ch in query if ch in self._columns]
+        totals = self._lengths + len(msg)
+        if columns:
+            counts = np.array([query[ch] for ch in query if ch in self._columns], dtype=np.uint16)
+            matches = np.minimum(self._char_counts[:, columns], counts).sum(axis=1)
+        else:
+            matches = np.zeros(len(self._patterns))
+        # difflib treats two empty strings as a perfect match
+        with np.errstate(divide="ignore", invalid="ignore"):
+            real_quick = np.where(totals > 0, 2.0 * np.minimum(self._lengths, len(msg)) / totals, 1.0)
+            quick = np.where(totals > 0, 2.0 * matches / totals, 1.0)
+        return np.flatnonzero((real_quick >= self.cutoff) & (quick >= self.cutoff))
+
+    def _classify(self, msg: str) -> Tuple[str, float]:
+        """
+        Classify an already-normalized message.
+        Returns (intent tag, confidence) or ('unknown', 0.0).
+        """
+        if not self._patterns:
+            return "unknown", 0.0
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(msg)
+        best_order: Optional[int] = None
+        best_ratio = 0.0
+        for pattern_id in self._candidates(msg):
+            order = int(self._orders[pattern_id])
+            if best_order is not None and order != best_order:
+                break
+            matcher.set_seq1(self._patterns[pattern_id])
+            ratio = matcher.ratio()
+            if ratio >= self.cutoff and ratio > best_ratio:
+                best_order, best_ratio = order, ratio
+
+        if best_order is None:
+            return "unknown", 0.0
+        return self._intent_tags[best_order], best_ratio
+
 intent_db = load_intents()
+intent_index = IntentIndex(intent_db)
+
+def reload_intents(path: str = INTENTS_PATH):
+    """Reload intents from disk and rebuild the classifier index."""
+    global intent_db, intent_index
+    intents = load_intents(path)
+    index = IntentIndex(intents)
+    intent_db, intent_index = intents, index
+
+def classify_intent_with_confidence(message: str) -> Tuple[str, float]:
+    """
+    Classify the intent of a message.
+    Returns (intent tag, confidence) or ('unknown', 0.0).
+    """
+    return intent_index.classify(normalize_message(message))
 
 def classify_intent(message: str) -> str:
     """
     Classify the intent of a message using pattern matching.
     Returns the intent tag or 'unknown'.
     """
+    return classify_intent_with_confidence(message)[0]
+
+def classify_intents(messages: List[str]) -> List[Tuple[str, float]]:
+    """
+    Classify a batch of messages. Duplicate messages are classified once.
+    Returns a list of (intent tag, confidence) in input order.
+    """
+    index = intent_index
+    results: Dict[str, Tuple[str, float]] = {}
+    normalized = [normalize_message(m) for m in messages]
+    for msg in normalized:
+        if msg not in results:
+            results[msg] = index.classify(msg)
+    return [results[msg] for msg in normalized]
+
+def classify_intent_difflib(message: str, intents: Optional[List[Dict]] = None) -> str:
+    """
+    Reference implementation: linear difflib scan over every pattern of every intent.
+    Kept for parity checks and benchmarks.
+    """
     msg = message.strip().lower()
-    for intent in intent_db:
+    for intent in intents if intents is not None else intent_db:
         patterns = [p.lower() for p in intent.get("patterns", [])]
-        if get_close_matches(msg, patterns, cutoff=0.7):
+        if get_close_matches(msg, patterns, cutoff=MATCH_CUTOFF):
             return intent.get("tag", "unknown")
     return "unknown"
 
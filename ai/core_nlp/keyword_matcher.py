@@ -0,0 +1,66 @@
+"""
+keyword_matcher.py - Single-pass multi-keyword matcher
+
+Compiles labelled keyword sets (e.g. tones and emotions) into one regex and finds every
+keyword occurrence with a single scan of the message, with the same substring semantics
+as `keyword in message`.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+class KeywordMatcher:
+    """
+    Matches keywords from several categories in one pass.
+
+    :param categories: {category: {label: [keywords]}}. Labels keep their insertion
+        order, which is the priority used by first_match (first label with a hit wins).
+    """
+
+    def __init__(self, categories: Dict[str, Dict[str, Iterable[str]]]):
+        self.categories = list(categories)
+        # keyword -> [(category, priority, label)]
+        self._targets: Dict[str, List[Tuple[str, int, str]]] = {}
+        for category, labels in categories.items():
+            for priority, (label, keywords) in enumerate(labels.items()):
+                for keyword in keywords:
+                    keyword = keyword.lower()
+                    if keyword:
+                        self._targets.setdefault(keyword, []).append((category, priority, label))
+
+        keywords = sorted(self._targets, key=len, reverse=True)
+        # The lookahead tries every position and reports the longest keyword starting
+        # there; shorter keywords that are prefixes of it start at the same position.
+        self._prefixes = {kw: [other for other in keywords if other != kw and kw.startswith(other)] for kw in keywords}
+        alternation = "|".join(re.escape(kw) for kw in keywords) or "(?!)"
+        self._pattern = re.compile(f"(?=({alternation}))")
+
+    def keyword_counts(self, text: str) -> Counter:
+        """Count occurrences of every keyword in already-lowercased text."""
+        counts = Counter()
+        for match in self._pattern.finditer(text):
+            keyword = match.group(1)
+            counts[keyword] += 1
+            for prefix in self._prefixes[keyword]:
+                counts[prefix] += 1
+        return counts
+
+    def first_match(self, text: str) -> Dict[str, str]:
+        """Highest-priority label hit per category, for already-lowercased text."""
+        best: Dict[str, Tuple[int, str]] = {}
+        for match in self._pattern.finditer(text):
+            keyword = match.group(1)
+            for kw in (keyword, *self._prefixes[keyword]):
+                for category, priority, label in self._targets[kw]:
+                    if category not in best or priority < best[category][0]:
+                        best[category] = (priority, label)
+        return {category: label for category, (_, label) in best.items()}
+
+    def hits(self, text: str) -> Dict[str, Dict[str, int]]:
+        """All label hits with occurrence counts per category, for already-lowercased text."""
+        result: Dict[str, Dict[str, int]] = {category: {} for category in self.categories}
+        for keyword, count in self.keyword_counts(text).items():
+            for category, _, label in self._targets[keyword]:
+                result[category][label] = result[category].get(label, 0) + count
+        return result
@@ -0,0 +1,91 @@
+"""
+pipeline.py - Single-pass message analysis
+
+Runs privacy masking once, lowercases the sanitized text once and derives tone, emotion,
+purpose and intent from it. Every downstream consumer (router, chat API, memory) reads the
+same frozen MessageAnalysis instead of re-scanning the message.
+"""
+
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Callable, List, Mapping
+
+from client.privacy.privacy_guard import enforce_privacy
+from ai.core_nlp.analyzer import classify_purpose, get_keyword_matcher
+from ai.core_nlp import intent_classifier
+
+# Hooks called as hook(stage_name, seconds) after every stage
+StageHook = Callable[[str, float], None]
+_stage_hooks: List[StageHook] = []
+
+@dataclass(frozen=True)
+class MessageAnalysis:
+    text: str
+    sanitized_text: str
+    normalized_text: str
+    tone: str
+    emotion: str
+    purpose: str
+    intent: str
+    confidence: float
+    timings: Mapping[str, float] = field(default_factory=dict)
+
+def register_stage_hook(hook: StageHook):
+    """Register a callback receiving (stage, seconds) for every analysis stage."""
+    if hook not in _stage_hooks:
+        _stage_hooks.append(hook)
+
+def unregister_stage_hook(hook: StageHook):
+    if hook in _stage_hooks:
+        _stage_hooks.remove(hook)
+
+def analyze_message(message: str) -> MessageAnalysis:
+    """
+    Analyze a raw user message in one pass.
+    Stages: privacy → normalize → keywords (tone + emotion) → purpose → intent.
+    """
+    timings = {}
+    clock = time.perf_counter
+    start = clock()
+
+    def finish(stage: str, began: float) -> float:
+        now = clock()
+        timings[stage] = now - began
+        for hook in _stage_hooks:
+            try:
+                hook(stage, timings[stage])
+            except Exception as e:
+                print(f"[ANALYSIS HOOK ERROR] {stage}: {e}")
+        return now
+
+    sanitized = enforce_privacy(message)
+    t = finish("privacy", start)
+
+    lowered = sanitized.lower()
+    normalized = lowered.strip()
+    t = finish("normalize", t)
+
+    keywords = get_keyword_matcher().first_match(lowered)
+    tone = keywords.get("tone", "neutral")
+    emotion = keywords.get("emotion", "neutral")
+    t = finish("keywords", t)
+
+    purpose = classify_purpose(lowered)
+    t = finish("purpose", t)
+
+    intent, confidence = intent_classifier.intent_index.classify(normalized)
+    finish("intent", t)
+    timings["total"] = clock() - start
+
+    return MessageAnalysis(
+        text=message,
+        sanitized_text=sanitized,
+        normalized_text=normalized,
+        tone=tone,
+        emotion=emotion,
+        purpose=purpose,
+        intent=intent,
+        confidence=confidence,
+        timings=MappingProxyType(timings),
+    )
@@ -0,0 +1,437 @@
+"""
+ingest.py - Incremental ingestion of documents into the RAG vector store
+
+Builds and updates the store at VECTOR_INDEX_PATH that rag_search.py serves:
+- documents are read and chunked as a stream (RAG_CHUNK_SIZE characters, RAG_CHUNK_OVERLAP
+  shared with the previous chunk, cut at a paragraph/line/sentence/word boundary if possible)
+- every chunk is fingerprinted by the SHA-256 of its text; only chunks the store doesn't
+  hold yet are embedded, in batches of RAG_EMBED_BATCH_SIZE spread over RAG_INGEST_WORKERS
+  processes
+- vectors live in a FAISS IndexIDMap2, so new chunks are appended and chunks no file uses any
+  more are removed by id, without rebuilding the index
+- manifest.json next to the index records every ingested file (size, mtime, chunk
+  fingerprints). It is checkpointed with the index every RAG_INGEST_CHECKPOINT_SECONDS, so a
+  rerun after a crash skips finished files and re-embeds nothing that reached the index.
+Files are written in FAISS.save_local's layout (index.faiss + index.pkl), which running
+workers hot-swap. A rebuild starts from an empty store but leaves the live files in place
+until it has finished.
+
+Embedding workers are started with the "spawn" method: ingestion also runs inside API
+workers (POST /debug/rag/ingest), whose writer, batcher and pub/sub threads a forked child
+would inherit mid-operation. The endpoint only accepts paths under RAG_DOCS_ROOT.
+
+Usage:
+    python -m ai.fallback.ingest docs/ more/file.md [--workers 4] [--rebuild]
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from ai.fallback.rag_search import EMBEDDING_MODEL_NAME, VECTOR_INDEX_PATH, _load_embeddings
+
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "100"))
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+INGEST_WORKERS = int(os.getenv("RAG_INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+INGEST_CHECKPOINT_SECONDS = float(os.getenv("RAG_INGEST_CHECKPOINT_SECONDS", "30"))
+
+# Directory the ingest endpoint may read documents from
+DOCS_ROOT = os.getenv("RAG_DOCS_ROOT", "docs")
+
+DOC_EXTENSIONS = (".txt", ".md", ".markdown", ".rst")
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+READ_BLOCK = 1 << 16
+
+# (fingerprint, text, metadata) of a chunk waiting to be embedded
+PendingChunk = Tuple[str, str, Dict[str, Any]]
+
+# --- chunking ---
+def _cut_point(buffer: str, start: int, size: int) -> int:
+    """End of the chunk starting at `start`: the last boundary in its second half, else `size` chars."""
+    end = start + size
+    for separator in ("\n\n", "\n", ". ", " "):
+        pos = buffer.rfind(separator, start + size // 2, end)
+        if pos != -1:
+            return pos + len(separator)
+    return end
+
+def iter_chunks(stream: TextIO, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                block_size: int = READ_BLOCK) -> Iterator[str]:
+    """Chunks of a text stream, which is read a block at a time."""
+    if not 0 <= overlap < chunk_size // 2:
+        raise ValueError("chunk overlap must be less than half the chunk size")
+    buffer, start, eof = "", 0, False
+    while True:
+        if not eof and len(buffer) - start <= chunk_size:
+            block = stream.read(block_size)
+            buffer, start, eof = buffer[start:] + block, 0, not block
+            continue
+        if len(buffer) - start <= chunk_size:
+            text = buffer[start:].strip()
+            if text:
+                yield text
+            return
+        cut = _cut_point(buffer, start, chunk_size)
+        text = buffer[start:cut].strip()
+        if text:
+            yield text
+        start = cut - overlap
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+def _inside(path: str, root: str) -> bool:
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+def resolve_doc_paths(paths: Iterable[str], root: str = DOCS_ROOT) -> List[str]:
+    """
+    Paths given relative to `root` (absolute ones must point into it), as paths relative to
+    the working directory like the CLI's. ValueError for anything resolving outside `root`.
+    """
+    real_root = os.path.realpath(root)
+    resolved = []
+    for path in paths:
+        full = os.path.join(real_root, path)
+        if not _inside(full, real_root):
+            raise ValueError(f"{path} is outside the documents root {root}")
+        resolved.append(os.path.relpath(os.path.realpath(full)))
+    return resolved
+
+def iter_files(paths: Iterable[str], root: Optional[str] = None) -> Iterator[str]:
+    """
+    Document files under the given files/directories, in a stable order.
+    With `root`, files that resolve outside it (symlinks) are skipped.
+    """
+    real_root = os.path.realpath(root) if root is not None else None
+    for path in paths:
+        if os.path.isdir(path):
+            for base, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    file_path = os.path.join(base, name)
+                    if name.lower().endswith(DOC_EXTENSIONS) and (real_root is None or _inside(file_path, real_root)):
+                        yield os.path.normpath(file_path)
+        elif os.path.isfile(path):
+            yield os.path.normpath(path)
+        else:
+            raise FileNotFoundError(path)
+
+# --- embedding ---
+_model = None
+
+def embed_texts(texts: List[str], model_name: str = EMBEDDING_MODEL_NAME) -> List[List[float]]:
+    """Embed with the RAG model, loaded once per process (each pool worker loads its own)."""
+    global _model
+    if _model is None:
+        _model = _load_embeddings(model_name)
+    return _model.embed_documents(texts)
+
+def _completed(result: Any) -> Future:
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+# --- store ---
+def _replace(path: str, write: Callable[[str], None]):
+    """Write to a temporary file and rename it over `path`, so readers never see half a file."""
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+class FaissStoreWriter:
+    """The vector store in FAISS.save_local's layout, with vectors in an IndexIDMap2."""
+
+    def __init__(self, path: str = VECTOR_INDEX_PATH):
+        self.path = path
+        self.index = None
+        self.docstore = None
+        # vector id -> fingerprint (langchain's index_to_docstore_id; fingerprints are the docstore ids)
+        self.mapping: Dict[int, str] = {}
+
+    def open(self):
+        import faiss
+        import numpy as np
+        from langchain.docstore.in_memory import InMemoryDocstore
+
+        index_file = os.path.join(self.path, "index.faiss")
+        pickle_file = os.path.join(self.path, "index.pkl")
+        if not (os.path.exists(index_file) and os.path.exists(pickle_file)):
+            self.index, self.docstore, self.mapping = None, InMemoryDocstore({}), {}
+            return
+        index = faiss.read_index(index_file)
+        if not isinstance(index, faiss.IndexIDMap2):
+            raise ValueError(f"{index_file} was not built by ingest (no id map); rerun with --rebuild")
+        with open(pickle_file, "rb") as f:
+            docstore, mapping = pickle.load(f)
+        # The two files are replaced one after the other: drop what only one of them has
+        ids = set(faiss.vector_to_array(index.id_map).tolist())
+        orphans = [i for i in ids if i not in mapping]
+        if orphans:
+            index.remove_ids(np.asarray(orphans, dtype=np.int64))
+        for i in [i for i in mapping if i not in ids]:
+            docstore._dict.pop(mapping.pop(i), None)
+        self.index, self.docstore, self.mapping = index, docstore, mapping
+
+    def fingerprints(self) -> Dict[str, int]:
+        return {fp: i for i, fp in self.mapping.items()}
+
+    def add(self, ids: List[int], vectors, chunks: List[PendingChunk]):
+        import faiss
+        import numpy as np
+        from langchain.docstore.document import Document
+
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+        self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+        for i, (fp, text, metadata) in zip(ids, chunks):
+            self.docstore._dict[fp] = Document(page_content=text, metadata=metadata)
+            self.mapping[i] = fp
+
+    def remove(self, fingerprints: List[str]):
+        import numpy as np
+
+        by_fingerprint = self.fingerprints()
+        ids = [by_fingerprint[fp] for fp in fingerprints if fp in by_fingerprint]
+        if not ids:
+            return
+        self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        for i in ids:
+            self.docstore._dict.pop(self.mapping.pop(i), None)
+
+    def save(self):
+        import faiss
+
+        if self.index is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        _replace(os.path.join(self.path, "index.faiss"), lambda tmp: faiss.write_index(self.index, tmp))
+
+        def dump(tmp: str):
+            with open(tmp, "wb") as f:
+                pickle.dump((self.docstore, self.mapping), f)
+
+        _replace(os.path.join(self.path, "index.pkl"), dump)
+
+    def size(self) -> int:
+        return int(self.index.ntotal) if self.index is not None else 0
+
+# --- ingestion ---
+class Ingestor:
+    def __init__(self, index_path: str = VECTOR_INDEX_PATH, model_name: str = EMBEDDING_MODEL_NAME,
+                 workers: int = INGEST_WORKERS, batch_size: int = EMBED_BATCH_SIZE,
+                 chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                 checkpoint_seconds: float = INGEST_CHECKPOINT_SECONDS,
+                 embed_fn: Callable[[List[str]], Any] = embed_texts, writer=None,
+                 docs_root: Optional[str] = None):
+        """
+        workers=0 embeds in this process; otherwise embed_fn must be picklable (module-level).
+        With docs_root, files under the given directories that resolve outside it are skipped.
+        """
+        self.index_path = index_path
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.checkpoint_seconds = checkpoint_seconds
+        self.embed_fn = embed_fn
+        self.writer = writer if writer is not None else FaissStoreWriter(index_path)
+        self.docs_root = docs_root
+        self.manifest_path = os.path.join(index_path, MANIFEST_FILE)
+
+    # --- manifest ---
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {"version": MANIFEST_VERSION, "model": self.model_name, "next_id": 0, "files": {}}
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return self._empty_manifest()
+        if manifest.get("model") != self.model_name and manifest.get("files"):
+            raise ValueError(f"store was built with {manifest.get('model')}, not {self.model_name}; "
+                             "rerun with --rebuild")
+        return manifest
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        os.makedirs(self.index_path, exist_ok=True)
+
+        def dump(tmp: str):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+
+        _replace(self.manifest_path, dump)
+
+    def _checkpoint(self, manifest: Dict[str, Any]):
+        # Index first: a manifest never lists chunks the saved index lacks
+        self.writer.save()
+        self._save_manifest(manifest)
+        self._stats["checkpoints"] += 1
+        self._last_checkpoint = time.monotonic()
+
+    # --- run ---
+    def run(self, paths: Iterable[str], rebuild: bool = False) -> Dict[str, Any]:
+        """
+        Bring the store in line with the documents under `paths`: embed new and changed chunks,
+        remove chunks of changed or deleted files. Returns the run's report.
+        """
+        paths = [os.path.normpath(path) for path in paths]
+        started = time.perf_counter()
+        self.writer.open()
+        if rebuild:
+            # Empty in memory only: the live files are replaced by the final checkpoint
+            self.writer.remove(list(self.writer.fingerprints()))
+            manifest = self._empty_manifest()
+        else:
+            manifest = self._load_manifest()
+        self._rebuilding = rebuild
+        present = self.writer.fingerprints()
+        self._next_id = max([manifest["next_id"], *(i + 1 for i in present.values())])
+        self._stats = {"files_scanned": 0, "files_unchanged": 0, "files_removed": 0, "chunks": 0,
+                       "chunks_embedded": 0, "chunks_reused": 0, "chunks_removed": 0,
+                       "bytes_read": 0, "bytes_embedded": 0, "checkpoints": 0}
+        self._last_checkpoint = time.monotonic()
+        self._inflight: Deque[Tuple[Future, List[PendingChunk]]] = deque()
+        self._submitted = self._committed = 0
+        # Files whose chunks are embedded once `_committed` reaches their batch number
+        self._waiting: Deque[Tuple[int, str, Dict[str, Any]]] = deque()
+        files = manifest["files"]
+        scanned: Set[str] = set()
+        queued: Set[str] = set()
+        batch: List[PendingChunk] = []
+
+        pool = None
+        if self.workers > 0:
+            pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for path in iter_files(paths, self.docs_root):
+                scanned.add(path)
+                self._stats["files_scanned"] += 1
+                st = os.stat(path)
+                entry = files.get(path)
+                if (entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+                        and all(fp in present for fp in entry["chunks"])):
+                    self._stats["files_unchanged"] += 1
+                    continue
+                chunks = []
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    for n, text in enumerate(iter_chunks(f, self.chunk_size, self.overlap)):
+                        fp = fingerprint(text)
+                        chunks.append(fp)
+                        self._stats["chunks"] += 1
+                        if fp in present or fp in queued:
+                            self._stats["chunks_reused"] += 1
+                            continue
+                        queued.add(fp)
+                        batch.append((fp, text, {"source": path, "chunk": n}))
+                        if len(batch) >= self.batch_size:
+                            self._submit(pool, batch, present, manifest)
+                            batch = []
+                self._stats["bytes_read"] += st.st_size
+                entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "chunks": chunks}
+                self._waiting.append((self._submitted + (1 if batch else 0), path, entry))
+                self._finish_files(manifest)
+                self._maybe_checkpoint(manifest)
+            if batch:
+                self._submit(pool, batch, present, manifest)
+            while self._inflight:
+                self._commit_one(present, manifest)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        # Files deleted from a scanned directory, then chunks no remaining file uses
+        for path in list(files):
+            if path not in scanned and any(path == root or path.startswith(root + os.sep) for root in paths):
+                del files[path]
+                self._stats["files_removed"] += 1
+        used = {fp for entry in files.values() for fp in entry["chunks"]}
+        stale = [fp for fp in present if fp not in used]
+        self.writer.remove(stale)
+        self._stats["chunks_removed"] = len(stale)
+        manifest.update(version=MANIFEST_VERSION, model=self.model_name, next_id=self._next_id)
+        self._checkpoint(manifest)
+
+        seconds = time.perf_counter() - started
+        report = dict(self._stats, seconds=round(seconds, 3), vectors=self.writer.size())
+        report["chunks_per_second"] = round(self._stats["chunks_embedded"] / seconds, 1) if seconds else 0.0
+        report["embedded_mb_per_second"] = round(self._stats["bytes_embedded"] / 2 ** 20 / seconds, 3) if seconds else 0.0
+        return report
+
+    def _submit(self, pool: Optional[ProcessPoolExecutor], batch: List[PendingChunk],
+                present: Dict[str, int], manifest: Dict[str, Any]):
+        texts = [text for _, text, _ in batch]
+        future = pool.submit(self.embed_fn, texts) if pool is not None else _completed(self.embed_fn(texts))
+        self._inflight.append((future, batch))
+        self._submitted += 1
+        # Bounded: chunking doesn't run ahead of the embedding workers (in-process: commit at once)
+        while len(self._inflight) > 2 * self.workers:
+            self._commit_one(present, manifest)
+
+    def _commit_one(self, present: Dict[str, int], manifest: Dict[str, Any]):
+        import numpy as np
+
+        future, batch = self._inflight.popleft()
+        vectors = np.asarray(future.result(), dtype=np.float32)
+        ids = list(range(self._next_id, self._next_id + len(batch)))
+        self._next_id += len(batch)
+        self.writer.add(ids, vectors, batch)
+        for i, (fp, text, _) in zip(ids, batch):
+            present[fp] = i
+            self._stats["bytes_embedded"] += len(text.encode("utf-8"))
+        self._stats["chunks_embedded"] += len(batch)
+        self._committed += 1
+        self._finish_files(manifest)
+        self._maybe_checkpoint(manifest)
+
+    def _maybe_checkpoint(self, manifest: Dict[str, Any]):
+        # A rebuild is saved once, at the end, so workers never load a half-built store
+        if self._rebuilding:
+            return
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds:
+            manifest["next_id"] = self._next_id
+            self._checkpoint(manifest)
+
+    def _finish_files(self, manifest: Dict[str, Any]):
+        while self._waiting and self._waiting[0][0] <= self._committed:
+            _, path, entry = self._waiting.popleft()
+            manifest["files"][path] = entry
+
+def main():
+    parser = argparse.ArgumentParser(description="Add new/changed documents to the RAG vector store")
+    parser.add_argument("paths", nargs="+", help="document files or directories")
+    parser.add_argument("--index", default=VECTOR_INDEX_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="embedding processes (0 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--rebuild", action="store_true", help="replace the store, embedding everything")
+    args = parser.parse_args()
+
+    embed_fn = embed_texts
+    if args.model != EMBEDDING_MODEL_NAME:
+        import functools
+        embed_fn = functools.partial(embed_texts, model_name=args.model)
+    ingestor = Ingestor(args.index, args.model, args.workers, args.batch_size, args.chunk_size, args.overlap,
+                        embed_fn=embed_fn)
+    report = ingestor.run(args.paths, rebuild=args.rebuild)
+    print(f"files: {report['files_scanned']} scanned, {report['files_unchanged']} unchanged, "
+          f"{report['files_removed']} removed")
+    print(f"chunks: {report['chunks']} seen, {report['chunks_embedded']} embedded, "
+          f"{report['chunks_reused']} reused, {report['chunks_removed']} removed; {report['vectors']} in the index")
+    print(f"{report['chunks_per_second']} chunks/s, {report['bytes_embedded'] / 2 ** 20:.2f} MB embedded "
+          f"({report['embedded_mb_per_second']} MB/s) in {report['seconds']}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+micro_batch.py - Collect concurrent calls for a few milliseconds and run them as one batch
+
+A single worker thread takes the first waiting item, waits up to max_wait seconds (or until
+max_batch items are waiting) for more, then calls batch_fn(items) once and hands each
+caller its own result. Items that arrive while a batch runs form the next batch, so under
+load batches grow by themselves. Callers block on call() from a thread or await run()
+from the event loop; neither holds a thread-pool thread while waiting.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+class MicroBatcher:
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch: int = 32,
+                 max_wait: float = 0.002, name: str = "micro-batcher"):
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: Deque[Tuple[Any, Future]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"items": 0, "batches": 0, "max_batch_seen": 0, "errors": 0,
+                       "batch_seconds_total": 0.0}
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item; the future resolves to batch_fn's result for it."""
+        future: Future = Future()
+        with self._cond:
+            self._queue.append((item, future))
+            self._ensure_thread()
+            self._cond.notify()
+        return future
+
+    def call(self, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.submit(item).result(timeout)
+
+    async def run(self, item: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> List[Tuple[Any, Future]]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch))]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                results = self.batch_fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                self._stats["errors"] += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._record(len(batch), time.perf_counter() - start)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, size: int, seconds: float):
+        self._stats["items"] += size
+        self._stats["batches"] += 1
+        self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], size)
+        self._stats["batch_seconds_total"] += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({
+            "avg_batch": stats["items"] / stats["batches"] if stats["batches"] else 0.0,
+            "waiting": len(self._queue),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        })
+        return stats
@@ -0,0 +1,362 @@
+"""
+mmap_index.py - Memory-mapped, quantized IVF vector store for large corpora
+
+An alternative to loading the whole FAISS store into RAM (RAG_INDEX_BACKEND=mmap):
+- vectors are clustered into `nlist` inverted lists by k-means and stored list by list,
+  quantized to int8 (one scale per vector) or float16, in .npy files opened with mmap.
+  Only the centroids and list offsets are held in RAM.
+- a query is compared to the centroids and scans only its `nprobe` nearest lists, so the OS
+  pages in just those slices (RAG_MMAP_NPROBE; more lists = better recall, slower queries)
+- chunk texts and metadata are one JSON record per vector in records.bin, read through
+  mmap at the offsets in record_offsets.npy instead of unpickling a docstore dict
+- meta.json names the file generation and is replaced last, so a rebuild never changes
+  files a running worker has mapped; workers hot-swap when meta.json changes. The previous
+  generation is kept until the next build, for workers still opening it.
+- a rebuild reuses the previous generation's centroids, so k-means only runs again once the
+  corpus has grown RAG_MMAP_RETRAIN_GROWTH times past the size they were trained on. Every
+  build still rewrites all the lists from the full FAISS store (its vectors and docstore are
+  read into RAM), so it costs time proportional to the corpus, not to the new documents.
+
+Build it from the FAISS store that ingest.py maintains:
+    python -m ai.fallback.mmap_index --from vector_store/index --out vector_store/mmap --dtype int8
+"""
+
+import argparse
+import glob
+import json
+import math
+import mmap
+import os
+import pickle
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MMAP_INDEX_PATH = os.getenv("RAG_MMAP_INDEX_PATH", "vector_store/mmap")
+MMAP_NPROBE = int(os.getenv("RAG_MMAP_NPROBE", "16"))
+MMAP_DTYPE = os.getenv("RAG_MMAP_DTYPE", "int8")
+MMAP_RETRAIN_GROWTH = float(os.getenv("RAG_MMAP_RETRAIN_GROWTH", "2"))
+META_FILE = "meta.json"
+DTYPES = {"int8": np.int8, "float16": np.float16, "float32": np.float32}
+
+# Rows per step when assigning/quantizing, to bound the memory of the temporaries
+_BLOCK = 65536
+
+def _file(path: str, name: str, generation: str, ext: str) -> str:
+    return os.path.join(path, f"{name}.{generation}.{ext}")
+
+def default_nlist(count: int) -> int:
+    return max(1, min(65536, int(4 * math.sqrt(count))))
+
+def read_meta(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# --- building ---
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _BLOCK):
+        block = vectors[start:start + _BLOCK]
+        assignment[start:start + _BLOCK] = (centroid_norms[None, :] - 2 * block @ centroids.T).argmin(axis=1)
+    return assignment
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, sample: int = 64,
+                    seed: int = 0) -> np.ndarray:
+    """k-means on at most `sample` vectors per list."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > nlist * sample:
+        vectors = vectors[np.sort(rng.choice(len(vectors), nlist * sample, replace=False))]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(vectors, centroids)
+        counts = np.bincount(assignment, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Restart empty lists on random vectors
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+def _quantize(block: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+    """(codes, int8 scales or None, squared norms of the decoded vectors)."""
+    if dtype == "int8":
+        scales = np.maximum(np.abs(block).max(axis=1), 1e-12).astype(np.float32) / 127
+        codes = np.clip(np.rint(block / scales[:, None]), -127, 127).astype(np.int8)
+        decoded = codes.astype(np.float32) * scales[:, None]
+    else:
+        scales = None
+        codes = block.astype(DTYPES[dtype])
+        decoded = codes.astype(np.float32)
+    return codes, scales, (decoded ** 2).sum(axis=1)
+
+def build_index(path: str, vectors: np.ndarray, records: Sequence[Tuple[str, Dict[str, Any]]],
+                nlist: Optional[int] = None, dtype: str = "int8", seed: int = 0,
+                centroids: Optional[np.ndarray] = None, trained_on: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Write `vectors` (N, d) and their (text, metadata) records as a new generation under
+    `path`, switch meta.json to it and delete the generations before the previous one.
+    Given `centroids` (and the count they were `trained_on`), k-means is skipped.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    if count != len(records):
+        raise ValueError(f"{count} vectors but {len(records)} records")
+    if count == 0:
+        raise ValueError("nothing to index")
+    os.makedirs(path, exist_ok=True)
+    generation = f"{int(time.time())}-{uuid.uuid4().hex[:6]}"
+
+    if centroids is None:
+        nlist = min(nlist or default_nlist(count), count)
+        centroids = train_centroids(vectors, nlist, seed=seed)
+        trained_on = count
+    else:
+        centroids = np.asarray(centroids, dtype=np.float32)
+        nlist = len(centroids)
+        trained_on = trained_on or count
+    assignment = _nearest(vectors, centroids)
+    order = np.argsort(assignment, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))]).astype(np.int64)
+
+    codes = np.lib.format.open_memmap(_file(path, "vectors", generation, "npy"), mode="w+",
+                                      dtype=DTYPES[dtype], shape=(count, dim))
+    norms = np.lib.format.open_memmap(_file(path, "norms", generation, "npy"), mode="w+",
+                                      dtype=np.float32, shape=(count,))
+    scales = None
+    if dtype == "int8":
+        scales = np.lib.format.open_memmap(_file(path, "scales", generation, "npy"), mode="w+",
+                                           dtype=np.float32, shape=(count,))
+    for start in range(0, count, _BLOCK):
+        rows = order[start:start + _BLOCK]
+        block_codes, block_scales, block_norms = _quantize(vectors[rows], dtype)
+        codes[start:start + len(rows)] = block_codes
+        norms[start:start + len(rows)] = block_norms
+        if scales is not None:
+            scales[start:start + len(rows)] = block_scales
+    for array in (codes, norms, scales):
+        if array is not None:
+            array.flush()
+    del codes, norms, scales
+
+    record_offsets = np.empty(count + 1, dtype=np.int64)
+    record_offsets[0] = 0
+    with open(_file(path, "records", generation, "bin"), "wb") as f:
+        position = 0
+        for n, (text, metadata) in enumerate(records):
+            data = json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+            f.write(data)
+            position += len(data)
+            record_offsets[n + 1] = position
+    np.save(_file(path, "record_offsets", generation, "npy"), record_offsets)
+    np.save(_file(path, "ids", generation, "npy"), order.astype(np.int64))
+    np.save(_file(path, "centroids", generation, "npy"), centroids)
+    np.save(_file(path, "list_offsets", generation, "npy"), offsets)
+
+    meta = {"version": 1, "generation": generation, "dim": dim, "count": count, "nlist": nlist,
+            "dtype": dtype, "metric": "l2", "trained_on": trained_on}
+    previous = read_meta(path)
+    tmp = os.path.join(path, f"{META_FILE}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+    # A worker that read the previous meta.json may still be opening its files, so that generation
+    # stays until the next build; workers that mapped older files keep them (unlinked, not overwritten)
+    keep = {generation, previous["generation"] if previous else generation}
+    for name in glob.glob(os.path.join(path, "*.*.*")):
+        if os.path.basename(name).split(".")[1] not in keep:
+            os.remove(name)
+    return meta
+
+def load_faiss_store(path: str) -> Tuple[np.ndarray, List[Tuple[str, Dict[str, Any]]]]:
+    """Vectors and (text, metadata) records of a store in FAISS.save_local's layout."""
+    import faiss
+
+    index = faiss.read_index(os.path.join(path, "index.faiss"))
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        ids = faiss.vector_to_array(index.id_map).tolist()
+        index = faiss.downcast_index(index.index)
+    else:
+        ids = list(range(index.ntotal))
+    vectors = index.reconstruct_n(0, index.ntotal)
+    records = []
+    for vector_id in ids:
+        doc = docstore.search(index_to_docstore_id[vector_id])
+        records.append((doc.page_content, dict(doc.metadata)))
+    return vectors, records
+
+def reusable_centroids(path: str, count: int, dim: int,
+                       growth: float = MMAP_RETRAIN_GROWTH) -> Tuple[Optional[np.ndarray], Optional[int]]:
+    """The current generation's centroids and training size, unless the corpus outgrew them."""
+    meta = read_meta(path)
+    if not meta or meta["dim"] != dim or meta["nlist"] > count:
+        return None, None
+    trained_on = meta.get("trained_on", meta["count"])
+    if count > growth * trained_on:
+        return None, None
+    try:
+        return np.load(_file(path, "centroids", meta["generation"], "npy")), trained_on
+    except OSError:
+        return None, None
+
+def build_from_faiss(source: str, out: str = MMAP_INDEX_PATH, nlist: Optional[int] = None,
+                     dtype: str = MMAP_DTYPE, retrain: bool = False) -> Dict[str, Any]:
+    """Rebuild from the FAISS store, reusing the current centroids unless `retrain` or `nlist` is given."""
+    vectors, records = load_faiss_store(source)
+    centroids, trained_on = None, None
+    if not retrain and nlist is None:
+        centroids, trained_on = reusable_centroids(out, len(vectors), vectors.shape[1])
+    return build_index(out, vectors, records, nlist=nlist, dtype=dtype, centroids=centroids,
+                       trained_on=trained_on)
+
+# --- serving ---
+class MmapIVFIndex:
+    def __init__(self, path: str, meta: Dict[str, Any], nprobe: int = MMAP_NPROBE):
+        generation = meta["generation"]
+        self.d = meta["dim"]
+        self.ntotal = meta["count"]
+        self.nlist = meta["nlist"]
+        self.dtype = meta["dtype"]
+        self.nprobe = nprobe
+        self.centroids = np.load(_file(path, "centroids", generation, "npy"))
+        self.centroid_norms = (self.centroids ** 2).sum(axis=1)
+        self.list_offsets = np.load(_file(path, "list_offsets", generation, "npy"))
+        self.codes = np.load(_file(path, "vectors", generation, "npy"), mmap_mode="r")
+        self.norms = np.load(_file(path, "norms", generation, "npy"), mmap_mode="r")
+        self.scales = (np.load(_file(path, "scales", generation, "npy"), mmap_mode="r")
+                       if self.dtype == "int8" else None)
+        # Row (vectors are stored list by list) -> position in the input, which is the record number
+        self.ids = np.load(_file(path, "ids", generation, "npy"), mmap_mode="r")
+        self.vector_bytes = int(self.codes.nbytes)
+
+    def _decode(self, lo: int, hi: int) -> np.ndarray:
+        block = self.codes[lo:hi].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[lo:hi, None]
+        return block
+
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Like faiss Index.search: (distances, ids), -1 where fewer than k were found."""
+        queries = np.asarray(queries, dtype=np.float32)
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        query_norms = (queries ** 2).sum(axis=1)
+        coarse = self.centroid_norms[None, :] - 2 * queries @ self.centroids.T
+        if nprobe < self.nlist:
+            probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), (len(queries), self.nlist))
+
+        # Scan each probed list once for all queries probing it
+        by_list: Dict[int, List[int]] = {}
+        for q, lists in enumerate(probes.tolist()):
+            for list_no in lists:
+                by_list.setdefault(list_no, []).append(q)
+        found_d: List[List[np.ndarray]] = [[] for _ in range(len(queries))]
+        found_i: List[List[np.ndarray]] = [[] for _ in range(len(queries))]
+        for list_no, members in by_list.items():
+            lo, hi = int(self.list_offsets[list_no]), int(self.list_offsets[list_no + 1])
+            if lo == hi:
+                continue
+            distances = (self.norms[None, lo:hi] - 2 * queries[members] @ self._decode(lo, hi).T
+                         + query_norms[members, None])
+            ids = np.asarray(self.ids[lo:hi])
+            if hi - lo > k:
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(distances, top, axis=1)
+                ids = ids[top]
+            else:
+                ids = np.broadcast_to(ids, distances.shape)
+            for row, q in enumerate(members):
+                found_d[q].append(distances[row])
+                found_i[q].append(ids[row])
+
+        result_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+        result_i = np.full((len(queries), k), -1, dtype=np.int64)
+        for q in range(len(queries)):
+            if not found_d[q]:
+                continue
+            distances, ids = np.concatenate(found_d[q]), np.concatenate(found_i[q])
+            top = np.argsort(distances, kind="stable")[:k]
+            result_d[q, :len(top)] = distances[top]
+            result_i[q, :len(top)] = ids[top]
+        return result_d, result_i
+
+class MmapDocument:
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any]):
+        self.page_content = page_content
+        self.metadata = metadata
+
+class MmapDocstore:
+    """JSON records read straight from the mapped records file."""
+
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        generation = meta["generation"]
+        self.offsets = np.load(_file(path, "record_offsets", generation, "npy"), mmap_mode="r")
+        with open(_file(path, "records", generation, "bin"), "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, i: int) -> MmapDocument:
+        record = json.loads(self._data[int(self.offsets[i]):int(self.offsets[i + 1])])
+        return MmapDocument(record["text"], record["metadata"])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+class MmapVectorStore:
+    def __init__(self, path: str, embeddings=None, nprobe: int = MMAP_NPROBE):
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.embeddings = embeddings
+        self.index = MmapIVFIndex(path, self.meta, nprobe)
+        self.docstore = MmapDocstore(path, self.meta)
+
+    def search_by_vectors(self, vectors: np.ndarray, k: int = 3) -> List[list]:
+        _, ids = self.index.search(vectors, k)
+        return [[self.docstore.get(i) for i in row if i != -1] for row in ids.tolist()]
+
+    def similarity_search(self, query: str, k: int = 3) -> list:
+        vector = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        return self.search_by_vectors(vector, k)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        disk = sum(os.path.getsize(name) for name in glob.glob(os.path.join(self.path, f"*.{self.meta['generation']}.*")))
+        return {"backend": "mmap", "dtype": self.meta["dtype"], "nlist": self.meta["nlist"],
+                "nprobe": self.index.nprobe, "index_disk_bytes": disk}
+
+def load_mmap_store(path: str, embeddings) -> MmapVectorStore:
+    """store_loader for DocumentRetriever."""
+    return MmapVectorStore(path, embeddings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped IVF store from a FAISS store")
+    parser.add_argument("--from", dest="source", default="vector_store/index", help="FAISS.save_local directory")
+    parser.add_argument("--out", default=MMAP_INDEX_PATH)
+    parser.add_argument("--nlist", type=int, default=None, help="inverted lists (default 4*sqrt(N))")
+    parser.add_argument("--dtype", choices=tuple(DTYPES), default=MMAP_DTYPE)
+    parser.add_argument("--retrain", action="store_true", help="run k-means again instead of reusing the centroids")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta = build_from_faiss(args.source, args.out, nlist=args.nlist, dtype=args.dtype, retrain=args.retrain)
+    print(f"{meta['count']} vectors ({meta['dtype']}, {meta['nlist']} lists) written to {args.out} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -7,35 +7,265 @@ It's used as a mid-layer fallback when RASA fails and user queries may be answer
 ✅ Uses Langchain
 ✅ Supports HuggingFace embeddings
 ✅ Search top-3 semantically similar chunks
+✅ Embedding model + index loaded once per process, hot-swapped when the index changes on disk
+✅ Concurrent queries micro-batched: one embedding call and one index.search per batch
+✅ RAG_INDEX_BACKEND=mmap serves the memory-mapped, quantized IVF store (mmap_index.py)
 """
 
-from typing import Optional
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai.fallback.micro_batch import MicroBatcher
 
 # Path where your vector store is saved
 VECTOR_INDEX_PATH = "vector_store/index"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Files written by FAISS.save_local; their mtimes tell us when to hot-swap
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+# faiss: the LangChain FAISS store, loaded into RAM; mmap: the store built by mmap_index.py
+RAG_INDEX_BACKEND = os.getenv("RAG_INDEX_BACKEND", "faiss").lower()
+
+# Seconds between on-disk change checks (0 = check on every query)
+RELOAD_CHECK_INTERVAL = float(os.getenv("RAG_RELOAD_CHECK_INTERVAL", "5"))
+
+# Concurrent queries are collected for up to RAG_BATCH_MAX_WAIT_MS and searched together
+RAG_BATCH_MAX_SIZE = int(os.getenv("RAG_BATCH_MAX_SIZE", "32"))
+RAG_BATCH_MAX_WAIT_MS = float(os.getenv("RAG_BATCH_MAX_WAIT_MS", "2"))
+
+# Top chunks returned by search_documents
+RAG_TOP_K = 3
+
+def _load_embeddings(model_name: str):
+    from langchain.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+def _load_vector_store(path: str, embeddings):
+    from langchain.vectorstores import FAISS
+    return FAISS.load_local(path, embeddings)
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this process, or 0 if it can't be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+class DocumentRetriever:
+    """
+    Long-lived retriever: the embedding model is loaded once, the FAISS index is loaded
+    once and swapped atomically whenever its files change on disk.
+    """
+
+    def __init__(self, index_path: str = VECTOR_INDEX_PATH, model_name: str = EMBEDDING_MODEL_NAME,
+                 embeddings_loader=_load_embeddings, store_loader=_load_vector_store,
+                 reload_check_interval: float = RELOAD_CHECK_INTERVAL, index_files: Tuple[str, ...] = INDEX_FILES):
+        self.index_path = index_path
+        self.index_files = index_files
+        self.model_name = model_name
+        self.reload_check_interval = reload_check_interval
+        self._embeddings_loader = embeddings_loader
+        self._store_loader = store_loader
+        self._lock = threading.Lock()
+        self._embeddings = None
+        # (vector store, on-disk signature) swapped as a single reference
+        self._state: Optional[Tuple[Any, Tuple]] = None
+        self._last_check = 0.0
+        self._stats = {
+            "model_load_seconds": 0.0,
+            "index_load_seconds": 0.0,
+            "index_loads": 0,
+            "queries": 0,
+            "batches": 0,
+            "query_seconds_total": 0.0,
+            "last_query_seconds": 0.0,
+            "model_rss_bytes": 0,
+            "index_rss_bytes": 0,
+        }
+
+    def _disk_signature(self) -> Tuple:
+        signature = []
+        for name in self.index_files:
+            try:
+                st = os.stat(os.path.join(self.index_path, name))
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @property
+    def embeddings(self):
+        """The shared embedding model, loaded on first use."""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    rss_before = _current_rss_bytes()
+                    start = time.perf_counter()
+                    embeddings = self._embeddings_loader(self.model_name)
+                    self._stats["model_load_seconds"] = time.perf_counter() - start
+                    self._stats["model_rss_bytes"] = max(_current_rss_bytes() - rss_before, 0)
+                    self._embeddings = embeddings
+        return self._embeddings
+
+    def load(self, force: bool = False):
+        """
+        Load (or reload) the vector store. The previous index keeps serving queries
+        until the new one is fully loaded, then the reference is swapped.
+        """
+        embeddings = self.embeddings
+        with self._lock:
+            signature = self._disk_signature()
+            if self._state is not None and not force and self._state[1] == signature:
+                return self._state[0]
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            store = self._store_loader(self.index_path, embeddings)
+            self._stats["index_load_seconds"] = time.perf_counter() - start
+            self._stats["index_rss_bytes"] = max(_current_rss_bytes() - rss_before, 0)
+            self._stats["index_loads"] += 1
+            self._state = (store, signature)
+            self._last_check = time.monotonic()
+            return store
+
+    def reload_if_changed(self) -> bool:
+        """Hot-swap the index if its files changed on disk. Returns True if swapped."""
+        state = self._state
+        if state is not None and state[1] == self._disk_signature():
+            return False
+        self.load()
+        return True
+
+    def _get_store(self):
+        state = self._state
+        if state is None:
+            return self.load()
+        now = time.monotonic()
+        if now - self._last_check >= self.reload_check_interval:
+            self._last_check = now
+            self.reload_if_changed()
+        return self._state[0]
+
+    def search(self, query: str, k: int = 3) -> list:
+        """Return the top-k documents for a query."""
+        store = self._get_store()
+        start = time.perf_counter()
+        results = store.similarity_search(query, k=k)
+        elapsed = time.perf_counter() - start
+        self._stats["queries"] += 1
+        self._stats["query_seconds_total"] += elapsed
+        self._stats["last_query_seconds"] = elapsed
+        return results
+
+    def search_batch(self, queries: List[str], k: int = 3) -> List[list]:
+        """
+        Top-k documents for each query: the queries are embedded in one call and looked up
+        with one index.search over the (len(queries), d) matrix. Stores that don't expose a
+        FAISS index fall back to one similarity_search per query.
+        """
+        store = self._get_store()
+        start = time.perf_counter()
+        index = getattr(store, "index", None)
+        if hasattr(store, "search_by_vectors"):
+            import numpy as np
+            vectors = np.asarray(self.embeddings.embed_documents(queries), dtype=np.float32)
+            results = store.search_by_vectors(vectors, k)
+        elif index is None or not hasattr(store, "index_to_docstore_id"):
+            results = [store.similarity_search(query, k=k) for query in queries]
+        else:
+            import numpy as np
+            vectors = np.asarray(self.embeddings.embed_documents(queries), dtype=np.float32)
+            if getattr(store, "_normalize_L2", False):
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            _, ids = index.search(vectors, k)
+            results = [
+                [store.docstore.search(store.index_to_docstore_id[i]) for i in row if i != -1]
+                for row in ids.tolist()
+            ]
+        elapsed = time.perf_counter() - start
+        self._stats["queries"] += len(queries)
+        self._stats["batches"] += 1
+        self._stats["query_seconds_total"] += elapsed
+        self._stats["last_query_seconds"] = elapsed
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Load time, query latency and memory footprint of the retriever."""
+        stats = dict(self._stats)
+        stats["loaded"] = self._state is not None
+        stats["avg_query_seconds"] = (
+            stats["query_seconds_total"] / stats["queries"] if stats["queries"] else 0.0
+        )
+        state = self._state
+        index = getattr(state[0], "index", None) if state else None
+        if index is not None:
+            stats["index_vectors"] = int(index.ntotal)
+            stats["index_vector_bytes"] = getattr(index, "vector_bytes", int(index.ntotal) * int(index.d) * 4)
+        stats["index_disk_bytes"] = sum(
+            os.path.getsize(os.path.join(self.index_path, name))
+            for name in self.index_files
+            if os.path.exists(os.path.join(self.index_path, name))
+        )
+        if state and hasattr(state[0], "stats"):
+            stats.update(state[0].stats())
+        stats["process_rss_bytes"] = _current_rss_bytes()
+        stats["batching"] = search_batcher.stats()
+        return stats
+
+def _make_retriever() -> DocumentRetriever:
+    if RAG_INDEX_BACKEND == "mmap":
+        from ai.fallback.mmap_index import META_FILE, MMAP_INDEX_PATH, load_mmap_store
+        return DocumentRetriever(index_path=MMAP_INDEX_PATH, store_loader=load_mmap_store, index_files=(META_FILE,))
+    return DocumentRetriever()
+
+# Process-wide retriever shared by all requests
+retriever = _make_retriever()
+
+def _search_items(items: List[Tuple[str, int]]) -> List[list]:
+    """Batch function: items are (query, k); the batch is searched once with the largest k."""
+    k = max(item_k for _, item_k in items)
+    results = retriever.search_batch([query for query, _ in items], k)
+    return [docs[:item_k] for docs, (_, item_k) in zip(results, items)]
+
+search_batcher = MicroBatcher(_search_items, max_batch=RAG_BATCH_MAX_SIZE,
+                              max_wait=RAG_BATCH_MAX_WAIT_MS / 1000, name="rag-batcher")
+
+def warm_up() -> bool:
+    """Preload the embedding model and index (call at startup). Returns True on success."""
+    try:
+        retriever.load()
+        return True
+    except Exception as e:
+        print(f"[RAG WARMUP ERROR] {str(e)}")
+        return False
+
+def _format_results(results: list) -> Optional[str]:
+    if not results:
+        return None
+    combined_text = "\n".join([r.page_content for r in results])
+    return f"📘 Here’s what I found in the docs:\n{combined_text}"
 
 def search_documents(query: str) -> Optional[str]:
     """
     Search preloaded vector DB and return top chunks combined.
+    Blocks until the batch holding the query has been searched; from async code use
+    search_documents_async instead.
     :param query: User's message that failed structured intent matching.
     :return: Formatted answer string or None if no match found.
     """
     try:
-        # Load embeddings + vector DB
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        db = FAISS.load_local(VECTOR_INDEX_PATH, embeddings)
-
-        # Perform similarity search
-        results = db.similarity_search(query, k=3)
-
-        if not results:
-            return None
-
-        combined_text = "\n".join([r.page_content for r in results])
-        return f"📘 Here’s what I found in the docs:\n{combined_text}"
+        return _format_results(search_batcher.call((query, RAG_TOP_K)))
+    except Exception as e:
+        print(f"[RAG ERROR] {str(e)}")
+        return None
 
+async def search_documents_async(query: str) -> Optional[str]:
+    """search_documents for the event loop: waits for the batch without holding a thread."""
+    try:
+        return _format_results(await search_batcher.run((query, RAG_TOP_K)))
     except Exception as e:
         print(f"[RAG ERROR] {str(e)}")
-        return None
\ No newline at end of file
+        return None
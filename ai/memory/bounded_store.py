@@ -0,0 +1,121 @@
+"""
+bounded_store.py - Per-user in-memory records with idle TTL and a global LRU cap
+
+Records are kept in access order; anything idle for longer than `ttl` seconds is dropped
+from the cold end on the next access, and the least recently used record is evicted
+once `max_entries` is reached. Record sizes are approximate and reported by stats()
+for sizing worker memory.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+R = TypeVar("R")
+
+def approx_size(obj: Any) -> int:
+    """Rough deep size in bytes of plain data (str/bytes/numbers/dict/list/set/tuple)."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item) for item in obj)
+    return size
+
+class _Slot:
+    __slots__ = ("record", "last_access", "size")
+
+    def __init__(self, record, last_access: float, size: int):
+        self.record = record
+        self.last_access = last_access
+        self.size = size
+
+class BoundedStore(Generic[R]):
+    def __init__(self, factory: Callable[[], R], max_entries: int, ttl: float,
+                 sizeof: Callable[[R], int] = approx_size, clock: Callable[[], float] = time.monotonic):
+        self.factory = factory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._slots: "OrderedDict[str, _Slot]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {"evictions": 0, "expirations": 0}
+
+    def _expire(self, now: float):
+        # Oldest access is at the front, so only expired slots are visited
+        while self._slots:
+            key, slot = next(iter(self._slots.items()))
+            if now - slot.last_access < self.ttl:
+                break
+            self._drop(key, "expirations")
+
+    def _drop(self, key: str, counter: Optional[str] = None):
+        slot = self._slots.pop(key)
+        self._bytes -= slot.size
+        if counter:
+            self._stats[counter] += 1
+
+    def get(self, key: str, create: bool = False) -> Optional[R]:
+        """Return the record for key (creating it if asked), marking it recently used."""
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            slot = self._slots.get(key)
+            if slot is None:
+                if not create:
+                    return None
+                while len(self._slots) >= self.max_entries > 0:
+                    self._drop(next(iter(self._slots)), "evictions")
+                record = self.factory()
+                slot = _Slot(record, now, self.sizeof(record))
+                self._slots[key] = slot
+                self._bytes += slot.size
+            else:
+                slot.last_access = now
+                self._slots.move_to_end(key)
+            return slot.record
+
+    def resized(self, key: str):
+        """Re-measure a record after it was modified in place."""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                size = self.sizeof(slot.record)
+                self._bytes += size - slot.size
+                slot.size = size
+
+    def grow(self, key: str, delta: int):
+        """Adjust a record's size by delta bytes (cheaper than re-measuring large records)."""
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                slot.size += delta
+                self._bytes += delta
+
+    def pop(self, key: str):
+        with self._lock:
+            if key in self._slots:
+                self._drop(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._expire(self._clock())
+            return key in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(self._clock())
+            return dict(self._stats, entries=len(self._slots), bytes=self._bytes,
+                        max_entries=self.max_entries, ttl_seconds=self.ttl)
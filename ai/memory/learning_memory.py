@@ -1,26 +1,67 @@
-from collections import defaultdict
+import os
+import sys
+from typing import Any, Dict
+from ai.memory.bounded_store import BoundedStore, approx_size
 
-# In-memory user style/behavior learning (pseudo-learning)
-user_memory = defaultdict(lambda: {
-    "preferred_tone": "neutral",
-    "response_style": "direct",
-    "known_facts": []
-})
+# Caps for the in-memory learning store (per worker)
+MEMORY_MAX_USERS = int(os.getenv("MEMORY_MAX_USERS", "10000"))
+MEMORY_IDLE_TTL = float(os.getenv("MEMORY_IDLE_TTL", "86400"))
+MEMORY_MAX_FACTS = int(os.getenv("MEMORY_MAX_FACTS", "200"))
+
+class UserProfile:
+    """Learned style for one user. `facts` is an insertion-ordered hash set (dict keys)."""
+    __slots__ = ("preferred_tone", "response_style", "facts", "extra")
+
+    def __init__(self):
+        self.preferred_tone = "neutral"
+        self.response_style = "direct"
+        self.facts: Dict[str, None] = {}
+        self.extra: Dict[str, Any] = {}
+
+    def as_dict(self) -> dict:
+        profile = {"preferred_tone": self.preferred_tone, "response_style": self.response_style,
+                   "known_facts": list(self.facts)}
+        profile.update(self.extra)
+        return profile
+
+def _profile_size(profile: UserProfile) -> int:
+    return (sys.getsizeof(profile) + approx_size(profile.preferred_tone) + approx_size(profile.response_style)
+            + approx_size(profile.facts) + approx_size(profile.extra))
+
+# In-memory user style/behavior learning (pseudo-learning), bounded per worker
+user_memory = BoundedStore(UserProfile, max_entries=MEMORY_MAX_USERS, ttl=MEMORY_IDLE_TTL, sizeof=_profile_size)
 
 def get_user_profile(user_id: str) -> dict:
     """Retrieve the user's profile dictionary."""
-    return user_memory[user_id]
+    return user_memory.get(user_id, create=True).as_dict()
 
 def update_user_profile(user_id: str, key: str, value):
     """Update a specific key in the user's profile."""
-    user_memory[user_id][key] = value
+    profile = user_memory.get(user_id, create=True)
+    if key == "known_facts":
+        profile.facts = dict.fromkeys(list(value)[-MEMORY_MAX_FACTS:])
+    elif key in ("preferred_tone", "response_style"):
+        setattr(profile, key, value)
+    else:
+        profile.extra[key] = value
+    user_memory.resized(user_id)
 
 def add_fact(user_id: str, fact: str):
-    """Add a new fact to the user's known facts if not already present."""
-    if fact not in user_memory[user_id]["known_facts"]:
-        user_memory[user_id]["known_facts"].append(fact)
+    """Add a new fact to the user's known facts if not already present (oldest dropped past the cap)."""
+    profile = user_memory.get(user_id, create=True)
+    if fact in profile.facts:
+        return
+    profile.facts[fact] = None
+    delta = sys.getsizeof(fact)
+    while len(profile.facts) > MEMORY_MAX_FACTS:
+        oldest = next(iter(profile.facts))
+        del profile.facts[oldest]
+        delta -= sys.getsizeof(oldest)
+    user_memory.grow(user_id, delta)
 
 def clear_user_profile(user_id: str):
     """Remove the user's profile from memory."""
-    if user_id in user_memory:
-        del user_memory[user_id]
\ No newline at end of file
+    user_memory.pop(user_id)
+
+def memory_stats() -> dict:
+    return user_memory.stats()
@@ -1,17 +1,223 @@
-from collections import defaultdict
+"""
+session_context.py - Per-user session context (last intent, tone, message, ...)
+
+Two interchangeable stores:
+- LocalContextStore: bounded in-process dict (default; per worker, used by tests)
+- RedisContextStore: `user:{id}:context` hashes shared by all workers, with a short-TTL
+  local read-through cache
+
+Select with CONTEXT_STORE=memory|redis. Inside `with batched_updates():` the
+update_context() calls of one request are buffered and written in one round trip.
+Coroutines use `async with batched_updates_async():` and get_context_async(), which run
+the Redis round trips in a worker thread instead of on the event loop.
+"""
+
+import asyncio
+import os
+import threading
 import time
-from typing import Any, Dict
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+from ai.memory.bounded_store import BoundedStore
+
+# Caps for the in-memory session store (per worker)
+SESSION_MAX_USERS = int(os.getenv("SESSION_MAX_USERS", "10000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+CONTEXT_STORE = os.getenv("CONTEXT_STORE", "memory").lower()
+# Seconds a Redis context read may be served from the worker-local cache
+CONTEXT_CACHE_TTL = float(os.getenv("CONTEXT_CACHE_TTL", "2"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "4096"))
+
+class LocalContextStore:
+    """Thread-safe, bounded per worker; idle sessions expire after `ttl` seconds."""
+
+    # Calls never wait on I/O, so coroutines may call them directly
+    blocking = False
+
+    def __init__(self, max_users: int = SESSION_MAX_USERS, ttl: float = SESSION_IDLE_TTL):
+        self.sessions = BoundedStore(dict, max_entries=max_users, ttl=ttl)
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        context = self.sessions.get(user_id)
+        return dict(context) if context is not None else {}
+
+    def update(self, user_id: str, fields: Dict[str, Any]):
+        context = self.sessions.get(user_id, create=True)
+        context.update(fields)
+        self.sessions.resized(user_id)
+
+    def clear(self, user_id: str):
+        self.sessions.pop(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.sessions.stats(), backend="memory")
+
+class RedisContextStore:
+    """
+    Context as a Redis hash per user. Values are stored as strings (None as "").
+    An update is HSET + EXPIRE + session index in one pipeline.
+    """
+
+    # Calls wait on Redis round trips: coroutines go through asyncio.to_thread
+    blocking = True
+
+    def __init__(self, redis, ttl: float = SESSION_IDLE_TTL, cache_ttl: float = CONTEXT_CACHE_TTL,
+                 cache_size: int = CONTEXT_CACHE_SIZE, clock=time.monotonic):
+        self.redis = redis
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._stats = {"reads": 0, "cache_hits": 0, "writes": 0, "errors": 0}
+
+    @staticmethod
+    def key(user_id: str) -> str:
+        return f"user:{user_id}:context"
+
+    def _cache_put(self, user_id: str, context: Dict[str, Any]):
+        with self._lock:
+            self._cache[user_id] = (self._clock() + self.cache_ttl, context)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
 
-# Thread-safe for dev; swap for Redis/DB in prod
-session_store = defaultdict(dict)
+    def get(self, user_id: str) -> Dict[str, Any]:
+        self._stats["reads"] += 1
+        with self._lock:
+            cached = self._cache.get(user_id)
+        if cached is not None and cached[0] > self._clock():
+            self._stats["cache_hits"] += 1
+            return dict(cached[1])
+        try:
+            raw = self.redis.hgetall(self.key(user_id))
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"[CONTEXT REDIS ERROR] {e}")
+            return dict(cached[1]) if cached is not None else {}
+        context = {_decode(k): _decode(v) for k, v in raw.items()}
+        if "last_updated" in context:
+            try:
+                context["last_updated"] = float(context["last_updated"])
+            except ValueError:
+                pass
+        self._cache_put(user_id, context)
+        return dict(context)
+
+    def update(self, user_id: str, fields: Dict[str, Any]):
+        from interfaces.api_server.core.log_index import index_session
+
+        mapping = {k: "" if v is None else str(v) for k, v in fields.items()}
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.key(user_id), mapping=mapping)
+        pipe.expire(self.key(user_id), int(self.ttl))
+        index_session(pipe, user_id)
+        try:
+            pipe.execute()
+            self._stats["writes"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"[CONTEXT REDIS ERROR] {e}")
+            return
+        # Read-your-writes in this worker; other workers see it after their cache TTL
+        with self._lock:
+            cached = self._cache.get(user_id)
+        if cached is not None:
+            self._cache_put(user_id, dict(cached[1], **fields))
+
+    def clear(self, user_id: str):
+        from interfaces.api_server.core.log_index import unindex_session
+
+        with self._lock:
+            self._cache.pop(user_id, None)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(self.key(user_id))
+        unindex_session(pipe, user_id)
+        pipe.execute()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, backend="redis", cached_users=len(self._cache), cache_ttl_seconds=self.cache_ttl)
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+def _make_store():
+    if CONTEXT_STORE == "redis":
+        try:
+            from interfaces.api_server.session import redis_client
+            return RedisContextStore(redis_client)
+        except ImportError as e:
+            print(f"[CONTEXT STORE ERROR] Redis unavailable, using memory: {e}")
+    return LocalContextStore()
+
+context_store = _make_store()
+
+# Pending updates of the current request, flushed by batched_updates()
+_pending: ContextVar[Optional[Dict[str, Dict[str, Any]]]] = ContextVar("pending_context_updates", default=None)
+
+def _flush(pending: Dict[str, Dict[str, Any]]):
+    for user_id, fields in pending.items():
+        context_store.update(user_id, fields)
+
+async def _offload(fn, *args):
+    if context_store.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+@contextmanager
+def batched_updates():
+    """Buffer update_context() calls and write them once per user on exit."""
+    pending: Dict[str, Dict[str, Any]] = {}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        _flush(pending)
+
+@asynccontextmanager
+async def batched_updates_async():
+    """batched_updates for coroutines: the buffered writes don't block the event loop."""
+    pending: Dict[str, Dict[str, Any]] = {}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        if pending:
+            await _offload(_flush, pending)
 
 def get_context(user_id: str) -> Dict[str, Any]:
-    return session_store[user_id]
+    context = context_store.get(user_id)
+    pending = _pending.get()
+    if pending and user_id in pending:
+        context.update(pending[user_id])
+    return context
+
+async def get_context_async(user_id: str) -> Dict[str, Any]:
+    """get_context for coroutines: a Redis read runs in a worker thread."""
+    context = await _offload(context_store.get, user_id)
+    pending = _pending.get()
+    if pending and user_id in pending:
+        context.update(pending[user_id])
+    return context
 
 def update_context(user_id: str, key: str, value: Any):
-    session_store[user_id][key] = value
-    session_store[user_id]["last_updated"] = time.time()
+    fields = {key: value, "last_updated": time.time()}
+    pending = _pending.get()
+    if pending is not None:
+        pending.setdefault(user_id, {}).update(fields)
+    else:
+        context_store.update(user_id, fields)
 
 def clear_context(user_id: str):
-    if user_id in session_store:
-        del session_store[user_id]
\ No newline at end of file
+    pending = _pending.get()
+    if pending:
+        pending.pop(user_id, None)
+    context_store.clear(user_id)
+
+def session_stats() -> Dict[str, Any]:
+    return context_store.stats()
@@ -14,8 +14,10 @@ class BasePlugin(ABC):
             return {
                 "name": "MyPlugin",
                 "version": "1.0",
-                "author": "Your Name"
+                "author": "Your Name",
+                "intents": ["my_intent"]  # optional: intents this plugin handles
             }
+        Declaring "intents" lets PluginManager index the plugin instead of probing should_handle().
         """
         raise NotImplementedError("Plugin must implement meta()")
 
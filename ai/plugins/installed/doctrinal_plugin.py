@@ -21,5 +21,6 @@ class Plugin(BasePlugin):
             "name": "DoctrinalPlugin",
             "description": "Answers philosophical and religious queries",
             "version": "1.0",
-            "author": "System"
+            "author": "System",
+            "intents": ["doctrine_query", "religion", "spirituality"]
         }
\ No newline at end of file
@@ -5,7 +5,8 @@ class Plugin(BasePlugin):
         return {
             "name": "HelloPlugin",
             "version": "1.0",
-            "author": "Subash"
+            "author": "Subash",
+            "intents": ["greet"]
         }
 
     def should_handle(self, intent: str) -> bool:
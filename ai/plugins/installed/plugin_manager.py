@@ -2,13 +2,28 @@
 
 import os
 import importlib.util
+from typing import Dict, List, Optional, Tuple
 from ai.plugins.base_plugin import BasePlugin
 
 PLUGIN_DIR = "ai/plugins/installed"
 
 class PluginManager:
-    def __init__(self):
+    """
+    Loads installed plugins and dispatches intents to them.
+
+    Plugins can list the intents they handle in meta()["intents"]; those go into an
+    intent-keyed dispatch index built at load time. Plugins without that key are
+    "dynamic": their should_handle() is probed on a cache miss and the answer is
+    memoized per intent, so selection cost doesn't grow with the number of plugins.
+    """
+
+    def __init__(self, plugin_dir: str = PLUGIN_DIR):
+        self.plugin_dir = plugin_dir
         self.plugins = []
+        self._names: Dict[int, str] = {}
+        self._index: Dict[str, Tuple[int, BasePlugin]] = {}
+        self._dynamic: List[Tuple[int, BasePlugin]] = []
+        self._dispatch_cache: Dict[str, Optional[BasePlugin]] = {}
         self.load_plugins()
 
     def load_plugins(self):
@@ -16,10 +31,11 @@ class PluginManager:
         Dynamically load all plugins from the installed directory.
         Only loads classes named 'Plugin' that inherit from BasePlugin.
         """
-        self.plugins.clear()  # Avoid duplicates on reload
-        for filename in os.listdir(PLUGIN_DIR):
+        plugins = []
+        names = {}
+        for filename in sorted(os.listdir(self.plugin_dir)):
             if filename.endswith(".py"):
-                path = os.path.join(PLUGIN_DIR, filename)
+                path = os.path.join(self.plugin_dir, filename)
                 plugin_name = filename[:-3]  # strip .py
 
                 spec = importlib.util.spec_from_file_location(plugin_name, path)
@@ -29,24 +45,61 @@ class PluginManager:
                     plugin_class = getattr(module, "Plugin", None)
                     if plugin_class and issubclass(plugin_class, BasePlugin):
                         instance = plugin_class()
-                        self.plugins.append(instance)
-                        print(f"✅ Loaded plugin: {instance.meta().get('name', plugin_name)}")
+                        names[id(instance)] = instance.meta().get("name", plugin_name)
+                        plugins.append(instance)
+                        print(f"✅ Loaded plugin: {names[id(instance)]}")
                     else:
                         print(f"❌ {plugin_name} does not define a valid Plugin class")
                 except Exception as e:
                     print(f"[Plugin Load Error] {plugin_name}: {e}")
+        self._build_index(plugins, names)
+
+    def _build_index(self, plugins: list, names: Dict[int, str]):
+        """Index declared intents; first plugin in load order wins, as with the linear scan."""
+        index: Dict[str, Tuple[int, BasePlugin]] = {}
+        dynamic: List[Tuple[int, BasePlugin]] = []
+        for position, plugin in enumerate(plugins):
+            try:
+                intents = plugin.meta().get("intents")
+            except Exception as e:
+                print(f"[Plugin Error] {names.get(id(plugin), 'unknown')}: {e}")
+                intents = None
+            if intents is None:
+                dynamic.append((position, plugin))
+                continue
+            for intent in intents:
+                index.setdefault(intent, (position, plugin))
+        # Swap everything in together so lookups never see a half-built index
+        self.plugins, self._names, self._index, self._dynamic, self._dispatch_cache = (
+            plugins, names, index, dynamic, {})
+
+    def plugin_name(self, plugin) -> str:
+        return self._names.get(id(plugin), "unknown")
 
     def get_plugin_for_intent(self, intent: str):
         """
         Return the first plugin instance that should handle the given intent.
         """
-        for plugin in self.plugins:
+        cache = self._dispatch_cache
+        try:
+            return cache[intent]
+        except KeyError:
+            pass
+
+        declared = self._index.get(intent)
+        limit = declared[0] if declared else len(self.plugins)
+        chosen = declared[1] if declared else None
+        for position, plugin in self._dynamic:
+            if position >= limit:
+                break
             try:
                 if plugin.should_handle(intent):
-                    return plugin
+                    chosen = plugin
+                    break
             except Exception as e:
-                print(f"[Plugin Error] {plugin.meta().get('name', 'unknown')}: {e}")
-        return None
+                print(f"[Plugin Error] {self.plugin_name(plugin)}: {e}")
+        cache[intent] = chosen
+        return chosen
 
     def run_plugin(self, intent: str, message: str, sender_id: str) -> str:
         """
@@ -57,7 +110,7 @@ class PluginManager:
             try:
                 return plugin.run(message, sender_id)
             except Exception as e:
-                print(f"[Plugin Run Error] {plugin.meta().get('name', 'unknown')}: {e}")
+                print(f"[Plugin Run Error] {self.plugin_name(plugin)}: {e}")
         return None
 
     def list_plugins(self) -> list:
@@ -66,8 +119,16 @@ class PluginManager:
         """
         return [p.meta() for p in self.plugins]
 
+    def dispatch_stats(self) -> dict:
+        return {
+            "plugins": len(self.plugins),
+            "indexed_intents": len(self._index),
+            "dynamic_plugins": len(self._dynamic),
+            "cached_intents": len(self._dispatch_cache),
+        }
+
     def reload_plugins(self):
         """
         Reload all plugins from the plugin directory.
         """
-        self.load_plugins()
\ No newline at end of file
+        self.load_plugins()
@@ -2,52 +2,201 @@
 Plugin Loader
 Dynamically maps intents to plugin handlers and executes them safely via sandbox_runner.
 Also provides per-user plugin enablement checks.
+
+Routing uses one compiled intent → plugin table merged from (in priority order):
+plugin_config.yaml, plugin_registry registrations, and installed PluginManager plugins.
+The table is rebuilt only when the YAML file or the registry changes (or on reload_plugin_routes()).
 """
 
+import hashlib
+import threading
+import time
 import yaml
 import os
+from typing import Any, Dict, Optional
+from ai.plugins import plugin_registry
+
+from interfaces.api_server.core.user_prefs import plugin_field, preference_store
+from ai.plugins.sandbox_runner import run_plugin_safe, run_plugin_safe_async
+
+PLUGIN_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "plugin_config.yaml")
+
+# Seconds between checks of plugin_config.yaml for changes
+PLUGIN_RELOAD_INTERVAL = float(os.getenv("PLUGIN_RELOAD_INTERVAL", "2"))
 
-# These should be imported or defined at the top level
 try:
-    from interfaces.api_server.session import redis_client as redis
-    USE_REDIS = True
-except ImportError:
-    redis = None
-    USE_REDIS = False
+    from ai.plugins.installed.plugin_manager import PluginManager
+    plugin_manager = PluginManager()
+except Exception as e:
+    print(f"[PLUGIN MANAGER ERROR] {e}")
+    plugin_manager = None
 
-# In-memory fallback for plugin toggles
-user_preferences = {}
+class PluginRoute:
+    """
+    Where an intent is routed. `handler` is set for installed (in-process) plugins;
+    otherwise `plugin_name` is a sandboxed module under ai/plugins.
+    """
+    __slots__ = ("intent", "plugin_name", "source", "handler")
 
-from ai.plugins.sandbox_runner import run_plugin_safe
+    def __init__(self, intent: str, plugin_name: str, source: str, handler: Any = None):
+        self.intent = intent
+        self.plugin_name = plugin_name
+        self.source = source
+        self.handler = handler
 
-PLUGIN_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "plugin_config.yaml")
+def _read_plugin_config(path: str) -> Dict[str, str]:
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
+
+def _installed_route(intent: str) -> Optional[PluginRoute]:
+    if plugin_manager is None:
+        return None
+    plugin = plugin_manager.get_plugin_for_intent(intent)
+    if plugin is None:
+        return None
+    return PluginRoute(intent, plugin_manager.plugin_name(plugin), "installed", plugin)
+
+def _config_signature(path: str):
+    """(mtime, size) of the config file, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class _RoutingState:
+    __slots__ = ("mapping", "routes", "signature", "digest", "registry_version", "built_at")
+
+    def __init__(self, mapping, routes, signature, digest, registry_version):
+        self.mapping = mapping
+        self.routes = routes
+        self.signature = signature
+        self.digest = digest
+        self.registry_version = registry_version
+        self.built_at = time.time()
+
+_routing: Optional[_RoutingState] = None
+_routing_lock = threading.Lock()
+_last_reload_check = 0.0
+_routing_stats = {"builds": 0, "lookups": 0, "probes": 0, "reload_errors": 0}
+
+def _build_routing(path: str, previous: Optional[_RoutingState]) -> _RoutingState:
+    signature = _config_signature(path)
+    raw = b""
+    if signature is not None:
+        with open(path, "rb") as f:
+            raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    version = plugin_registry.registry_version()
+
+    # Touched but unchanged file: keep the current table
+    if previous is not None and previous.digest == digest and previous.registry_version == version:
+        previous.signature = signature
+        return previous
+
+    mapping = (yaml.safe_load(raw) or {}) if raw else {}
+    routes: Dict[str, Optional[PluginRoute]] = {}
+    for intent, plugin_names in plugin_registry.registered_intents().items():
+        if plugin_names:
+            routes[intent] = PluginRoute(intent, plugin_names[0], "registry")
+    for intent, plugin_name in mapping.items():
+        routes[intent] = PluginRoute(intent, plugin_name, "config")
+    _routing_stats["builds"] += 1
+    return _RoutingState(mapping, routes, signature, digest, version)
 
-def load_plugin_mapping():
-    with open(PLUGIN_CONFIG_PATH, "r") as f:
-        return yaml.safe_load(f)
+def _current_routing() -> _RoutingState:
+    """Return the routing state, rebuilding it if the config file or registry changed."""
+    global _routing, _last_reload_check
+    state = _routing
+    now = time.monotonic()
+    stale = state is None or state.registry_version != plugin_registry.registry_version()
+    if not stale and now - _last_reload_check >= PLUGIN_RELOAD_INTERVAL:
+        _last_reload_check = now
+        stale = _config_signature(PLUGIN_CONFIG_PATH) != state.signature
+    if stale:
+        with _routing_lock:
+            if _routing is state:
+                try:
+                    _routing = _build_routing(PLUGIN_CONFIG_PATH, state)
+                except (OSError, yaml.YAMLError, AttributeError) as e:
+                    # A broken file keeps the previous table in service
+                    _routing_stats["reload_errors"] += 1
+                    print(f"[PLUGIN RELOAD ERROR] {e}")
+                    if state is None:
+                        _routing = _RoutingState({}, {}, None, "", plugin_registry.registry_version())
+            state = _routing
+    return state
+
+def load_plugin_mapping() -> Dict[str, str]:
+    """The intent → plugin mapping from plugin_config.yaml (cached; reloaded when the file changes)."""
+    return _current_routing().mapping
+
+def get_plugin_route(intent: str) -> Optional[PluginRoute]:
+    """
+    Route for an intent, or None. Intents not covered by the config or registry are probed
+    against the installed plugins once and the answer is memoized until the next rebuild.
+    """
+    state = _current_routing()
+    _routing_stats["lookups"] += 1
+    try:
+        return state.routes[intent]
+    except KeyError:
+        pass
+    _routing_stats["probes"] += 1
+    route = _installed_route(intent)
+    state.routes[intent] = route
+    return route
+
+def reload_plugin_routes() -> Dict[str, Any]:
+    """Force a rebuild of the routing table (and reload installed plugins)."""
+    global _routing
+    if plugin_manager is not None:
+        plugin_manager.reload_plugins()
+    with _routing_lock:
+        _routing = _build_routing(PLUGIN_CONFIG_PATH, None)
+    return plugin_routes_stats()
+
+def plugin_routes_stats() -> Dict[str, Any]:
+    state = _current_routing()
+    routes = {intent: {"plugin": r.plugin_name, "source": r.source}
+              for intent, r in list(state.routes.items()) if r is not None}
+    return dict(_routing_stats, routes=routes, built_at=state.built_at)
 
 def is_plugin_enabled(user_id: str, plugin_name: str) -> bool:
     """
     Check if a plugin is enabled for a specific user.
-    Uses Redis if available, otherwise falls back to in-memory.
+    Reads the user's cached preference snapshot (see core/user_prefs.py).
     """
-    key = f"plugin:{user_id}:{plugin_name}"
-    if USE_REDIS and redis:
-        val = redis.get(key)
-        return bool(int(val)) if val else False
-    return user_preferences.get(key, False)
+    return preference_store.get(user_id, plugin_field(plugin_name), False)
+
+def _resolve_plugin(intent: str, user_id: str):
+    """Return (plugin_name, None) if the mapped plugin may run, else (None, reply explaining why)."""
+    route = get_plugin_route(intent)
+    if route is None or route.handler is not None:
+        return None, f"❌ No plugin mapped for intent: {intent}"
+    plugin_name = route.plugin_name
+
+    if not is_plugin_enabled(user_id, plugin_name):
+        return None, f"🚫 Plugin '{plugin_name}' is disabled for this user."
+    return plugin_name, None
 
 def handle_with_plugin(intent: str, user_input: str, user_id: str) -> str:
     """
     Handles user input with the mapped plugin if enabled for the user.
     """
-    plugin_map = load_plugin_mapping()
-    plugin_name = plugin_map.get(intent)
+    plugin_name, reply = _resolve_plugin(intent, user_id)
     if not plugin_name:
-        return f"❌ No plugin mapped for intent: {intent}"
-
-    if not is_plugin_enabled(user_id, plugin_name):
-        return f"🚫 Plugin '{plugin_name}' is disabled for this user."
+        return reply
 
     response = run_plugin_safe(plugin_name, user_input)
-    return response
\ No newline at end of file
+    return response
+
+async def handle_with_plugin_async(intent: str, user_input: str, user_id: str) -> str:
+    """
+    Async variant of handle_with_plugin: waits for the sandbox worker without blocking the event loop.
+    """
+    plugin_name, reply = _resolve_plugin(intent, user_id)
+    if not plugin_name:
+        return reply
+
+    return await run_plugin_safe_async(plugin_name, user_input)
@@ -14,12 +14,29 @@ _intent_plugin_map = defaultdict(set)  # intent -> set of plugin names
 # In-memory per-user plugin enablement
 _user_plugin_enabled = defaultdict(set)  # user_id -> set of enabled plugin names
 
+# Bumped on every registration so routing tables built from _intent_plugin_map know to rebuild
+_registry_version = 0
+
 def register_plugin_intents(plugin_name: str, intents: list[str]):
     """
     Register a plugin as handling a list of intents.
     """
+    global _registry_version
     for intent in intents:
         _intent_plugin_map[intent].add(plugin_name)
+    _registry_version += 1
+
+def registry_version() -> int:
+    """
+    Return a counter that changes whenever intent registrations change.
+    """
+    return _registry_version
+
+def registered_intents() -> dict:
+    """
+    Return a snapshot of the intent -> plugin names registrations.
+    """
+    return {intent: sorted(plugins) for intent, plugins in _intent_plugin_map.items()}
 
 def get_plugins_for_intent(intent: str) -> list[str]:
     """
@@ -1,37 +1,236 @@
 # File: ai/plugins/sandbox_runner.py
 
 """
-Safely executes plugin logic in a subprocess.
+Safely executes plugin logic in sandbox worker processes.
 Accepts plugin name and input text.
 Prevents main app from crashing due to plugin failures.
+
+Workers are started once and kept warm, so plugin modules stay imported between calls.
+Each call is bounded by a timeout (and so is the wait for a free worker); a worker that
+times out or crashes is replaced, and every worker is recycled after SANDBOX_MAX_CALLS calls.
+
+Because workers are reused, module-level state a plugin keeps (globals, caches, open
+clients) survives from one call to the next, across users, until the worker is recycled.
+Plugins must not keep per-user data in module state; set SANDBOX_MAX_CALLS=1 to give
+every call a fresh process, as before the pool existed (at the cost of a process start
+per call).
 """
 
-from multiprocessing import Process, Pipe
+import asyncio
 import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
 import traceback
+from typing import Any, Dict, Optional
+
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "4"))
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "3"))
+SANDBOX_MAX_CALLS = int(os.getenv("SANDBOX_MAX_CALLS", "500"))
+
+PLUGIN_TIMEOUT_REPLY = "[PLUGIN TIMEOUT] Plugin execution took too long."
+PLUGIN_NO_RESPONSE_REPLY = "[PLUGIN ERROR] No response from plugin."
 
-def run_plugin_safe(plugin_name: str, input_text: str, timeout=3) -> str:
-    def worker(conn):
+def _worker_loop(conn, module_prefix: str):
+    """Worker process: import plugins on first use and serve (plugin_name, input_text) requests."""
+    while True:
         try:
-            plugin = importlib.import_module(f"ai.plugins.{plugin_name}")
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        plugin_name, input_text = request
+        try:
+            plugin = importlib.import_module(f"{module_prefix}.{plugin_name}")
             result = plugin.handle(input_text)
-            conn.send(result)
         except Exception as e:
             tb = traceback.format_exc()
-            conn.send(f"[PLUGIN ERROR] {e}\n{tb}")
+            result = f"[PLUGIN ERROR] {e}\n{tb}"
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send(f"[PLUGIN ERROR] Unsendable result: {e}")
+    conn.close()
+
+class _Worker:
+    __slots__ = ("process", "conn", "calls")
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.calls = 0
+
+class SandboxPool:
+    """
+    Pool of pre-started sandbox processes.
+    run() blocks the calling thread; arun() runs it in a worker thread for async callers.
+    """
+
+    def __init__(self, size: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT,
+                 max_calls: int = SANDBOX_MAX_CALLS, module_prefix: str = "ai.plugins",
+                 start_method: Optional[str] = None):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.max_calls = max_calls
+        self.module_prefix = module_prefix
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        # Workers lost because a replacement could not be started; respawned on a later call
+        self._missing = 0
+        self._stats = {"calls": 0, "timeouts": 0, "queue_timeouts": 0, "crashes": 0, "recycled": 0,
+                       "spawn_errors": 0, "waiting": 0, "busy": 0}
+        self._plugin_stats: Dict[str, Dict[str, float]] = {}
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_loop, args=(child_conn, self.module_prefix), daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _try_spawn(self) -> Optional[_Worker]:
+        try:
+            return self._spawn()
+        except Exception as e:
+            with self._lock:
+                self._stats["spawn_errors"] += 1
+            print(f"[SANDBOX ERROR] Could not start a worker: {e}")
+            return None
+
+    def _release(self, worker: Optional[_Worker]):
+        """Return a live worker to the pool, or remember that one is missing."""
+        if worker is not None:
+            self._idle.put(worker)
+            return
+        with self._lock:
+            self._missing += 1
+
+    def _refill(self):
+        with self._lock:
+            missing, self._missing = self._missing, 0
+        for _ in range(missing):
+            self._release(self._try_spawn())
+
+    def start(self):
+        """Start the workers (done lazily on first call otherwise)."""
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+            self._started = True
+
+    def _retire(self, worker: _Worker, counter: str):
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(1)
+        worker.conn.close()
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _record(self, plugin_name: str, elapsed: float, outcome: str):
+        with self._lock:
+            stats = self._plugin_stats.setdefault(
+                plugin_name, {"calls": 0, "errors": 0, "timeouts": 0, "latency_seconds_total": 0.0})
+            stats["calls"] += 1
+            stats["latency_seconds_total"] += elapsed
+            if outcome != "ok":
+                stats[outcome] += 1
+
+    def run(self, plugin_name: str, input_text: str, timeout: Optional[float] = None) -> str:
+        """Run plugin `handle(input_text)` in a warm worker and return its reply (or an error reply)."""
+        self.start()
+        if self._missing:
+            self._refill()
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            self._stats["waiting"] += 1
+        try:
+            # Bounded so a burst of calls can't pin every executor thread behind busy workers
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["queue_timeouts"] += 1
+            self._record(plugin_name, timeout, "timeouts")
+            return PLUGIN_TIMEOUT_REPLY
+        finally:
+            with self._lock:
+                self._stats["waiting"] -= 1
+        with self._lock:
+            self._stats["busy"] += 1
+            self._stats["calls"] += 1
+
+        start = time.perf_counter()
+        try:
+            worker.calls += 1
+            worker.conn.send((plugin_name, input_text))
+            if not worker.conn.poll(timeout):
+                self._record(plugin_name, time.perf_counter() - start, "timeouts")
+                self._retire(worker, "timeouts")
+                return PLUGIN_TIMEOUT_REPLY
+            result = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            # Worker died mid-call (e.g. the plugin crashed the interpreter)
+            self._record(plugin_name, time.perf_counter() - start, "errors")
+            self._retire(worker, "crashes")
+            return PLUGIN_NO_RESPONSE_REPLY
         finally:
-            conn.close()
+            if not worker.conn.closed and not worker.process.is_alive():
+                self._retire(worker, "crashes")
+            elif not worker.conn.closed and worker.calls >= self.max_calls:
+                self._retire(worker, "recycled")
+            # Only a live worker goes back; a retired one is replaced (or counted missing if that fails)
+            self._release(worker if not worker.conn.closed else self._try_spawn())
+            with self._lock:
+                self._stats["busy"] -= 1
+
+        failed = isinstance(result, str) and result.startswith("[PLUGIN ERROR]")
+        self._record(plugin_name, time.perf_counter() - start, "errors" if failed else "ok")
+        return result
+
+    async def arun(self, plugin_name: str, input_text: str, timeout: Optional[float] = None) -> str:
+        """Async variant of run() for the router; the event loop is not blocked while waiting."""
+        return await asyncio.to_thread(self.run, plugin_name, input_text, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            plugins = {}
+            for name, values in self._plugin_stats.items():
+                plugins[name] = dict(values)
+                plugins[name]["avg_latency_seconds"] = values["latency_seconds_total"] / values["calls"]
+        stats.update({"workers": self.size - self._missing if self._started else 0, "queue_depth": stats["waiting"],
+                      "idle": self._idle.qsize(), "plugins": plugins})
+        return stats
 
-    parent_conn, child_conn = Pipe()
-    p = Process(target=worker, args=(child_conn,))
-    p.start()
-    p.join(timeout)
+    def shutdown(self):
+        """Stop all idle workers (call on app shutdown)."""
+        with self._lock:
+            self._started = False
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
 
-    if p.is_alive():
-        p.terminate()
-        return "[PLUGIN TIMEOUT] Plugin execution took too long."
+# Process-wide pool used by the plugin loader
+sandbox_pool = SandboxPool()
 
-    if parent_conn.poll():
-        return parent_conn.recv()
+def run_plugin_safe(plugin_name: str, input_text: str, timeout=SANDBOX_TIMEOUT) -> str:
+    return sandbox_pool.run(plugin_name, input_text, timeout)
 
-    return "[PLUGIN ERROR] No response from plugin."
\ No newline at end of file
+async def run_plugin_safe_async(plugin_name: str, input_text: str, timeout=SANDBOX_TIMEOUT) -> str:
+    return await sandbox_pool.arun(plugin_name, input_text, timeout)
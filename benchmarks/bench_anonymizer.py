@@ -0,0 +1,74 @@
+"""
+bench_anonymizer.py - PII anonymizer throughput (MB/s) over a synthetic chat/log corpus
+
+Compares the previous two-pass re.sub anonymizer (10-digit phones + simple emails only)
+with the compiled single-pass PrivacyEngine (all rules), per message and in batch mode.
+
+Usage:
+    python -m benchmarks.bench_anonymizer --mb 20 --pii-rate 0.2
+"""
+
+import argparse
+import random
+import re
+import time
+
+from client.privacy.anonymizer import PrivacyEngine
+
+WORDS = ("hello can you help me with my order please the delivery was late and I want a refund "
+         "today tomorrow thanks great account password reset issue support team ticket").split()
+
+PII = [
+    lambda r: f"user{r.randint(1, 999)}@example.com",
+    lambda r: "".join(str(r.randint(0, 9)) for _ in range(10)),
+    lambda r: f"+1 ({r.randint(200, 999)}) {r.randint(200, 999)}-{r.randint(1000, 9999)}",
+    lambda r: "4111 1111 1111 1111",
+    lambda r: f"192.168.{r.randint(0, 255)}.{r.randint(0, 255)}",
+    lambda r: f"my name is {r.choice(['John', 'Asha', 'Wei', 'Maria'])}",
+]
+
+def legacy_anonymize(message: str) -> str:
+    message = re.sub(r"\b\d{10}\b", "[PHONE]", message)
+    message = re.sub(r"\b\w+@\w+\.\w+\b", "[EMAIL]", message)
+    return message
+
+def make_corpus(megabytes: float, pii_rate: float, rng: random.Random) -> list:
+    lines, size = [], 0
+    target = megabytes * 1024 * 1024
+    while size < target:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 24))]
+        if rng.random() < pii_rate:
+            words.insert(rng.randrange(len(words)), rng.choice(PII)(rng))
+        line = " ".join(words)
+        lines.append(line)
+        size += len(line) + 1
+    return lines
+
+def throughput(fn, lines: list, megabytes: float) -> float:
+    start = time.perf_counter()
+    fn(lines)
+    return megabytes / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=20)
+    parser.add_argument("--pii-rate", type=float, default=0.2, help="share of lines containing PII")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = make_corpus(args.mb, args.pii_rate, random.Random(args.seed))
+    megabytes = sum(len(line) + 1 for line in lines) / (1024 * 1024)
+    engine = PrivacyEngine()
+
+    results = {
+        "legacy 2-pass (phones/emails only)": throughput(lambda ls: [legacy_anonymize(l) for l in ls], lines, megabytes),
+        "engine.anonymize per message": throughput(lambda ls: [engine.anonymize(l) for l in ls], lines, megabytes),
+        "engine.anonymize_many (batch)": throughput(lambda ls: list(engine.anonymize_many(ls)), lines, megabytes),
+        "engine.anonymize_with_report": throughput(lambda ls: [engine.anonymize_with_report(l) for l in ls], lines, megabytes),
+    }
+    print(f"corpus: {megabytes:.1f} MB, {len(lines)} lines, {args.pii_rate:.0%} with PII")
+    for name, mbps in results.items():
+        print(f"{name:<38} {mbps:7.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+bench_intent_classifier.py - IntentIndex vs. the legacy difflib scan
+
+Generates a synthetic intents.json with ~10k patterns, then times both classifiers
+on the same queries and reports their agreement.
+
+Usage:
+    python -m benchmarks.bench_intent_classifier --intents 500 --patterns 20 --queries 300
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+from ai.core_nlp.intent_classifier import (
+    IntentIndex,
+    classify_intent_difflib,
+    load_intents,
+    normalize_message,
+)
+
+COMMON_WORDS = ["i", "my", "the", "a", "to", "can", "you", "please", "need", "want", "how", "is", "for"]
+SYLLABLES = ["ka", "lo", "mi", "ser", "tan", "vu", "pre", "dor", "xel", "qui", "bra", "nom", "ty", "gla", "fen"]
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+def make_intents(n_intents: int, n_patterns: int, rng: random.Random) -> list:
+    """Each intent gets its own small topic vocabulary plus shared filler words."""
+    intents = []
+    for i in range(n_intents):
+        topic = [make_word(rng) for _ in range(6)]
+        patterns = []
+        for _ in range(n_patterns):
+            words = [rng.choice(topic) for _ in range(rng.randint(1, 3))]
+            words += [rng.choice(COMMON_WORDS) for _ in range(rng.randint(1, 3))]
+            rng.shuffle(words)
+            patterns.append(" ".join(words))
+        intents.append({"tag": f"intent_{i}", "patterns": patterns, "responses": [f"reply {i}"]})
+    return intents
+
+def typo(text: str, rng: random.Random) -> str:
+    chars = list(text)
+    pos = rng.randrange(len(chars))
+    chars[pos] = rng.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+def make_queries(intents: list, n_queries: int, rng: random.Random) -> list:
+    patterns = [p for intent in intents for p in intent["patterns"]]
+    queries = []
+    for i in range(n_queries):
+        kind = i % 3
+        if kind == 0:
+            queries.append(rng.choice(patterns))
+        elif kind == 1:
+            queries.append(typo(rng.choice(patterns), rng))
+        else:
+            queries.append(" ".join(make_word(rng) for _ in range(rng.randint(1, 6))))
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--intents", type=int, default=500)
+    parser.add_argument("--patterns", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "intents.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(make_intents(args.intents, args.patterns, rng), f)
+        intents = load_intents(path)
+
+    queries = make_queries(intents, args.queries, rng)
+
+    start = time.perf_counter()
+    index = IntentIndex(intents)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = [index.classify(normalize_message(q))[0] for q in queries]
+    indexed_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = [classify_intent_difflib(q, intents) for q in queries]
+    legacy_s = time.perf_counter() - start
+
+    agree = sum(a == b for a, b in zip(indexed, legacy))
+    print(f"patterns:        {len(index)}")
+    print(f"index build:     {build_s * 1000:.1f} ms")
+    print(f"difflib scan:    {legacy_s / len(queries) * 1000:.3f} ms/query")
+    print(f"indexed:         {indexed_s / len(queries) * 1000:.3f} ms/query")
+    print(f"speedup:         {legacy_s / indexed_s:.1f}x")
+    print(f"agreement:       {agree}/{len(queries)}")
+
+if __name__ == "__main__":
+    main()
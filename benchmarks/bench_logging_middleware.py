@@ -0,0 +1,133 @@
+"""
+bench_logging_middleware.py - Requests/sec for /generate-reply with and without request logging
+
+Runs a minimal app (same route shape as chat.generate_reply, no AI work) in-process via
+httpx's ASGI transport and compares:
+- none:   no logging middleware
+- legacy: the previous BaseHTTPMiddleware logger (reads the JSON body, synchronous LPUSH/LTRIM).
+          On Starlette 0.27 a route that reads the body again after it hangs, so in this
+          mode the route skips its own body read (which flatters the legacy numbers).
+- asgi:   RequestLoggerMiddleware with the background Redis writer
+Redis is simulated with a fixed per-round-trip delay (--redis-rtt-ms).
+
+Usage:
+    python -m benchmarks.bench_logging_middleware --requests 3000 --concurrency 32 --redis-rtt-ms 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from interfaces.api_server.core.log_index import index_log_entry
+from interfaces.api_server.core.redis_writer import RedisWriter
+from interfaces.middleware.logging import RequestLoggerMiddleware
+
+class SlowRedis:
+    """Accepts the commands the loggers send and sleeps `rtt` per round trip."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.round_trips = 0
+
+    def _round_trip(self, *args, **kwargs):
+        self.round_trips += 1
+        time.sleep(self.rtt)
+
+    lpush = ltrim = _round_trip
+
+    def pipeline(self, transaction=True):
+        return SlowPipeline(self)
+
+class SlowPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def execute(self):
+        self.redis._round_trip()
+
+def make_legacy_middleware(redis):
+    class LegacyRequestLogger(BaseHTTPMiddleware):
+        async def dispatch(self, request: Request, call_next):
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            sender_id = None
+            if request.url.path.endswith("/generate-reply"):
+                try:
+                    body = await request.json()
+                    sender_id = body.get("sender_id")
+                except Exception:
+                    sender_id = "anonymous"
+            response = await call_next(request)
+            if request.url.path.endswith("/generate-reply"):
+                log_entry = {"timestamp": timestamp, "sender_id": sender_id or "unknown",
+                             "event": "reply_sent", "status_code": response.status_code}
+                redis.lpush(f"logs:{sender_id}", json.dumps(log_entry))
+                redis.ltrim(f"logs:{sender_id}", 0, 49)
+            return response
+    return LegacyRequestLogger
+
+def make_app(mode: str, redis) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/generate-reply")
+    async def generate_reply(request: Request):
+        if mode != "legacy":
+            payload = await request.json()
+            request.state.sender_id = payload.get("sender_id")
+        return {"reply": "ok", "intent": "greet", "tone": "neutral"}
+
+    if mode == "legacy":
+        app.add_middleware(make_legacy_middleware(redis))
+    elif mode == "asgi":
+        writer = RedisWriter(redis, flush_interval=0.01)
+
+        def sink(entry):
+            writer.push_capped(f"logs:{entry['sender_id']}", json.dumps(entry), 50)
+            writer.call(index_log_entry, entry)
+
+        app.add_middleware(RequestLoggerMiddleware, sink=sink)
+        app.state.writer = writer
+    return app
+
+async def run(app: FastAPI, n_requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        payload = {"sender_id": "u1", "receiver_id": "bot", "message": "hello there"}
+        await client.post("/api/generate-reply", json=payload)  # warm-up
+        remaining = n_requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.post("/api/generate-reply", json=payload)
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return n_requests / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--redis-rtt-ms", type=float, default=0.3)
+    args = parser.parse_args()
+
+    for mode in ("none", "legacy", "asgi"):
+        redis = SlowRedis(args.redis_rtt_ms / 1000)
+        app = make_app(mode, redis)
+        rps = asyncio.run(run(app, args.requests, args.concurrency))
+        if mode == "asgi":
+            app.state.writer.stop()
+        print(f"{mode:>7}: {rps:8.0f} req/s   redis round trips: {redis.round_trips}")
+
+if __name__ == "__main__":
+    main()
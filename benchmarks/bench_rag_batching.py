@@ -0,0 +1,172 @@
+"""
+bench_rag_batching.py - RAG retrieval throughput with and without micro-batching
+
+For each concurrency level, N clients issue queries back to back:
+- single:  every query runs retriever.search() (one embedding call, one similarity_search)
+           on its own thread, like the old asyncio.to_thread(search_documents) path
+- batched: every query awaits the MicroBatcher, which embeds the waiting queries in one
+           call and runs one index.search over the query matrix
+Reports queries/sec, latency percentiles and the average batch size.
+
+--backend real loads the app's DocumentRetriever (MiniLM + the FAISS store at --index;
+needs langchain, sentence-transformers and faiss). --backend synthetic (the default) needs
+only NumPy: a small MLP over hashed tokens stands in for the embedding model (a GEMV per
+query vs a GEMM per batch, like a transformer on CPU) and a flat L2 index over --docs
+random vectors (faiss.IndexFlatL2 if installed, NumPy otherwise) for the store.
+
+Usage:
+    python -m benchmarks.bench_rag_batching --concurrency 1,8,64 --queries 2000
+    python -m benchmarks.bench_rag_batching --backend real --index vector_store/index
+"""
+
+import argparse
+import asyncio
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ai.fallback.micro_batch import MicroBatcher
+from ai.fallback.rag_search import DocumentRetriever
+from benchmarks.load_test import summarize
+
+QUERIES = [
+    "how do I reset my password", "what are the opening hours", "refund policy for damaged items",
+    "can I change my delivery address", "where is my order", "how to contact support",
+    "do you ship internationally", "how long does shipping take", "cancel my subscription",
+    "update billing information", "is there a student discount", "how do I export my data",
+]
+
+class SyntheticEmbeddings:
+    """Hashed bag of words -> dense MLP -> `dim` floats."""
+
+    def __init__(self, dim: int = 384, hidden: int = 1536, vocab: int = 4096, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.vocab = vocab
+        self.w1 = rng.standard_normal((vocab, hidden), dtype=np.float32) / np.sqrt(vocab)
+        self.w2 = rng.standard_normal((hidden, dim), dtype=np.float32) / np.sqrt(hidden)
+
+    def embed_documents(self, texts):
+        bags = np.zeros((len(texts), self.vocab), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                bags[row, zlib.crc32(token.encode()) % self.vocab] += 1.0
+        return np.maximum(bags @ self.w1, 0) @ self.w2
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class NumpyFlatIndex:
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.norms = (vectors ** 2).sum(axis=1)
+        self.ntotal, self.d = vectors.shape
+
+    def search(self, queries: np.ndarray, k: int):
+        distances = self.norms[None, :] - 2 * queries @ self.vectors.T + (queries ** 2).sum(axis=1)[:, None]
+        ids = np.argpartition(distances, k, axis=1)[:, :k]
+        order = np.take_along_axis(distances, ids, axis=1).argsort(axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        return np.take_along_axis(distances, ids, axis=1), ids
+
+class SyntheticDoc:
+    def __init__(self, text):
+        self.page_content = text
+
+class SyntheticDocstore:
+    def search(self, doc_id):
+        return SyntheticDoc(doc_id)
+
+class SyntheticStore:
+    """Same attributes as langchain's FAISS store, which search_batch reads."""
+
+    def __init__(self, embeddings: SyntheticEmbeddings, docs: int, dim: int, seed: int = 1):
+        vectors = np.random.default_rng(seed).standard_normal((docs, dim), dtype=np.float32)
+        try:
+            import faiss
+            self.index = faiss.IndexFlatL2(dim)
+            self.index.add(vectors)
+        except ImportError:
+            self.index = NumpyFlatIndex(vectors)
+        self.embeddings = embeddings
+        self.index_to_docstore_id = {i: f"chunk {i}" for i in range(docs)}
+        self.docstore = SyntheticDocstore()
+
+    def similarity_search(self, query: str, k: int = 3):
+        vector = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        _, ids = self.index.search(vector, k)
+        return [self.docstore.search(self.index_to_docstore_id[i]) for i in ids[0] if i != -1]
+
+def make_retriever(args) -> DocumentRetriever:
+    if args.backend == "real":
+        return DocumentRetriever(index_path=args.index)
+    embeddings = SyntheticEmbeddings(dim=args.dim)
+    store = SyntheticStore(embeddings, args.docs, args.dim)
+    return DocumentRetriever(index_path=args.index, embeddings_loader=lambda name: embeddings,
+                             store_loader=lambda path, emb: store, reload_check_interval=3600)
+
+async def run_single(retriever: DocumentRetriever, concurrency: int, total: int, k: int):
+    loop = asyncio.get_running_loop()
+    latencies = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        async def client(offset: int):
+            for i in range(offset, total, concurrency):
+                start = time.perf_counter()
+                await loop.run_in_executor(pool, retriever.search, QUERIES[i % len(QUERIES)], k)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(c) for c in range(concurrency)))
+        return summarize(latencies, time.perf_counter() - start, 0)
+
+async def run_batched(batcher: MicroBatcher, concurrency: int, total: int):
+    latencies = []
+
+    async def client(offset: int):
+        for i in range(offset, total, concurrency):
+            start = time.perf_counter()
+            await batcher.run(QUERIES[i % len(QUERIES)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, 0)
+
+def report(mode: str, concurrency: int, result, avg_batch: float = 1.0):
+    latency = result["latency_ms"]
+    print(f"  {mode:<8} c={concurrency:<4} {result['requests_per_second']:8.0f} q/s   "
+          f"p50 {latency['p50']:7.2f} ms   p99 {latency['p99']:7.2f} ms   avg batch {avg_batch:5.1f}")
+
+async def run(args):
+    retriever = make_retriever(args)
+    retriever.load()
+    retriever.search_batch(QUERIES, k=args.k)  # warm up (BLAS threads, model caches)
+    print(f"backend {args.backend}: {retriever.stats().get('index_vectors', '?')} vectors, "
+          f"max batch {args.max_batch}, max wait {args.max_wait_ms} ms")
+    for concurrency in args.concurrency:
+        total = max(args.queries, concurrency)
+        if not args.batched_only:
+            report("single", concurrency, await run_single(retriever, concurrency, total, args.k))
+        batcher = MicroBatcher(lambda queries: retriever.search_batch(queries, k=args.k),
+                               max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+        result = await run_batched(batcher, concurrency, total)
+        report("batched", concurrency, result, batcher.stats()["avg_batch"])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("synthetic", "real"), default="synthetic")
+    parser.add_argument("--index", default="vector_store/index")
+    parser.add_argument("--docs", type=int, default=50000, help="synthetic index size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 8, 64])
+    parser.add_argument("--queries", type=int, default=2000, help="queries per concurrency level and mode")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2)
+    parser.add_argument("--batched-only", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
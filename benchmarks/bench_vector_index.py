@@ -0,0 +1,168 @@
+"""
+bench_vector_index.py - Recall vs latency vs memory: flat in-RAM index against the mmap IVF store
+
+Generates --vectors clustered embeddings (--dim floats, like MiniLM chunks of a corpus) and
+--queries queries (corpus points moved by noise), computes the exact top-k, then measures
+in a fresh process per configuration (so RSS is not shared between them):
+- flat:  all float32 vectors loaded into RAM and scanned (faiss.IndexFlatL2 if installed,
+         NumPy otherwise), i.e. what FAISS.load_local gives today
+- mmap:  ai.fallback.mmap_index built with each --dtypes, queried at each --nprobe
+Reported per configuration: recall@k against the exact result, single-query latency p50/p99,
+batched throughput (--batch queries per search call), RSS added by loading + querying (the
+mmap pages touched count), and size on disk.
+
+Usage:
+    python -m benchmarks.bench_vector_index --vectors 200000 --nprobe 1,4,16,64 --dtypes int8,float16
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.bench_ws_hub import rss_mb
+from benchmarks.load_test import summarize
+
+def make_dataset(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 65536):
+        n = min(65536, count - start)
+        vectors[start:start + n] = (centers[rng.integers(0, clusters, n)]
+                                    + 0.35 * rng.standard_normal((n, dim), dtype=np.float32))
+    return vectors
+
+def exact_top(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    norms = (vectors ** 2).sum(axis=1)
+    best_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_i = np.full((len(queries), k), -1, dtype=np.int64)
+    for start in range(0, len(vectors), 65536):
+        block = vectors[start:start + 65536]
+        distances = norms[None, start:start + len(block)] - 2 * queries @ block.T
+        d = np.concatenate([best_d, distances], axis=1)
+        i = np.concatenate([best_i, np.broadcast_to(np.arange(start, start + len(block)), distances.shape)], axis=1)
+        top = np.argpartition(d, k - 1, axis=1)[:, :k]
+        best_d, best_i = np.take_along_axis(d, top, axis=1), np.take_along_axis(i, top, axis=1)
+    return best_i
+
+class FlatIndex:
+    def __init__(self, vectors: np.ndarray):
+        try:
+            import faiss
+            self.index = faiss.IndexFlatL2(vectors.shape[1])
+            self.index.add(vectors)
+        except ImportError:
+            self.index = None
+            self.vectors = vectors
+            self.norms = (vectors ** 2).sum(axis=1)
+
+    def search(self, queries: np.ndarray, k: int):
+        if self.index is not None:
+            return self.index.search(queries, k)
+        distances = self.norms[None, :] - 2 * queries @ self.vectors.T
+        ids = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        return np.take_along_axis(distances, ids, axis=1), ids
+
+def disk_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2 ** 20
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2 ** 20
+
+def measure(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs in a fresh process: load the index, query it, report recall/latency/RSS."""
+    queries = np.load(config["queries"])
+    truth = np.load(config["truth"])
+    k, batch = config["k"], config["batch"]
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    if config["kind"] == "flat":
+        index = FlatIndex(np.load(config["vectors"]))
+        search = index.search
+    else:
+        from ai.fallback.mmap_index import MmapVectorStore
+        index = MmapVectorStore(config["path"], nprobe=config["nprobe"]).index
+        search = index.search
+    load_seconds = time.perf_counter() - start
+
+    latencies, found = [], []
+    for query in queries:
+        began = time.perf_counter()
+        _, ids = search(query[None, :], k)
+        latencies.append(time.perf_counter() - began)
+        found.append(ids[0])
+    began = time.perf_counter()
+    for offset in range(0, len(queries), batch):
+        search(queries[offset:offset + batch], k)
+    batched_qps = len(queries) / (time.perf_counter() - began)
+
+    recall = np.mean([len(set(t) & set(f)) / k for t, f in zip(truth.tolist(), np.asarray(found).tolist())])
+    latency = summarize(latencies, 1.0, 0)["latency_ms"]
+    return {"recall": recall, "p50_ms": latency["p50"], "p99_ms": latency["p99"], "batched_qps": batched_qps,
+            "rss_mb": rss_mb() - base_rss, "load_seconds": load_seconds}
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_vector_index_")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        vectors = make_dataset(args.vectors, args.dim, args.clusters, seed=0)
+        # Queries land near the corpus but are not in it
+        rng = np.random.default_rng(1)
+        queries = (vectors[rng.integers(0, len(vectors), args.queries)]
+                   + 0.35 * rng.standard_normal((args.queries, args.dim), dtype=np.float32))
+        truth = exact_top(vectors, queries, args.k)
+        paths = {name: os.path.join(workdir, f"{name}.npy") for name in ("vectors", "queries", "truth")}
+        for name, array in (("vectors", vectors), ("queries", queries), ("truth", truth)):
+            np.save(paths[name], array)
+        print(f"{args.vectors} x {args.dim} vectors, {args.queries} queries, exact top-{args.k} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        from ai.fallback.mmap_index import build_index
+        records = [(f"chunk {i}", {}) for i in range(len(vectors))]
+        configs: List[Dict[str, Any]] = [dict(paths, kind="flat", name="flat float32", disk=disk_mb(paths["vectors"]))]
+        for dtype in args.dtypes:
+            path = os.path.join(workdir, f"mmap_{dtype}")
+            start = time.perf_counter()
+            meta = build_index(path, vectors, records, nlist=args.nlist, dtype=dtype)
+            print(f"built mmap {dtype}: {meta['nlist']} lists in {time.perf_counter() - start:.1f}s")
+            for nprobe in args.nprobe:
+                configs.append(dict(paths, kind="mmap", path=path, nprobe=nprobe, disk=disk_mb(path),
+                                    name=f"mmap {dtype} nprobe={nprobe}"))
+        del vectors, records
+
+        print(f"{'index':<26}{'recall@' + str(args.k):>10}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'batch q/s':>11}{'RSS MB':>9}{'disk MB':>9}")
+        context = multiprocessing.get_context("spawn")
+        for config in configs:
+            config.update(k=args.k, batch=args.batch)
+            with context.Pool(1) as pool:
+                result = pool.apply(measure, (config,))
+            print(f"{config['name']:<26}{result['recall']:>10.3f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                  f"{result['batched_qps']:>11.0f}{result['rss_mb']:>9.1f}{config['disk']:>9.1f}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000, help="topics in the synthetic corpus")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=32, help="queries per search call for throughput")
+    parser.add_argument("--nlist", type=int, default=None, help="default 4*sqrt(vectors)")
+    parser.add_argument("--nprobe", type=lambda s: [int(n) for n in s.split(",")], default=[1, 4, 16, 64])
+    parser.add_argument("--dtypes", type=lambda s: s.split(","), default=["int8", "float16"])
+    parser.add_argument("--workdir", default=None, help="keep the data and indexes here")
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == "__main__":
+    main()
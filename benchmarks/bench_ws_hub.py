@@ -0,0 +1,131 @@
+"""
+bench_ws_hub.py - WebSocket hub capacity: many idle sockets plus active ones on one worker
+
+Runs an app with the hub's /ws endpoint in-process over ASGI (no network). The reply
+handler is a stub that streams --chunks frames after --compute-ms. Opens --idle sockets
+that never send, then --active sockets that each send --messages messages, and reports
+memory per socket (client and server side, both live in this process), reply latency
+with the idle sockets held, how long the heartbeat stalls the event loop, and the hub's
+counters.
+
+Usage:
+    python -m benchmarks.bench_ws_hub --idle 10000 --active 1000 --messages 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import time
+
+from fastapi import FastAPI, WebSocket
+
+from benchmarks.load_test import AsgiWebSocket, summarize
+from interfaces.socket_layer.hub import WS_SWEEP_SLICE, ConnectionHub
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def make_app(hub: ConnectionHub, compute_ms: float, chunks: int) -> FastAPI:
+    app = FastAPI()
+
+    async def handler(connection, message):
+        await asyncio.sleep(compute_ms / 1000)
+        for i in range(chunks):
+            if not connection.send(json.dumps({"type": "chunk", "delta": f"tok{i} "})):
+                return
+            await asyncio.sleep(0)
+        connection.send(json.dumps({"type": "done"}))
+
+    @app.websocket("/ws/{sender_id}/{receiver_id}")
+    async def chat_websocket(websocket: WebSocket, sender_id: str, receiver_id: str):
+        await hub.serve(websocket, sender_id, receiver_id, handler)
+
+    return app
+
+async def open_sockets(app, prefix: str, count: int, batch: int = 500):
+    sockets = []
+    for start in range(0, count, batch):
+        group = [AsgiWebSocket(app, f"/ws/{prefix}-{i}/bot") for i in range(start, min(start + batch, count))]
+        await asyncio.gather(*(ws.connect() for ws in group))
+        sockets.extend(group)
+    return sockets
+
+async def run(args):
+    hub = ConnectionHub(ping_interval=20, pong_timeout=3600)  # sweep is run by hand below
+    app = make_app(hub, args.compute_ms, args.chunks)
+    base_rss = rss_mb()
+
+    start = time.perf_counter()
+    idle = await open_sockets(app, "idle", args.idle)
+    open_seconds = time.perf_counter() - start
+    idle_rss = rss_mb()
+    print(f"idle sockets: {len(idle)} opened in {open_seconds:.2f}s, "
+          f"RSS +{idle_rss - base_rss:.1f} MB ({(idle_rss - base_rss) * 1024 / max(1, len(idle)):.1f} KB/socket)")
+
+    active = await open_sockets(app, "active", args.active)
+    latencies, first_chunk, errors = [], [], 0
+
+    async def talk(ws: AsgiWebSocket):
+        nonlocal errors
+        for i in range(args.messages):
+            sent = time.perf_counter()
+            await ws.send(f"message {i}")
+            got_chunk = False
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame["type"] == "chunk" and not got_chunk:
+                    got_chunk = True
+                    first_chunk.append(time.perf_counter() - sent)
+                elif frame["type"] == "done":
+                    latencies.append(time.perf_counter() - sent)
+                    break
+                elif frame["type"] == "error":
+                    errors += 1
+                    break
+
+    start = time.perf_counter()
+    await asyncio.gather(*(talk(ws) for ws in active))
+    result = summarize(latencies, time.perf_counter() - start, errors)
+    latency, first = result["latency_ms"], summarize(first_chunk, 1.0, 0)["latency_ms"]
+    print(f"active sockets: {len(active)} x {args.messages} messages while {hub.stats()['connections']} sockets open")
+    print(f"  {result['requests_per_second']:.0f} replies/s  reply p50 {latency['p50']:.1f} ms  "
+          f"p99 {latency['p99']:.1f} ms  first chunk p50 {first['p50']:.1f} ms  p99 {first['p99']:.1f} ms  "
+          f"errors {errors}")
+
+    # Heartbeat pass as the hub runs it: slices of WS_SWEEP_SLICE sockets, one per loop turn
+    connections = hub.all_connections()
+    slice_ms = []
+    later = time.monotonic() + hub.ping_interval + 1  # every socket is due a ping
+    for start in range(0, len(connections), WS_SWEEP_SLICE):
+        began = time.perf_counter()
+        hub.sweep(now=later, connections=connections[start:start + WS_SWEEP_SLICE])
+        slice_ms.append((time.perf_counter() - began) * 1000)
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.1)  # let the ping frames drain
+    print(f"heartbeat sweep over {len(connections)} sockets: {sum(slice_ms):.1f} ms total, "
+          f"longest loop stall {max(slice_ms, default=0):.1f} ms ({len(slice_ms)} slices)")
+
+    for ws in idle + active:
+        await ws.close()
+    stats = hub.stats()
+    print(f"hub: accepted {stats['accepted']}, closed {stats['closed']}, frames sent {stats['frames_sent']}, "
+          f"evicted {stats['evicted_slow_consumer']} slow / {stats['evicted_send_failed']} failed")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--idle", type=int, default=10000)
+    parser.add_argument("--active", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--compute-ms", type=float, default=20)
+    parser.add_argument("--chunks", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
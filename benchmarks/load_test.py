@@ -0,0 +1,390 @@
+"""
+load_test.py - Throughput and tail latency of /chat/generate-reply and the WebSocket path
+
+Starts stub Rasa/Ollama servers and a stub retriever (see stub_backends.py) with the given
+latencies, points the app at them and drives it at a fixed concurrency:
+- http: POST /chat/generate-reply, latency per request
+- ws:   /ws/{sender}/{receiver}, one connection per worker, latency from sending a
+        message to its "done" frame (and to the first chunk)
+Reports requests/sec, p50/p95/p99 latency, status counts, time spent in each stubbed tier
+(Rasa, LLM, retriever) and, in-process, the cascade's per-tier wins (only the ws path goes
+through ai_router's cascade; /chat/generate-reply tries Rasa, RAG and the LLM in turn), and
+writes everything to a JSON file tagged with the git commit so runs can be compared
+(--compare old.json prints the deltas).
+
+By default the real app (interfaces/api_server/main.py:app, with its middleware and JWT
+auth) runs in-process over ASGI, so numbers exclude the HTTP server and the startup hooks
+(no lifespan events; RAG and sandbox preloading are off anyway), and the stub threads share
+the GIL with the app (stub overhead shows up as app latency at high concurrency). HTTP
+workers log in through /auth/token as load-{n}; the rate limit is off. Everything the stubs
+don't replace is real: without Redis, queued log writes are reported lost, and without
+langchain the semantic response cache prints embedding errors and only matches exact
+repeats. With --url the load goes to a running server instead; start it with the env
+printed by `python -m benchmarks.stub_backends` to use the stubs.
+
+Usage:
+    python -m benchmarks.load_test --scenario both --requests 2000 --concurrency 50 \\
+        --rasa-ms 20 --llm-ms 300 --llm-token-ms 10 --rag-ms 15
+    python -m benchmarks.load_test --compare benchmarks/results/load_<old>.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from jose import jwt
+
+from benchmarks.stub_backends import Latency, OllamaStub, RasaStub, RetrieverStub, tier_delta
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+MESSAGES = [
+    "hello there",
+    "can you help me reset my password",
+    "what are your opening hours on sunday",
+    "my order arrived damaged, I want a refund",
+    "tell me something interesting about the ocean",
+    "thanks, that was helpful",
+    "how do I change the email on my account",
+    "is the premium plan worth it",
+]
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], elapsed: float, errors: int) -> Dict[str, Any]:
+    values = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "completed": len(values),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(values, 50)),
+            "p95": ms(percentile(values, 95)),
+            "p99": ms(percentile(values, 99)),
+            "mean": ms(sum(values) / len(values)) if values else 0.0,
+            "max": ms(values[-1]) if values else 0.0,
+        },
+    }
+
+# --- HTTP ---
+async def login(client: httpx.AsyncClient, sender_id: str) -> str:
+    """A JWT for sender_id from the app's /auth/token (generate-reply only accepts the token's own user)."""
+    response = await client.post("/auth/token", data={"username": sender_id})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def run_http(client: httpx.AsyncClient, n_requests: int, concurrency: int, token: Optional[str]) -> Dict[str, Any]:
+    # With --token every worker sends as the token's user; otherwise each logs in as load-{n}
+    token_user = jwt.get_unverified_claims(token).get("sub") if token else None
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    remaining = n_requests
+
+    async def worker(worker_id: int):
+        nonlocal remaining, errors
+        rng = random.Random(worker_id)
+        sender_id = token_user or f"load-{worker_id}"
+        try:
+            headers = {"Authorization": f"Bearer {token or await login(client, sender_id)}"}
+        except httpx.HTTPError as e:
+            errors += 1
+            print(f"[LOADTEST HTTP ERROR] login: {e}")
+            return
+        while remaining > 0:
+            remaining -= 1
+            payload = {"sender_id": sender_id, "receiver_id": "bot", "message": rng.choice(MESSAGES)}
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chat/generate-reply", json=payload, headers=headers)
+            except httpx.HTTPError as e:
+                errors += 1
+                statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+                continue
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return dict(summarize(latencies, time.perf_counter() - start, errors), status_codes=statuses)
+
+# --- WebSocket ---
+class AsgiWebSocket:
+    """Just enough of a WebSocket client to talk to an ASGI app in-process."""
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.path = path
+        self._to_app: asyncio.Queue = asyncio.Queue()
+        self._from_app: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        scope = {"type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": self.path,
+                 "raw_path": self.path.encode(), "root_path": "", "query_string": b"", "headers": [],
+                 "client": ("127.0.0.1", 0), "server": ("loadtest", 80), "subprotocols": []}
+        self._task = asyncio.ensure_future(self.app(scope, self._to_app.get, self._from_app.put))
+        await self._to_app.put({"type": "websocket.connect"})
+        message = await self._from_app.get()
+        if message["type"] != "websocket.accept":
+            raise ConnectionError(f"websocket rejected: {message}")
+
+    async def send(self, text: str):
+        await self._to_app.put({"type": "websocket.receive", "text": text})
+
+    async def recv(self) -> str:
+        message = await self._from_app.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"websocket closed: {message.get('code')}")
+        return message.get("text") or message.get("bytes", b"").decode()
+
+    async def close(self):
+        await self._to_app.put({"type": "websocket.disconnect", "code": 1000})
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, 5)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+
+class RemoteWebSocket:
+    def __init__(self, url: str):
+        self.url = url
+        self._ws = None
+
+    async def connect(self):
+        self._ws = await websockets.connect(self.url)
+
+    async def send(self, text: str):
+        await self._ws.send(text)
+
+    async def recv(self) -> str:
+        return await self._ws.recv()
+
+    async def close(self):
+        await self._ws.close()
+
+async def run_ws(open_socket, n_messages: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    first_chunk: List[float] = []
+    errors = 0
+    remaining = n_messages
+
+    async def worker(worker_id: int):
+        nonlocal remaining, errors
+        rng = random.Random(worker_id)
+        try:
+            ws = open_socket(f"load-{worker_id}", "bot")
+            await ws.connect()
+        except Exception as e:
+            errors += 1
+            print(f"[LOADTEST WS ERROR] connect: {e}")
+            return
+        try:
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                got_chunk = False
+                try:
+                    await ws.send(rng.choice(MESSAGES))
+                    while True:
+                        frame = json.loads(await ws.recv())
+                        if not got_chunk and frame.get("type") == "chunk":
+                            got_chunk = True
+                            first_chunk.append(time.perf_counter() - start)
+                        if frame.get("type") == "done":
+                            latencies.append(time.perf_counter() - start)
+                            break
+                except Exception as e:
+                    errors += 1
+                    print(f"[LOADTEST WS ERROR] {e}")
+                    return
+        finally:
+            await ws.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    result = summarize(latencies, time.perf_counter() - start, errors)
+    result["first_chunk_ms"] = summarize(first_chunk, 1.0, 0)["latency_ms"]
+    return result
+
+# --- setup / reporting ---
+def start_stubs(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    stubs = {
+        "rasa": RasaStub(Latency(args.rasa_ms, args.jitter, rng), args.rasa_answer_rate).start(),
+        "llm": OllamaStub(Latency(args.llm_ms, args.jitter, rng), args.llm_token_ms, args.llm_tokens).start(),
+        "rag": RetrieverStub(Latency(args.rag_ms, args.jitter, rng), args.rag_hit_rate),
+    }
+    # Read by the app's modules at import time
+    os.environ["RASA_ENABLED"] = "true"
+    os.environ["RASA_API_URL"] = stubs["rasa"].url
+    os.environ["LLM_API_URL"] = f"{stubs['llm'].url}/api/generate"
+    os.environ.setdefault("RAG_PRELOAD", "false")
+    os.environ.setdefault("SANDBOX_PRELOAD", "false")
+    return stubs
+
+def load_app(retriever: RetrieverStub):
+    """The real app (interfaces/api_server/main.py:app), with the RAG tier answered by the stub retriever."""
+    from interfaces.api_server import main
+    from interfaces.api_server.routes import chat
+    from ai.assistant_engine import ai_router
+
+    for module in (ai_router, chat):
+        module.search_documents_async = retriever.search_async
+    main.limiter.enabled = False  # measuring the app, not the 10/minute limit
+    return main.app
+
+def tier_snapshot(stubs: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    return {name: stub.stats.snapshot() for name, stub in stubs.items()}
+
+def cascade_snapshot() -> Dict[str, Dict[str, float]]:
+    try:
+        from ai.assistant_engine.cascade import cascade_stats
+        return cascade_stats()
+    except ImportError:
+        return {}
+
+def cascade_delta(before: Dict[str, Dict[str, float]], after: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    delta = {}
+    for tier, values in after.items():
+        old = before.get(tier, {})
+        diff = {key: value - old.get(key, 0) for key, value in values.items()}
+        ran = diff.get("answered", 0) + diff.get("empty", 0) + diff.get("error", 0) + diff.get("cancelled", 0)
+        delta[tier] = {"wins": diff.get("wins", 0), "ran": ran,
+                       "mean_ms": round(diff.get("seconds_total", 0.0) * 1000 / ran, 3) if ran else 0.0}
+    return delta
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_report(report: Dict[str, Any]):
+    for name, result in report["scenarios"].items():
+        latency = result["latency_ms"]
+        print(f"{name:>5}: {result['requests_per_second']:8.1f} req/s  p50 {latency['p50']:8.1f} ms  "
+              f"p95 {latency['p95']:8.1f} ms  p99 {latency['p99']:8.1f} ms  errors {result['errors']}")
+        for tier, values in result.get("tiers", {}).items():
+            print(f"        {tier:<5} {values['calls']:6} calls  mean {values['mean_ms']:8.1f} ms")
+
+def compare(old_path: str, new: Dict[str, Any]):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"vs {old_path} (commit {old.get('commit')}):")
+    for name, result in new["scenarios"].items():
+        before = old.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas = [f"req/s {result['requests_per_second'] - before['requests_per_second']:+.1f}"]
+        for q in ("p50", "p95", "p99"):
+            deltas.append(f"{q} {result['latency_ms'][q] - before['latency_ms'][q]:+.1f} ms")
+        print(f"{name:>5}: " + "  ".join(deltas))
+
+async def run(args, stubs: Dict[str, Any], app) -> Dict[str, Dict[str, Any]]:
+    scenarios = {}
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                   timeout=args.timeout)
+
+    def open_socket(sender_id: str, receiver_id: str):
+        path = f"/ws/{sender_id}/{receiver_id}"
+        if args.url:
+            return RemoteWebSocket(args.url.replace("http", "ws", 1) + path)
+        return AsgiWebSocket(app, path)
+
+    async with client:
+        for name in (["http", "ws"] if args.scenario == "both" else [args.scenario]):
+            if name == "ws" and args.url and websockets is None:
+                print("[LOADTEST] skipping ws: `pip install websockets` to test a remote server")
+                continue
+            tiers_before, cascade_before = tier_snapshot(stubs), cascade_snapshot()
+            if name == "http":
+                await run_http(client, min(args.warmup, args.requests), args.concurrency, args.token)
+                tiers_before, cascade_before = tier_snapshot(stubs), cascade_snapshot()
+                result = await run_http(client, args.requests, args.concurrency, args.token)
+            else:
+                result = await run_ws(open_socket, args.requests, args.concurrency)
+            tiers_after = tier_snapshot(stubs)
+            result["tiers"] = {tier: tier_delta(tiers_before[tier], tiers_after[tier]) for tier in stubs}
+            if not args.url:
+                result["cascade"] = cascade_delta(cascade_before, cascade_snapshot())
+            scenarios[name] = result
+    return scenarios
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=("http", "ws", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=1000, help="requests (http) or messages (ws) per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--url", help="load a running server (e.g. http://localhost:8000) instead of in-process")
+    parser.add_argument("--token", help="JWT sent as Authorization: Bearer")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--rasa-ms", type=float, default=20)
+    parser.add_argument("--rasa-answer-rate", type=float, default=0.5)
+    parser.add_argument("--llm-ms", type=float, default=300, help="LLM time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=10)
+    parser.add_argument("--llm-tokens", type=int, default=20)
+    parser.add_argument("--rag-ms", type=float, default=15)
+    parser.add_argument("--rag-hit-rate", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency spread as a fraction of the mean")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="result file (default benchmarks/results/load_<time>_<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    args = parser.parse_args()
+
+    stubs = start_stubs(args)
+    app = None if args.url else load_app(stubs["rag"])
+    try:
+        scenarios = asyncio.run(run(args, stubs, app))
+    finally:
+        stubs["rasa"].stop()
+        stubs["llm"].stop()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "target": args.url or "in-process",
+        "config": {key: value for key, value in vars(args).items() if key not in ("token", "out", "compare")},
+        "scenarios": scenarios,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"load_{time.strftime('%Y%m%d-%H%M%S')}_{commit}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    print(f"saved {out}")
+    if args.compare:
+        compare(args.compare, report)
+
+if __name__ == "__main__":
+    main()
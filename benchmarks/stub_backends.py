@@ -0,0 +1,209 @@
+"""
+stub_backends.py - Local stand-ins for Rasa, Ollama and the FAISS retriever with configurable latency
+
+Each stub keeps per-tier call counts and time spent, so a load test can report where a
+request's time went. Rasa and Ollama are real HTTP servers (stdlib, one thread per
+connection, keep-alive) so the app's pooled backend clients are exercised as in production.
+
+    python -m benchmarks.stub_backends --rasa-ms 20 --llm-ms 300   # serve until Ctrl+C
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+class Latency:
+    """`ms` milliseconds, +/- `jitter` (a fraction of ms), uniformly distributed."""
+
+    def __init__(self, ms: float, jitter: float = 0.0, rng: Optional[random.Random] = None):
+        self.ms = ms
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+
+    def seconds(self) -> float:
+        spread = self.ms * self.jitter
+        return max(0.0, self.ms + self._rng.uniform(-spread, spread)) / 1000
+
+class TierStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.seconds = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {"calls": self.calls, "seconds": self.seconds}
+
+def tier_delta(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, float]:
+    calls = after["calls"] - before["calls"]
+    seconds = after["seconds"] - before["seconds"]
+    return {"calls": calls, "total_ms": round(seconds * 1000, 3),
+            "mean_ms": round(seconds * 1000 / calls, 3) if calls else 0.0}
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # The default backlog (5) makes bursts of new connections wait for SYN retries
+    request_queue_size = 1024
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub: "StubBackend" = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = {}
+        start = time.perf_counter()
+        try:
+            self.stub.handle(self, payload)
+        finally:
+            self.stub.stats.record(time.perf_counter() - start)
+
+    def send_json(self, body: Any, status: int = 200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+class StubBackend:
+    """An HTTP stub on 127.0.0.1 (port 0 = pick a free one), served from a daemon thread."""
+
+    def __init__(self, port: int = 0):
+        handler = type(f"{type(self).__name__}Handler", (_Handler,), {"stub": self})
+        self.stats = TierStats()
+        self.server = _StubServer(("127.0.0.1", port), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubBackend":
+        self._thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, request: _Handler, payload: Dict[str, Any]):
+        raise NotImplementedError
+
+class RasaStub(StubBackend):
+    """/webhooks/rest/webhook: answers a share (`answer_rate`) of messages, [] for the rest."""
+
+    def __init__(self, latency: Latency, answer_rate: float = 0.5, port: int = 0, seed: int = 1):
+        super().__init__(port)
+        self.latency = latency
+        self.answer_rate = answer_rate
+        self._rng = random.Random(seed)
+
+    def handle(self, request: _Handler, payload: Dict[str, Any]):
+        time.sleep(self.latency.seconds())
+        if request.path.rstrip("/") != "/webhooks/rest/webhook":
+            request.send_json({"error": "not found"}, 404)
+        elif self._rng.random() < self.answer_rate:
+            request.send_json([{"recipient_id": payload.get("sender"), "text": "Rasa stub reply."}])
+        else:
+            request.send_json([])
+
+class OllamaStub(StubBackend):
+    """/api/generate: first token after `latency`, then `tokens` tokens `token_ms` apart (NDJSON when streaming)."""
+
+    def __init__(self, latency: Latency, token_ms: float = 0.0, tokens: int = 20, port: int = 0):
+        super().__init__(port)
+        self.latency = latency
+        self.token_seconds = token_ms / 1000
+        self.tokens = tokens
+
+    def handle(self, request: _Handler, payload: Dict[str, Any]):
+        time.sleep(self.latency.seconds())
+        words = [f"tok{i} " for i in range(self.tokens)]
+        if not payload.get("stream"):
+            time.sleep(self.token_seconds * self.tokens)
+            request.send_json({"model": payload.get("model"), "response": "".join(words), "done": True})
+            return
+        request.start_chunked("application/x-ndjson")
+        for word in words:
+            request.send_chunk(json.dumps({"response": word, "done": False}).encode() + b"\n")
+            if self.token_seconds:
+                time.sleep(self.token_seconds)
+        request.send_chunk(json.dumps({"response": "", "done": True}).encode() + b"\n")
+        request.send_chunk(b"")
+
+class RetrieverStub:
+    """Drop-in for search_documents(query): sleeps like a FAISS lookup, hits `hit_rate` of the time."""
+
+    def __init__(self, latency: Latency, hit_rate: float = 0.3, seed: int = 2):
+        self.latency = latency
+        self.hit_rate = hit_rate
+        self.stats = TierStats()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str) -> Optional[str]:
+        start = time.perf_counter()
+        time.sleep(self.latency.seconds())
+        with self._lock:
+            hit = self._rng.random() < self.hit_rate
+        self.stats.record(time.perf_counter() - start)
+        return f"Retrieved passage for: {query[:40]}" if hit else None
+
+    async def search_async(self, query: str) -> Optional[str]:
+        """Drop-in for search_documents_async(query)."""
+        return await asyncio.to_thread(self, query)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rasa-ms", type=float, default=20)
+    parser.add_argument("--rasa-port", type=int, default=5005)
+    parser.add_argument("--rasa-answer-rate", type=float, default=0.5)
+    parser.add_argument("--llm-ms", type=float, default=300, help="time to first token")
+    parser.add_argument("--llm-token-ms", type=float, default=10)
+    parser.add_argument("--llm-port", type=int, default=11434)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rasa = RasaStub(Latency(args.rasa_ms, args.jitter), args.rasa_answer_rate, port=args.rasa_port).start()
+    llm = OllamaStub(Latency(args.llm_ms, args.jitter), args.llm_token_ms, port=args.llm_port).start()
+    print(f"RASA_ENABLED=true RASA_API_URL={rasa.url} LLM_API_URL={llm.url}/api/generate")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"rasa {rasa.stats.snapshot()}  llm {llm.stats.snapshot()}")
+    except KeyboardInterrupt:
+        rasa.stop()
+        llm.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,227 @@
+"""
+anonymizer.py - Single-pass PII masking
+
+All rules (emails, phone numbers, card numbers, IP addresses, names introduced as
+"my name is ..." or "call me ...", plus user-defined patterns) are compiled into one regex
+with one alternative per rule, so a message is scanned once regardless of how many rules
+exist. Rules with a validator (Luhn for cards, octet ranges for IPs) only mask matches that
+pass it. Masked values are replaced with a lowercase token such as "[email]".
+
+Looser introductions ("I am ...", "I'm ...", "This is ...") are not masked: in chat they are
+followed by ordinary words ("I'm Looking for a refund") far more often than by names, and
+masking those would change the text intent detection runs on.
+
+Built-in patterns start with a character class (boundary lookbehinds come after the first
+character) so the regex engine can reject an alternative by looking at one character, and
+a rule with a `hint` (e.g. "@" for emails) is left out of the pattern for texts that don't
+contain the hint.
+"""
+
+import ipaddress
+import json
+import os
 import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+PRIVACY_RULES_PATH = os.getenv("PRIVACY_RULES_PATH", os.path.join("data", "privacy_rules.json"))
+
+@dataclass(frozen=True)
+class PiiRule:
+    name: str
+    pattern: str
+    token: str
+    # Called with the matched value; the match is left untouched when it returns False
+    validator: Optional[Callable[[str], bool]] = None
+    # Substring every match contains; texts without it skip this rule
+    hint: Optional[str] = None
+
+@dataclass(frozen=True)
+class PiiSpan:
+    rule: str
+    start: int
+    end: int
+    token: str
+
+@dataclass(frozen=True)
+class AnonymizeResult:
+    text: str
+    spans: Tuple[PiiSpan, ...]
+
+def luhn_valid(value: str) -> bool:
+    digits = [int(ch) for ch in value if ch.isdigit()]
+    if not 13 <= len(digits) <= 19:
+        return False
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        if i % 2:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return total % 10 == 0
+
+# Capitalized words that follow "call me" without being a name
+NOT_NAMES = frozenset({
+    "Back", "Later", "Now", "Soon", "Again", "Anytime", "Asap", "Maybe", "Please", "When", "If",
+    "After", "Before", "Today", "Tonight", "Tomorrow", "Monday", "Tuesday", "Wednesday",
+    "Thursday", "Friday", "Saturday", "Sunday",
+})
+
+def not_common_word(value: str) -> bool:
+    return value not in NOT_NAMES
+
+def ip_valid(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+# Only the part captured as (?P<value>...) is masked, e.g. the name after "my name is"
+DEFAULT_RULES = [
+    PiiRule("email", r"[\w.+-](?<![\w.+-][\w.+-])[\w.+-]*@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+",
+            "[email]", hint="@"),
+    PiiRule("card", r"\d(?<![\d-]\d)(?:[ -]?\d){12,18}(?![\d-])", "[card]", luhn_valid),
+    PiiRule("phone", r"\+(?<![\w+]\+)\d{1,3}[\s.-]?(?:(?:\(\d{3}\)\s?|\d{3}[\s.-]?)\d{3}[\s.-]?\d{4}"
+                     r"|\d{5}[\s-]\d{5})(?!\w)", "[phone]", hint="+"),
+    PiiRule("phone", r"[(\d](?<![\w+][(\d])(?:(?:(?<=\()\d{3}\)\s?|(?<=\d)\d{2}[\s.-]?)\d{3}[\s.-]?\d{4}"
+                     r"|(?<=\d)\d{4}[\s-]\d{5})(?!\w)", "[phone]"),
+    PiiRule("ipv4", r"\d(?<![\w.]\d)\d{0,2}\.(?:\d{1,3}\.){2}\d{1,3}(?![\w.])", "[ip]", ip_valid),
+    PiiRule("ipv6", r"[0-9A-Fa-f:](?<![\w:][0-9A-Fa-f:])(?:(?<=:)|[0-9A-Fa-f]{0,3}:)"
+                    r"(?:[0-9A-Fa-f]{0,4}:){1,6}[0-9A-Fa-f]{0,4}(?![\w:])", "[ip]", ip_valid, hint=":"),
+    PiiRule("name", r"[Mm](?<!\w[Mm])(?i:y name is|y name's)\s+(?P<value>[A-Za-z][A-Za-z'-]+)", "[name]"),
+    PiiRule("name", r"[Cc](?<!\w[Cc])(?i:all me)\s+(?P<value>[A-Z][a-z'-]+)", "[name]", not_common_word),
+]
+
+_NAMED_GROUP = re.compile(r"\(\?P<(\w+)>")
+_NAMED_BACKREF = re.compile(r"\(\?P=(\w+)\)")
+
+class PrivacyEngine:
+    def __init__(self, rules: Optional[Iterable[PiiRule]] = None):
+        self._rules: List[PiiRule] = list(DEFAULT_RULES if rules is None else rules)
+        self._compile()
+
+    @property
+    def rules(self) -> List[PiiRule]:
+        return list(self._rules)
+
+    def add_rule(self, name: str, pattern: str, token: Optional[str] = None,
+                 validator: Optional[Callable[[str], bool]] = None, hint: Optional[str] = None):
+        """Add a user-defined rule (checked after the built-in ones) and recompile."""
+        re.compile(pattern)  # fail here with the rule's own error
+        self._rules.append(PiiRule(name, pattern, token or f"[{name}]", validator, hint))
+        self._compile()
+
+    def _compile(self):
+        self._parts = []
+        self._value_groups = []
+        for i, rule in enumerate(self._rules):
+            # Prefix inner group names so rules can't collide; (?P<value>) becomes (?P<r3_value>)
+            body = _NAMED_GROUP.sub(lambda m: f"(?P<r{i}_{m.group(1)}>", rule.pattern)
+            body = _NAMED_BACKREF.sub(lambda m: f"(?P=r{i}_{m.group(1)})", body)
+            # The empty marker group closes last, so match.lastgroup names the rule; keeping
+            # it at the end leaves the rule's first character class first for the engine
+            self._parts.append(f"(?:{body})(?P<r{i}>)")
+            self._value_groups.append(f"r{i}_value" if "(?P<value>" in rule.pattern else 0)
+        self._hinted = [(i, rule.hint) for i, rule in enumerate(self._rules) if rule.hint]
+        self._variants: Dict[Tuple[int, ...], re.Pattern] = {}
+
+    def _variant(self, missing: Tuple[int, ...]) -> re.Pattern:
+        pattern = self._variants.get(missing)
+        if pattern is None:
+            pattern = re.compile("|".join(part for i, part in enumerate(self._parts) if i not in missing))
+            self._variants[missing] = pattern
+        return pattern
+
+    def _pattern_for(self, text: str) -> Optional[re.Pattern]:
+        if not self._parts:
+            return None
+        missing = tuple(i for i, hint in self._hinted if hint not in text)
+        if len(missing) == len(self._parts):
+            return None
+        return self._variant(missing)
+
+    def _resolve(self, match: re.Match, validate: bool) -> Optional[Tuple[PiiRule, int, int]]:
+        index = int(match.lastgroup[1:])
+        rule = self._rules[index]
+        group = self._value_groups[index]
+        start, end = match.span(group)
+        if validate and rule.validator is not None and not rule.validator(match.group(group)):
+            return None
+        return rule, start, end
+
+    def anonymize(self, text: str) -> str:
+        """Mask every PII match in one pass."""
+        pattern = self._pattern_for(text)
+        if pattern is None:
+            return text
+
+        def replace(match: re.Match) -> str:
+            found = self._resolve(match, True)
+            if found is None:
+                return match.group(0)
+            rule, start, end = found
+            whole_start, whole_end = match.span()
+            return f"{text[whole_start:start]}{rule.token}{text[end:whole_end]}"
+
+        return pattern.sub(replace, text)
+
+    def scan(self, text: str, validate: bool = True) -> List[PiiSpan]:
+        """PII spans (offsets into `text`) without masking."""
+        spans = []
+        pattern = self._pattern_for(text)
+        if pattern is None:
+            return spans
+        for match in pattern.finditer(text):
+            found = self._resolve(match, validate)
+            if found is not None:
+                rule, start, end = found
+                spans.append(PiiSpan(rule.name, start, end, rule.token))
+        return spans
+
+    def anonymize_with_report(self, text: str) -> AnonymizeResult:
+        """Masked text plus the spans that were masked (offsets into the original text)."""
+        spans = self.scan(text)
+        pieces, last = [], 0
+        for span in spans:
+            pieces.append(text[last:span.start])
+            pieces.append(span.token)
+            last = span.end
+        pieces.append(text[last:])
+        return AnonymizeResult("".join(pieces), tuple(spans))
+
+    def anonymize_many(self, texts: Iterable[str]) -> Iterator[str]:
+        """Bulk scrubbing (e.g. log lines); lazily yields masked texts in order."""
+        anonymize = self.anonymize
+        for text in texts:
+            yield anonymize(text)
+
+def load_user_rules(engine: PrivacyEngine, path: str = PRIVACY_RULES_PATH):
+    """
+    Add rules from a JSON list like [{"name": "order_id", "pattern": "ORD-\\d{6}", "token": "[order]"}].
+    A missing file is fine; a broken one is reported and skipped.
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            for rule in json.load(f):
+                engine.add_rule(rule["name"], rule["pattern"], rule.get("token"), hint=rule.get("hint"))
+    except (OSError, ValueError, KeyError, re.error) as e:
+        print(f"[PRIVACY RULES ERROR] {e}")
+
+privacy_engine = PrivacyEngine()
+load_user_rules(privacy_engine)
 
 def anonymize(message: str) -> str:
     """
     Anonymizes personal identifiers in the message.
     """
-    message = re.sub(r"\b\d{10}\b", "[PHONE]", message)
-    message = re.sub(r"\b\w+@\w+\.\w+\b", "[EMAIL]", message)
-    return message
\ No newline at end of file
+    return privacy_engine.anonymize(message)
+
+def anonymize_with_report(message: str) -> AnonymizeResult:
+    return privacy_engine.anonymize_with_report(message)
+
+def anonymize_many(messages: Iterable[str]) -> List[str]:
+    return list(privacy_engine.anonymize_many(messages))
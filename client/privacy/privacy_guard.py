@@ -1,7 +1,14 @@
-from client.privacy.anonymizer import anonymize
+from client.privacy.anonymizer import anonymize, privacy_engine
 
 def enforce_privacy(message: str) -> str:
     """
     Apply anonymization rules to a message before storage or processing.
     """
-    return anonymize(message)
\ No newline at end of file
+    return anonymize(message)
+
+def is_safe(message: str) -> bool:
+    """
+    True if the message contains no PII. Deliberately conservative: card-shaped
+    numbers count even when they fail the Luhn check that masking requires.
+    """
+    return not privacy_engine.scan(message, validate=False)
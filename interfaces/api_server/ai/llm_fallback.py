@@ -7,12 +7,21 @@ llm_fallback.py - LLM-based open-domain fallback module using Mistral
 """
 
 import os
-import requests
+import json
+from typing import AsyncIterator
+from interfaces.api_server.core.http_client import BackendClient
 
 LLM_API_URL = os.getenv("LLM_API_URL", "http://localhost:11434/api/generate")
 LLM_MODEL = os.getenv("LLM_MODEL", "mistral")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
 
-def call_llm(prompt: str) -> str:
+LLM_EMPTY_REPLY = "🤖 Sorry, I couldn't generate a reply."
+LLM_UNAVAILABLE_REPLY = "🤖 LLM is unavailable at the moment."
+
+llm_backend = BackendClient("llm", LLM_API_URL, timeout=LLM_TIMEOUT, max_concurrency=LLM_MAX_CONCURRENCY)
+
+async def call_llm(prompt: str) -> str:
     """
     Calls local Mistral LLM instance (e.g., Ollama or web UI).
     :param prompt: user message or fallback input
@@ -24,10 +33,33 @@ def call_llm(prompt: str) -> str:
             "prompt": prompt,
             "stream": False
         }
-        response = requests.post(LLM_API_URL, json=payload)
+        response = await llm_backend.post(json=payload)
         response.raise_for_status()
         result = response.json()
-        return result.get("response", "🤖 Sorry, I couldn't generate a reply.")
+        return result.get("response", LLM_EMPTY_REPLY)
     except Exception as e:
         print(f"[LLM ERROR] {e}")
-        return "🤖 LLM is unavailable at the moment."
\ No newline at end of file
+        return LLM_UNAVAILABLE_REPLY
+
+async def stream_llm(prompt: str) -> AsyncIterator[str]:
+    """
+    Streams completion chunks from the LLM's NDJSON response as they are generated.
+    Closing the generator closes the backend connection, which stops the generation.
+    :param prompt: user message or fallback input
+    :return: async iterator of text chunks
+    """
+    payload = {
+        "model": LLM_MODEL,
+        "prompt": prompt,
+        "stream": True
+    }
+    async with llm_backend.stream("POST", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                break
@@ -0,0 +1,20 @@
+from interfaces.api_server.core.redis_writer import log_writer
+
+# Counters are queued and coalesced by the background writer (no Redis round trip here);
+# without Redis there is no writer and they are not recorded
+
+def increment_intent(intent: str):
+    if log_writer is not None:
+        log_writer.incr("analytics:intent_counts", intent, 1)
+
+def increment_fallback(intent: str):
+    if log_writer is not None:
+        log_writer.incr("analytics:fallback_counts", intent, 1)
+
+def increment_plugin_usage(plugin_name: str):
+    if log_writer is not None:
+        log_writer.incr("analytics:plugin_usage", plugin_name, 1)
+
+def set_session_count(count: int):
+    if log_writer is not None:
+        log_writer.set("analytics:session_count", count)
@@ -0,0 +1,124 @@
+"""
+http_client.py - Shared async HTTP clients for model backends (Rasa, LLM)
+
+One pooled httpx.AsyncClient per backend: keep-alive connections are reused across
+requests, every call has the backend's timeout, and a semaphore caps how many requests
+may be in flight to that backend at once so a slow backend can't absorb every worker.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, Set
+
+import httpx
+
+_backends: Dict[str, "BackendClient"] = {}
+# Close tasks for clients replaced after an event loop change (kept so they aren't collected)
+_closing: Set[asyncio.Task] = set()
+
+async def _close_quietly(name: str, client: httpx.AsyncClient):
+    try:
+        await client.aclose()
+    except Exception as e:
+        print(f"[HTTP CLIENT ERROR] {name}: closing replaced client: {e}")
+
+class BackendClient:
+    def __init__(self, name: str, base_url: str, timeout: float = 10.0, max_concurrency: int = 16,
+                 max_keepalive: Optional[int] = None, connect_timeout: float = 2.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=min(connect_timeout, timeout))
+        self.max_concurrency = max_concurrency
+        self.limits = httpx.Limits(
+            max_connections=max_concurrency,
+            max_keepalive_connections=max_keepalive if max_keepalive is not None else max_concurrency,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._stats = {"requests": 0, "errors": 0, "timeouts": 0, "in_flight": 0, "waiting": 0,
+                       "latency_seconds_total": 0.0}
+        _backends[name] = self
+
+    def url(self, path: str = "") -> str:
+        return f"{self.base_url}{path}" if path else self.base_url
+
+    def _ensure_client(self):
+        # Clients and semaphores are bound to the event loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._retire(self._client, self._loop)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    def _retire(self, client: httpx.AsyncClient, loop):
+        # Close the old pool on the loop that owns its connections; if that loop is gone,
+        # close what can still be closed from here instead of leaking the sockets
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(_close_quietly(self.name, client), loop)
+        else:
+            task = asyncio.get_running_loop().create_task(_close_quietly(self.name, client))
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+
+    @asynccontextmanager
+    async def _slot(self):
+        self._ensure_client()
+        self._stats["waiting"] += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._stats["waiting"] -= 1
+        self._stats["in_flight"] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except httpx.TimeoutException:
+            self._stats["timeouts"] += 1
+            raise
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._stats["in_flight"] -= 1
+            self._stats["requests"] += 1
+            self._stats["latency_seconds_total"] += time.perf_counter() - start
+            self._semaphore.release()
+
+    async def post(self, path: str = "", **kwargs) -> httpx.Response:
+        """POST to the backend (e.g. json=payload) within its timeout and concurrency limit."""
+        async with self._slot():
+            return await self._client.post(self.url(path), **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str = "", **kwargs):
+        """Stream a response; the concurrency slot is held until the stream is closed."""
+        async with self._slot():
+            async with self._client.stream(method, self.url(path), **kwargs) as response:
+                yield response
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["avg_latency_seconds"] = (
+            stats["latency_seconds_total"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def backend_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every registered backend client."""
+    return {name: client.stats() for name, client in _backends.items()}
+
+async def close_backends():
+    """Close all pooled backend connections (call on shutdown)."""
+    for client in list(_backends.values()):
+        await client.aclose()
@@ -0,0 +1,197 @@
+"""
+log_index.py - Write-time Redis indexes for the debug/stats endpoints
+
+The log writers keep these up to date so reads never have to walk every user's keys:
+- index:fallbacks          ZSET of fallback entries (JSON, with user_id), scored by timestamp
+- stats:hour:{YYYYMMDDHH}  HASH of per-hour counters: total, event:{event}, intent:{intent}
+- index:sessions           ZSET of user ids with a user:{id}:context hash, scored by last update
+
+Build them from existing keys with:
+    python -m interfaces.api_server.core.log_index --backfill
+"""
+
+import calendar
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+FALLBACK_INDEX_KEY = "index:fallbacks"
+SESSION_INDEX_KEY = "index:sessions"
+HOUR_KEY_PREFIX = "stats:hour:"
+FALLBACK_INDEX_MAX = int(os.getenv("FALLBACK_INDEX_MAX", "1000"))
+HOUR_KEY_TTL = 48 * 3600
+# Sessions not updated for this long no longer count as active (matches the context hash TTL)
+SESSION_ACTIVE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+
+def parse_timestamp(ts: Optional[str]) -> Optional[float]:
+    """Epoch seconds for a log timestamp ("%Y-%m-%dT%H:%M:%SZ"), or None."""
+    if not ts:
+        return None
+    try:
+        return float(calendar.timegm(time.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")))
+    except (ValueError, TypeError):
+        return None
+
+def hour_key(epoch: float) -> str:
+    return HOUR_KEY_PREFIX + time.strftime("%Y%m%d%H", time.gmtime(epoch))
+
+def _hour_fields(entry: Dict[str, Any]) -> List[str]:
+    fields = ["total"]
+    if entry.get("event"):
+        fields.append(f"event:{entry['event']}")
+    if entry.get("intent"):
+        fields.append(f"intent:{entry['intent']}")
+    return fields
+
+# --- Writers (add to the caller's pipeline so the index and the log list are written together) ---
+
+def index_log_entry(pipe, entry: Dict[str, Any]):
+    """Count a logs:{user} entry in its hour bucket."""
+    epoch = parse_timestamp(entry.get("timestamp")) or time.time()
+    key = hour_key(epoch)
+    for field in _hour_fields(entry):
+        pipe.hincrby(key, field, 1)
+    pipe.expire(key, HOUR_KEY_TTL)
+
+def index_fallback_entry(pipe, user_id: str, entry: Dict[str, Any]):
+    """Add a fallbacks:{user} entry to the global fallback index (newest FALLBACK_INDEX_MAX kept)."""
+    epoch = parse_timestamp(entry.get("timestamp")) or time.time()
+    member = json.dumps(dict(entry, user_id=user_id), sort_keys=True)
+    pipe.zadd(FALLBACK_INDEX_KEY, {member: epoch})
+    pipe.zremrangebyrank(FALLBACK_INDEX_KEY, 0, -(FALLBACK_INDEX_MAX + 1))
+
+def index_session(pipe, user_id: str, now: Optional[float] = None):
+    """Mark a session as updated now; entries idle past SESSION_ACTIVE_TTL are pruned."""
+    now = time.time() if now is None else now
+    pipe.zadd(SESSION_INDEX_KEY, {user_id: now})
+    pipe.zremrangebyscore(SESSION_INDEX_KEY, "-inf", now - SESSION_ACTIVE_TTL)
+
+def unindex_session(pipe, user_id: str):
+    pipe.zrem(SESSION_INDEX_KEY, user_id)
+
+# --- Readers ---
+
+def recent_fallbacks(redis_client, limit: int = 200) -> List[Dict[str, Any]]:
+    """Newest fallback entries across all users."""
+    return [json.loads(member) for member in redis_client.zrevrange(FALLBACK_INDEX_KEY, 0, limit - 1)]
+
+def active_session_count(redis_client, now: Optional[float] = None) -> int:
+    now = time.time() if now is None else now
+    return int(redis_client.zcount(SESSION_INDEX_KEY, now - SESSION_ACTIVE_TTL, "+inf"))
+
+def last_hour_counts(redis_client, now: Optional[float] = None) -> Dict[str, float]:
+    """
+    Counters for the trailing hour: the current hour bucket plus the previous bucket weighted
+    by how much of it still falls inside the window.
+    """
+    now = time.time() if now is None else now
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hgetall(hour_key(now))
+    pipe.hgetall(hour_key(now - 3600))
+    current, previous = pipe.execute()
+    overlap = 1.0 - (now % 3600) / 3600
+    counts: Dict[str, float] = {}
+    for bucket, weight in ((current, 1.0), (previous, overlap)):
+        for field, value in (bucket or {}).items():
+            field = field.decode() if isinstance(field, bytes) else field
+            counts[field] = counts.get(field, 0.0) + int(value) * weight
+    return counts
+
+def top_intents(counts: Dict[str, float], n: int = 5) -> List[Tuple[str, int]]:
+    intents = [(field[len("intent:"):], round(value)) for field, value in counts.items()
+               if field.startswith("intent:")]
+    intents.sort(key=lambda x: x[1], reverse=True)
+    return intents[:n]
+
+# --- Backfill ---
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+def backfill(redis_client, scan_count: int = 500) -> Dict[str, int]:
+    """
+    Rebuild the indexes from existing logs:*, fallbacks:* and user:*:context keys.
+    Uses SCAN, so it can run against a live Redis without losing what is indexed meanwhile:
+    - hour buckets are snapshotted first; a field then only gets what the logs have beyond the
+      snapshot added with HINCRBY, never less: the live counters may be ahead of the lists
+      (capped at 50 entries, unparseable timestamps), so they are not lowered. Increments made
+      during the scan stay, and entries logged after the snapshot are left to them
+      (timestamps have one-second resolution, so that second may be missed)
+    - the fallback and session indexes are built under temporary keys and merged into the
+      live ones with ZUNIONSTORE, so members added during the scan stay
+    """
+    summary = {"log_entries": 0, "fallback_entries": 0, "sessions": 0, "hour_buckets": 0}
+    now = time.time()
+    cutoff = now - HOUR_KEY_TTL
+    pipe = redis_client.pipeline(transaction=False)
+    bucket_keys = [hour_key(now - hours_ago * 3600) for hours_ago in range(HOUR_KEY_TTL // 3600 + 1)]
+    for key in bucket_keys:
+        pipe.hgetall(key)
+    snapshot = {key: {_decode(field): int(value) for field, value in (bucket or {}).items()}
+                for key, bucket in zip(bucket_keys, pipe.execute())}
+    started = int(now)
+    hours: Dict[str, Dict[str, int]] = {}
+
+    for key in redis_client.scan_iter(match="logs:*", count=scan_count):
+        for raw in redis_client.lrange(key, 0, -1):
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            epoch = parse_timestamp(entry.get("timestamp"))
+            if epoch is None or epoch < cutoff or epoch >= started:
+                continue
+            bucket = hours.setdefault(hour_key(epoch), {})
+            for field in _hour_fields(entry):
+                bucket[field] = bucket.get(field, 0) + 1
+            summary["log_entries"] += 1
+
+    for key, fields in hours.items():
+        before = snapshot.get(key, {})
+        for field, count in fields.items():
+            missing = count - before.get(field, 0)
+            if missing > 0:
+                pipe.hincrby(key, field, missing)
+        pipe.expire(key, HOUR_KEY_TTL)
+    summary["hour_buckets"] = len(hours)
+
+    fallback_tmp, session_tmp = f"{FALLBACK_INDEX_KEY}:backfill", f"{SESSION_INDEX_KEY}:backfill"
+    pipe.delete(fallback_tmp)
+    pipe.delete(session_tmp)
+    for key in redis_client.scan_iter(match="fallbacks:*", count=scan_count):
+        user_id = _decode(key).split(":", 1)[1]
+        for raw in redis_client.lrange(key, 0, -1):
+            try:
+                entry = json.loads(raw)
+            except ValueError:
+                continue
+            epoch = parse_timestamp(entry.get("timestamp")) or now
+            pipe.zadd(fallback_tmp, {json.dumps(dict(entry, user_id=user_id), sort_keys=True): epoch})
+            summary["fallback_entries"] += 1
+
+    for key in redis_client.scan_iter(match="user:*:context", count=scan_count):
+        key = _decode(key)
+        pipe.zadd(session_tmp, {key[len("user:"):-len(":context")]: now})
+        summary["sessions"] += 1
+
+    for live, tmp in ((FALLBACK_INDEX_KEY, fallback_tmp), (SESSION_INDEX_KEY, session_tmp)):
+        # MAX keeps the newer score of a session touched during the scan
+        pipe.zunionstore(live, [live, tmp], aggregate="MAX")
+        pipe.delete(tmp)
+    pipe.zremrangebyrank(FALLBACK_INDEX_KEY, 0, -(FALLBACK_INDEX_MAX + 1))
+    pipe.zremrangebyscore(SESSION_INDEX_KEY, "-inf", now - SESSION_ACTIVE_TTL)
+    pipe.execute()
+    return summary
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the Redis log/stat indexes.")
+    parser.add_argument("--backfill", action="store_true", help="rebuild indexes from existing keys")
+    args = parser.parse_args()
+    if args.backfill:
+        from interfaces.api_server.session import redis_client
+        print(backfill(redis_client))
+    else:
+        parser.print_help()
@@ -0,0 +1,13 @@
+"""
+rate_limit.py - Shared slowapi limiter
+
+Lives outside main.py so route modules can decorate endpoints with it without
+importing the app (main.py imports the routes).
+"""
+
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from interfaces.api_server.config import settings
+
+# Initialize limiter using IP address
+limiter = Limiter(key_func=get_remote_address, default_limits=[settings.RATE_LIMIT])
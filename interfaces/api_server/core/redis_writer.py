@@ -0,0 +1,193 @@
+"""
+redis_writer.py - Background, batched writer for logs and analytics counters
+
+Request handlers enqueue writes (O(1), no Redis round trip); a flusher thread sends them
+as one pipeline when `batch_size` events are waiting or `flush_interval` seconds have
+passed. Along the way:
+- hash increments to the same field are summed into one HINCRBY
+- SETs to the same key keep only the last value
+- LPUSHes to the same list become one LPUSH + one LTRIM
+If Redis is slow and the queue reaches `max_queue`, new events are dropped (or the oldest,
+with drop_policy="oldest") and counted, instead of slowing requests down.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+try:
+    from interfaces.api_server.session import redis_client
+    USE_REDIS = True
+except ImportError:
+    redis_client = None
+    USE_REDIS = False
+
+WRITER_MAX_QUEUE = int(os.getenv("REDIS_WRITER_MAX_QUEUE", "10000"))
+WRITER_BATCH_SIZE = int(os.getenv("REDIS_WRITER_BATCH_SIZE", "500"))
+WRITER_FLUSH_INTERVAL = float(os.getenv("REDIS_WRITER_FLUSH_INTERVAL", "0.05"))
+WRITER_DROP_POLICY = os.getenv("REDIS_WRITER_DROP_POLICY", "newest")
+
+class RedisWriter:
+    def __init__(self, redis, max_queue: int = WRITER_MAX_QUEUE, batch_size: int = WRITER_BATCH_SIZE,
+                 flush_interval: float = WRITER_FLUSH_INTERVAL, drop_policy: str = WRITER_DROP_POLICY):
+        self.redis = redis
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        # ("push", key, value, cap) or ("call", fn, args)
+        self._events: Deque[Tuple] = deque()
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._sets: Dict[str, Tuple[Any, Optional[int]]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "flushes": 0,
+                       "flush_seconds_total": 0.0, "flush_seconds_max": 0.0, "last_flush_seconds": 0.0}
+
+    # --- enqueue (request path) ---
+    def _pending(self) -> int:
+        return len(self._events) + len(self._counters) + len(self._sets)
+
+    def _admit(self) -> bool:
+        """Make room for one event; caller holds the condition. False = drop it."""
+        self._ensure_started()
+        self._stats["enqueued"] += 1
+        if self._pending() < self.max_queue:
+            return True
+        self._stats["dropped"] += 1
+        if self.drop_policy == "oldest" and self._events:
+            self._events.popleft()
+            return True
+        return False
+
+    def _added(self):
+        if self._pending() >= self.batch_size:
+            self._cond.notify()
+
+    def push_capped(self, key: str, value: str, cap: int = 50):
+        """LPUSH value to key and trim the list to `cap` entries."""
+        with self._cond:
+            if self._admit():
+                self._events.append(("push", key, value, cap))
+                self._added()
+
+    def incr(self, key: str, field: str, amount: int = 1):
+        """HINCRBY key field amount (coalesced with other increments of the same field)."""
+        with self._cond:
+            counter = (key, field)
+            if counter in self._counters:
+                self._counters[counter] += amount
+                self._stats["enqueued"] += 1
+            elif self._admit():
+                self._counters[counter] = amount
+                self._added()
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None):
+        """SET key value (only the latest value per key is written)."""
+        with self._cond:
+            if key in self._sets:
+                self._sets[key] = (value, ex)
+                self._stats["enqueued"] += 1
+            elif self._admit():
+                self._sets[key] = (value, ex)
+                self._added()
+
+    def call(self, fn: Callable, *args):
+        """Queue fn(pipe, *args) to add arbitrary commands to the next pipeline."""
+        with self._cond:
+            if self._admit():
+                self._events.append(("call", fn, args))
+                self._added()
+
+    # --- flushing (background thread) ---
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="redis-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and self._pending() < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self) -> int:
+        """Write everything queued so far in one pipeline. Returns the number of queued items written."""
+        with self._flush_lock:
+            with self._cond:
+                events, self._events = self._events, deque()
+                counters, self._counters = self._counters, {}
+                sets, self._sets = self._sets, {}
+            count = len(events) + len(counters) + len(sets)
+            if not count:
+                return 0
+
+            start = time.perf_counter()
+            failed = 0
+            pipe = self.redis.pipeline(transaction=False)
+            pushes: Dict[str, list] = {}
+            caps: Dict[str, int] = {}
+            for event in events:
+                if event[0] == "push":
+                    _, key, value, cap = event
+                    pushes.setdefault(key, []).append(value)
+                    caps[key] = min(cap, caps.get(key, cap))
+                else:
+                    _, fn, args = event
+                    try:
+                        fn(pipe, *args)
+                    except Exception as e:
+                        count -= 1
+                        failed += 1
+                        print(f"[REDIS WRITER ERROR] {getattr(fn, '__name__', fn)}: {e}")
+            for key, values in pushes.items():
+                pipe.lpush(key, *values)
+                pipe.ltrim(key, 0, caps[key] - 1)
+            for (key, field), amount in counters.items():
+                pipe.hincrby(key, field, amount)
+            for key, (value, ex) in sets.items():
+                pipe.set(key, value, ex=ex)
+            written = count
+            try:
+                pipe.execute()
+            except Exception as e:
+                failed, written = failed + count, 0
+                print(f"[REDIS WRITER ERROR] {count} queued writes lost: {e}")
+            elapsed = time.perf_counter() - start
+            # stats() and the enqueueing threads read/update _stats under the condition
+            with self._cond:
+                self._stats["written"] += written
+                self._stats["failed"] += failed
+                self._stats["flushes"] += 1
+                self._stats["flush_seconds_total"] += elapsed
+                self._stats["last_flush_seconds"] = elapsed
+                self._stats["flush_seconds_max"] = max(self._stats["flush_seconds_max"], elapsed)
+            return count
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what's queued and stop the background thread (call on shutdown)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats, queue_depth=self._pending(), max_queue=self.max_queue)
+        stats["avg_flush_seconds"] = stats["flush_seconds_total"] / stats["flushes"] if stats["flushes"] else 0.0
+        return stats
+
+# Shared writer for request logs, fallback sources and analytics counters
+log_writer = RedisWriter(redis_client) if USE_REDIS else None
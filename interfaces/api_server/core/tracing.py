@@ -0,0 +1,149 @@
+"""
+tracing.py - Per-request spans and Prometheus histograms
+
+`with span("rag"):` times a block. Every span is observed in the rtca_span_seconds
+histogram (labels: span, status), and when a trace is active for the current request
+(started by RequestLoggerMiddleware, carried in a contextvar so it follows awaits, tasks
+and asyncio.to_thread) it is also appended to that trace, which can be written into the
+request's logs:{user} entry. render_metrics() is the Prometheus text format served on /metrics.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["Histogram"] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class Histogram:
+    """Cumulative-bucket histogram with fixed label names (a minimal prometheus_client.Histogram)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, register: bool = True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [count per bucket (non-cumulative, last = +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        if register:
+            _registry.append(self)
+
+    def observe(self, value: float, *labelvalues: str):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+        """{label values: {"count", "sum", "buckets": cumulative counts}}."""
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        result = {}
+        for labels, (counts, total) in series.items():
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            result[labels] = {"count": running, "sum": total, "buckets": cumulative}
+        return result
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for labels, values in sorted(self.snapshot().items()):
+            pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, labels)]
+            base = ",".join(pairs)
+            for bound, count in zip(bounds, values["buckets"]):
+                le = ",".join(pairs + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {count}")
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {values['sum']}")
+            lines.append(f"{self.name}_count{suffix} {values['count']}")
+        return lines
+
+def render_metrics() -> str:
+    lines = []
+    for histogram in _registry:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+span_seconds = Histogram("rtca_span_seconds", "Time spent in a routing stage or tier.", ("span", "status"))
+request_seconds = Histogram("rtca_request_seconds", "End-to-end time of traced requests.", ("path", "status_code"))
+
+class Trace:
+    __slots__ = ("started", "spans", "attrs")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # (name, offset from the start of the request, seconds, status)
+        self.spans: List[Tuple[str, float, float, str]] = []
+        self.attrs: Dict[str, Any] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"spans": [{"name": name, "start_ms": round(offset * 1000, 3), "ms": round(seconds * 1000, 3),
+                           "status": status} for name, offset, seconds, status in self.spans]}
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+def start_trace() -> Tuple[Trace, Token]:
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+def end_trace(token: Token):
+    _current_trace.reset(token)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def annotate(**attrs):
+    """Attach values (e.g. intent, confidence) to the current request's trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+def record_span(name: str, seconds: float, status: str = "ok"):
+    """Record an already measured span (e.g. a cascade tier's timing)."""
+    span_seconds.observe(seconds, name, status)
+    trace = _current_trace.get()
+    if trace is not None:
+        # list.append is atomic, so spans from to_thread workers are safe to add
+        trace.spans.append((name, time.perf_counter() - seconds - trace.started, seconds, status))
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"  # e.g. the client went away mid-stream
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record_span(name, time.perf_counter() - start, status)
+
+def _analysis_stage_hook(stage: str, seconds: float):
+    record_span(stage if stage == "privacy" else f"nlp.{stage}", seconds)
+
+def install_analysis_hook():
+    """Trace the message analysis stages (privacy masking, keywords, intent, ...)."""
+    from ai.core_nlp.pipeline import register_stage_hook
+    register_stage_hook(_analysis_stage_hook)
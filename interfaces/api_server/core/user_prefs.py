@@ -0,0 +1,210 @@
+"""
+user_prefs.py - Per-user preference snapshots (assist mode, plugin toggles)
+
+All of a user's toggles live in one Redis hash, user:{id}:prefs, with fields like
+"assist_enabled" and "plugin:{name}" ("1"/"0"). The hash is read in one round trip and
+cached per worker for PREFS_CACHE_TTL seconds, so the several checks made for each
+message are dict lookups. Writes go through set_pref(), which updates the hash and
+publishes the user id on PREFS_CHANNEL; every worker listening on the channel drops
+its cached snapshot, and the TTL bounds staleness if a message is missed.
+
+Toggles written before the hash existed are read as fallbacks: the assist flag on every
+fetch, and the per-plugin keys plugin:{user_id}:{name} are copied into the hashes once by
+migrate_legacy_plugin_keys() at startup (fields already in a hash win; old keys are kept).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    from interfaces.api_server.session import redis_client
+    USE_REDIS = True
+except ImportError:
+    redis_client = None
+    USE_REDIS = False
+
+PREFS_CACHE_TTL = float(os.getenv("PREFS_CACHE_TTL", "5"))
+PREFS_CACHE_SIZE = int(os.getenv("PREFS_CACHE_SIZE", "50000"))
+PREFS_CHANNEL = os.getenv("PREFS_CHANNEL", "prefs:invalidate")
+# Set once the legacy plugin keys were copied, so later startups skip the scan
+LEGACY_MIGRATED_KEY = "prefs:legacy_plugins_migrated"
+
+ASSIST_FIELD = "assist_enabled"
+# Published instead of a user id to drop every cached snapshot
+INVALIDATE_ALL = "*"
+
+def plugin_field(plugin_name: str) -> str:
+    return f"plugin:{plugin_name}"
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+class PreferenceStore:
+    def __init__(self, redis, cache_ttl: float = PREFS_CACHE_TTL, cache_size: int = PREFS_CACHE_SIZE,
+                 channel: str = PREFS_CHANNEL, clock: Callable[[], float] = time.monotonic):
+        self.redis = redis
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.channel = channel
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, bool]]]" = OrderedDict()
+        # Toggles when there is no Redis (single process, nothing to invalidate)
+        self._local: Dict[str, Dict[str, bool]] = {}
+        # Bumped on every invalidation so a fetch that raced with one isn't cached
+        self._generation = 0
+        self._listener = None
+        self._stats = {"reads": 0, "cache_hits": 0, "fetches": 0, "invalidations": 0, "errors": 0}
+
+    @staticmethod
+    def key(user_id: str) -> str:
+        return f"user:{user_id}:prefs"
+
+    # --- reads ---
+    def snapshot(self, user_id: str) -> Dict[str, bool]:
+        """All toggles explicitly set for the user (unset ones use the caller's default)."""
+        self._stats["reads"] += 1
+        if self.redis is None:
+            return dict(self._local.get(user_id, {}))
+        self._ensure_listener()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            generation = self._generation
+        if cached is not None and cached[0] > self._clock():
+            self._stats["cache_hits"] += 1
+            return cached[1]
+        prefs = self._fetch(user_id)
+        if prefs is None:
+            return cached[1] if cached is not None else {}
+        with self._lock:
+            if generation == self._generation:
+                self._cache[user_id] = (self._clock() + self.cache_ttl, prefs)
+                self._cache.move_to_end(user_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return prefs
+
+    def _fetch(self, user_id: str) -> Optional[Dict[str, bool]]:
+        self._stats["fetches"] += 1
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(self.key(user_id))
+        # Assist flag written before the prefs hash existed
+        pipe.get(f"user:{user_id}:assist_enabled")
+        try:
+            raw, legacy_assist = pipe.execute()
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"[PREFS REDIS ERROR] {e}")
+            return None
+        prefs = {_decode(field): _decode(value) == "1" for field, value in raw.items()}
+        if legacy_assist is not None and ASSIST_FIELD not in prefs:
+            prefs[ASSIST_FIELD] = _decode(legacy_assist) == "1"
+        return prefs
+
+    def get(self, user_id: str, field: str, default: bool = False) -> bool:
+        return self.snapshot(user_id).get(field, default)
+
+    async def snapshot_async(self, user_id: str) -> Dict[str, bool]:
+        """snapshot() for async callers: a cache miss is fetched from Redis in a worker thread."""
+        if self.redis is not None:
+            with self._lock:
+                cached = self._cache.get(user_id)
+            if cached is None or cached[0] <= self._clock():
+                return await asyncio.to_thread(self.snapshot, user_id)
+        return self.snapshot(user_id)
+
+    async def get_async(self, user_id: str, field: str, default: bool = False) -> bool:
+        return (await self.snapshot_async(user_id)).get(field, default)
+
+    # --- writes / invalidation ---
+    def set_pref(self, user_id: str, field: str, enabled: bool):
+        """Persist one toggle and tell every worker to drop the user's cached snapshot."""
+        if self.redis is None:
+            self._local.setdefault(user_id, {})[field] = enabled
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.key(user_id), mapping={field: "1" if enabled else "0"})
+        pipe.publish(self.channel, user_id)
+        try:
+            pipe.execute()
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"[PREFS REDIS ERROR] {e}")
+        # Don't wait for our own message to come back
+        self.invalidate(user_id)
+
+    def migrate_legacy_plugin_keys(self) -> int:
+        """Copy plugin:{user_id}:{name} toggles into the prefs hashes (once); returns how many."""
+        if self.redis is None:
+            return 0
+        try:
+            if self.redis.get(LEGACY_MIGRATED_KEY):
+                return 0
+            pipe = self.redis.pipeline(transaction=False)
+            keys = [_decode(key) for key in self.redis.scan_iter(match="plugin:*:*", count=1000)]
+            values = self.redis.mget(keys) if keys else []
+            copied = 0
+            for key, value in zip(keys, values):
+                try:
+                    enabled = bool(int(value))
+                except (TypeError, ValueError):
+                    continue
+                user_id, plugin_name = key[len("plugin:"):].rsplit(":", 1)
+                # HSETNX: a toggle already set through the hash is newer; racing workers agree
+                pipe.hsetnx(self.key(user_id), plugin_field(plugin_name), "1" if enabled else "0")
+                copied += 1
+            pipe.set(LEGACY_MIGRATED_KEY, "1")
+            pipe.publish(self.channel, INVALIDATE_ALL)
+            pipe.execute()
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"[PREFS REDIS ERROR] {e}")
+            return 0
+        self.invalidate()
+        return copied
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one user's cached snapshot, or all of them."""
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+            if user_id is None or user_id == INVALIDATE_ALL:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+
+    def _on_message(self, message: Dict[str, Any]):
+        self.invalidate(_decode(message["data"]))
+
+    def _ensure_listener(self):
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._on_message})
+                self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            except Exception as e:
+                # Without the listener, snapshots still expire after cache_ttl
+                self._listener = False
+                print(f"[PREFS PUBSUB ERROR] {e}")
+
+    def stop(self):
+        """Stop the invalidation listener (call on shutdown)."""
+        if self._listener:
+            self._listener.stop()
+        self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._cache)
+        return dict(self._stats, cached_users=entries, cache_ttl_seconds=self.cache_ttl,
+                    listening=bool(self._listener), backend="redis" if self.redis is not None else "memory")
+
+preference_store = PreferenceStore(redis_client if USE_REDIS else None)
@@ -4,15 +4,25 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from interfaces.api_server.routes import chat, auth
 from interfaces.api_server.config import get_cors_origins, settings
-from interfaces.api_server.routes import chat, auth, plugin_admin
+from interfaces.api_server.routes import chat, auth, plugin_admin, metrics
+from interfaces.socket_layer import chat_socket
+from ai.fallback import rag_search
+from interfaces.api_server.core.http_client import close_backends
+from ai.plugins.sandbox_runner import sandbox_pool
+from interfaces.api_server.core.redis_writer import log_writer
+from interfaces.api_server.core.user_prefs import preference_store
+from interfaces.api_server.core.tracing import install_analysis_hook
+from interfaces.socket_layer.hub import hub as socket_hub
+from interfaces.socket_layer.backplane import backplane as socket_backplane
+from interfaces.middleware.logging import RequestLoggerMiddleware
+import asyncio
+import os
 
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi.responses import JSONResponse
 
-# 1. Initialize limiter using IP address
-limiter = Limiter(key_func=get_remote_address, default_limits=[settings.RATE_LIMIT])
+# 1. Limiter using IP address (shared with the routes that decorate endpoints with it)
+from interfaces.api_server.core.rate_limit import limiter
 
 # 2. Define the rate-limit exceeded handler
 def rate_limit_exceeded_handler(request, exc):
@@ -33,6 +43,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 4b. Log /generate-reply requests (pure ASGI; entries are written to Redis in the background)
+app.add_middleware(RequestLoggerMiddleware)
+
 # 5. Register rate-limiting components
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
@@ -41,4 +54,56 @@ app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 app.include_router(auth.router, prefix="/auth")
 app.include_router(chat.router, prefix="/api", tags=["/chat"])
 app.include_router(chat.router, prefix="/chat")
-app.include_router(plugin_admin.router)  # <-- Add this line
\ No newline at end of file
+app.include_router(plugin_admin.router)  # <-- Add this line
+app.include_router(chat_socket.router)
+app.include_router(metrics.router)
+
+# 6b. Time the message analysis stages (privacy, NLP) as tracing spans
+install_analysis_hook()
+
+# 7. Preload shared RAG retriever (embedding model + FAISS index) once per worker
+@app.on_event("startup")
+async def preload_rag_retriever():
+    if os.getenv("RAG_PRELOAD", "true").lower() == "true":
+        rag_search.warm_up()
+
+# 8. Close pooled backend (Rasa/LLM) connections
+@app.on_event("shutdown")
+async def shutdown_backend_clients():
+    await close_backends()
+
+# 9. Start the plugin sandbox workers up front so the first plugin call doesn't pay for it
+@app.on_event("startup")
+async def start_plugin_sandbox():
+    if os.getenv("SANDBOX_PRELOAD", "true").lower() == "true":
+        sandbox_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_plugin_sandbox():
+    sandbox_pool.shutdown()
+
+# 10. Flush queued log/analytics writes before exiting
+@app.on_event("shutdown")
+async def flush_log_writer():
+    if log_writer is not None:
+        log_writer.stop()
+
+# 11. Copy pre-hash plugin toggles into the preference hashes (once), and stop listening on shutdown
+@app.on_event("startup")
+async def migrate_legacy_preferences():
+    await asyncio.to_thread(preference_store.migrate_legacy_plugin_keys)
+
+@app.on_event("shutdown")
+async def stop_preference_listener():
+    preference_store.stop()
+
+# 12. Route WebSocket messages to the worker holding the receiver's socket
+@app.on_event("startup")
+async def start_socket_backplane():
+    await socket_backplane.start()
+
+# 13. Close open WebSockets cleanly (clients reconnect to another worker), then withdraw presence
+@app.on_event("shutdown")
+async def close_websockets():
+    await socket_hub.shutdown()
+    await socket_backplane.stop()
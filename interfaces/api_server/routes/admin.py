@@ -1,7 +1,8 @@
 # File: interfaces/api_server/routes/admin.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from interfaces.api_server.auth import get_current_user
+from interfaces.api_server.routes.auth import get_current_user
+from interfaces.api_server.core.user_prefs import ASSIST_FIELD, plugin_field, preference_store
 
 # Try to import redis client (async)
 try:
@@ -11,22 +12,27 @@ except ImportError:
     redis = None
     USE_REDIS = False
 
-# In-memory fallback for user preferences
-user_preferences = {}
-
+# Preference checks run several times per message; they read a cached per-user snapshot
+# (one Redis round trip per user per PREFS_CACHE_TTL, invalidated over pub/sub on change)
 def set_assist_enabled(user_id: str, enabled: bool):
-    if USE_REDIS and redis:
-        redis.set(f"user:{user_id}:assist_enabled", int(enabled))
-    else:
-        user_preferences[user_id] = enabled
+    preference_store.set_pref(user_id, ASSIST_FIELD, enabled)
 
 def is_assist_enabled(user_id: str) -> bool:
-    if USE_REDIS and redis:
-        val = redis.get(f"user:{user_id}:assist_enabled")
-        if val is not None:
-            return bool(int(val))
-        return True  # Default enabled
-    return user_preferences.get(user_id, True)
+    return preference_store.get(user_id, ASSIST_FIELD, True)  # Default enabled
+
+def set_plugin_enabled_for_user(user_id: str, plugin_name: str, enabled: bool):
+    preference_store.set_pref(user_id, plugin_field(plugin_name), enabled)
+
+def is_plugin_enabled_for_user(user_id: str, plugin_name: str) -> bool:
+    return preference_store.get(user_id, plugin_field(plugin_name), False)
+
+async def is_plugin_enabled_for_user_async(user_id: str, plugin_name: str) -> bool:
+    return await preference_store.get_async(user_id, plugin_field(plugin_name), False)
+
+def enabled_plugins_for_user(user_id: str) -> list:
+    prefix = plugin_field("")
+    return sorted(field[len(prefix):] for field, enabled in preference_store.snapshot(user_id).items()
+                  if enabled and field.startswith(prefix))
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
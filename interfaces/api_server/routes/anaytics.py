@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from interfaces.api_server.auth import get_current_user
+from interfaces.api_server.routes.auth import get_current_user
 from interfaces.api_server.session import redis_client
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
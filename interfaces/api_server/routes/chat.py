@@ -1,19 +1,22 @@
 # File: interfaces/api_server/routes/chat.py
 
+import json
+from contextlib import aclosing
 from fastapi import APIRouter, Depends, Request, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from ai.assistant_engine.ai_router import route_message
-from ai.rasa.query import query_rasa
-from ai.local.generate import generate_local_reply
-from ai.rag.rag_search import search_documents
-from ai.llm_fallback import call_llm
-from interfaces.api_server.auth import get_current_user
+from typing import AsyncIterator, Optional
+from ai.assistant_engine.ai_router import query_rasa, route_message, route_message_stream
+from ai.assistant_engine.reply_generator import generate_local_reply
+from ai.fallback.rag_search import search_documents_async
+from interfaces.api_server.ai.llm_fallback import call_llm
+from interfaces.api_server.routes.auth import get_current_user
 from slowapi.util import get_remote_address
-from interfaces.api_server.main import limiter
+from interfaces.api_server.core.rate_limit import limiter
 from interfaces.api_server.routes.admin import is_assist_enabled
-from utils.privacy import mask_sensitive_data
-from utils.context import detect_intent, detect_tone, log_conversation
+from ai.core_nlp.pipeline import analyze_message
+from interfaces.api_server.core.redis_writer import log_writer
+from interfaces.api_server.core.tracing import span
 
 router = APIRouter()
 
@@ -22,16 +25,30 @@ class MessageRequest(BaseModel):
     receiver_id: Optional[str] = "bot"
     message: str
 
+async def stream_reply_events(request: Request, message: str, sender_id: str, receiver_id: str) -> AsyncIterator[str]:
+    """
+    Server-sent events for a streamed reply: one `data: {"delta": ...}` event per chunk,
+    then `event: done`. Stops (and cancels the backend generation) if the client leaves.
+    """
+    async with aclosing(route_message_stream(message, sender_id, receiver_id)) as chunks:
+        async for chunk in chunks:
+            if await request.is_disconnected():
+                return
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+    yield "event: done\ndata: {}\n\n"
+
 @router.post("/generate-reply")
 @limiter.limit("10/minute")
 async def generate_reply(
     request: Request,
+    stream: bool = False,
     current_user: str = Depends(get_current_user)
 ):
     """
     Generate an AI reply for a one-on-one chat.
     Requires: sender_id, receiver_id, message in payload.
     Enforces JWT authentication and sender identity.
+    With ?stream=true the reply is streamed as server-sent events.
     """
     payload = await request.json()
     sender_id = payload.get("sender_id")
@@ -54,6 +71,9 @@ async def generate_reply(
     if not current_user:
         sender_id = sender_id or "anonymous"
 
+    # Picked up by RequestLoggerMiddleware (no need to re-read the body there)
+    request.state.sender_id = sender_id
+
     # Check if assistant is enabled for this user
     if not is_assist_enabled(sender_id):
         return {"reply": "Assistant mode is currently disabled for your account."}
@@ -71,12 +91,20 @@ async def generate_reply(
         if not message:
             raise HTTPException(status_code=400, detail="Empty message")
 
-        # Step 1: Mask sensitive data before anything else
-        safe_message = mask_sensitive_data(message)
+        if stream:
+            return StreamingResponse(
+                stream_reply_events(request, message, sender_id, receiver_id),
+                media_type="text/event-stream"
+            )
 
-        # Step 2: Detect sender's intent and tone
-        sender_intent = detect_intent(safe_message, sender_id)
-        sender_tone = detect_tone(safe_message)
+        # Step 1-2: Mask sensitive data, detect sender's intent and tone (single pass)
+        analysis = analyze_message(message)
+        safe_message = analysis.sanitized_text
+        sender_intent = analysis.intent
+        sender_tone = analysis.tone
+        # Picked up by RequestLoggerMiddleware for the logs:{sender} entry
+        request.state.intent = sender_intent
+        request.state.confidence = analysis.confidence
 
         # Step 3: Use RASA for structured intent responses if applicable
         use_rasa = sender_intent not in ["greeting", "chitchat", "out_of_scope"]
@@ -84,11 +112,13 @@ async def generate_reply(
 
         if use_rasa:
             try:
-                rasa_reply = query_rasa(safe_message, sender_id)
+                with span("rasa"):
+                    rasa_reply = await query_rasa(safe_message, sender_id)
                 if not rasa_reply or rasa_reply.startswith("⚠️"):
                     # Try RAG fallback
                     try:
-                        rag_reply = search_documents(safe_message)
+                        with span("rag"):
+                            rag_reply = await search_documents_async(safe_message)
                     except Exception as rag_err:
                         print(f"[RAG ERROR] {rag_err}")
                         rag_reply = None
@@ -97,7 +127,8 @@ async def generate_reply(
                     else:
                         # Try LLM fallback
                         try:
-                            llm_reply = call_llm(safe_message)
+                            with span("llm"):
+                                llm_reply = await call_llm(safe_message)
                             final_reply = llm_reply
                         except Exception as llm_err:
                             print(f"[LLM ERROR] {llm_err}")
@@ -108,7 +139,8 @@ async def generate_reply(
                 print(f"[RASA ERROR] {rasa_err}")
                 # Try RAG then LLM fallback
                 try:
-                    rag_reply = search_documents(safe_message)
+                    with span("rag"):
+                        rag_reply = await search_documents_async(safe_message)
                 except Exception as rag_err:
                     print(f"[RAG ERROR] {rag_err}")
                     rag_reply = None
@@ -116,20 +148,21 @@ async def generate_reply(
                     final_reply = rag_reply
                 else:
                     try:
-                        final_reply = call_llm(safe_message)
+                        with span("llm"):
+                            final_reply = await call_llm(safe_message)
                     except Exception as llm_err:
                         print(f"[LLM ERROR] {llm_err}")
                         final_reply = "🤖 Sorry, I'm unable to generate a reply right now."
         else:
             # Skip RASA entirely if intent is chit-chat etc.
-            final_reply = generate_local_reply(
-                safe_message, sender_intent, sender_tone, sender_id
-            )
+            with span("local"):
+                final_reply = generate_local_reply(
+                    safe_message, sender_intent, sender_tone, sender_id
+                )
 
-        # Step 6: Log for monitoring
-        log_conversation(sender_id, message, final_reply, sender_intent)
+        # Step 6: Logged for monitoring by RequestLoggerMiddleware (logs:{sender_id})
 
-        # Step 7: Log fallback source per user in Redis
+        # Step 7: Log fallback source per user in Redis (queued on the background writer)
         try:
             fallback_used = (
                 "rasa" if "rasa_reply" in locals() and rasa_reply and not rasa_reply.startswith("⚠️")
@@ -138,12 +171,12 @@ async def generate_reply(
                 else "local"
             )
 
-            # Save last fallback type used (1 hour expiry)
-            await redis.set(f"fallback:{sender_id}", fallback_used, ex=3600)
+            if log_writer is not None:
+                # Save last fallback type used (1 hour expiry)
+                log_writer.set(f"fallback:{sender_id}", fallback_used, ex=3600)
 
-            # Optional: maintain last 5 fallback types used
-            await redis.lpush(f"fallback:history:{sender_id}", fallback_used)
-            await redis.ltrim(f"fallback:history:{sender_id}", 0, 4)
+                # Optional: maintain last 5 fallback types used
+                log_writer.push_capped(f"fallback:history:{sender_id}", fallback_used, 5)
 
         except Exception as log_fallback_err:
             print(f"[REDIS Fallback Log Error] {log_fallback_err}")
@@ -1,10 +1,24 @@
 # interfaces/api_server/routes/debug.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from interfaces.api_server.auth import get_current_user
-import os, json, yaml, glob, subprocess
+from interfaces.api_server.routes.auth import get_current_user
+import os, json, yaml, glob, subprocess, asyncio, threading
 from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from pydantic import BaseModel
+from ai.fallback.rag_search import RAG_INDEX_BACKEND, VECTOR_INDEX_PATH, retriever
+from ai.fallback.ingest import DOCS_ROOT, Ingestor, resolve_doc_paths
+from ai.assistant_engine.response_cache import response_cache
+from ai.assistant_engine.cascade import cascade_stats
+from ai.plugins.sandbox_runner import sandbox_pool
+from ai.memory.session_context import session_stats
+from ai.memory.learning_memory import memory_stats
+from interfaces.api_server.core.redis_writer import log_writer
+from interfaces.api_server.core.user_prefs import preference_store
+from interfaces.socket_layer.backplane import backplane as socket_backplane
+from interfaces.socket_layer.hub import hub as socket_hub
+from interfaces.api_server.core.log_index import (
+    FALLBACK_INDEX_MAX, active_session_count, last_hour_counts, recent_fallbacks, top_intents,
+)
 
 router = APIRouter(prefix="/debug", tags=["debug"])
 
@@ -35,61 +49,27 @@ async def get_user_logs(user_id: str, _: str = Depends(require_admin)) -> List[D
 
 # --- 2. Fallback Logs ---
 @router.get("/fallbacks")
-async def get_fallbacks(_: str = Depends(require_admin)) -> List[Dict[str, Any]]:
+async def get_fallbacks(limit: int = 200, _: str = Depends(require_admin)) -> List[Dict[str, Any]]:
     if not USE_REDIS or not redis_client:
         raise HTTPException(status_code=500, detail="Redis not available")
-    keys = redis_client.keys("fallbacks:*")
-    all_fallbacks = []
-    for key in keys:
-        user_id = key.decode().split(":")[1]
-        entries = redis_client.lrange(key, 0, 49)
-        for entry in entries:
-            log = json.loads(entry)
-            log["user_id"] = user_id
-            all_fallbacks.append(log)
-    all_fallbacks.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-    return all_fallbacks
+    # Newest first, from the write-time index (see core/log_index.py)
+    return recent_fallbacks(redis_client, limit=max(1, min(limit, FALLBACK_INDEX_MAX)))
 
 # --- 3. Stats Dashboard ---
 @router.get("/stats")
 async def get_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
     if not USE_REDIS or not redis_client:
         raise HTTPException(status_code=500, detail="Redis not available")
-    
-    session_keys = redis_client.keys("user:*:context")
-    active_sessions = len(session_keys)
-
-    now = datetime.utcnow()
-    one_hour_ago = now - timedelta(hours=1)
-    fallback_count = 0
-    total_count = 0
-    top_intents = {}
-
-    for key in redis_client.keys("logs:*"):
-        logs = redis_client.lrange(key, 0, 49)
-        for log in logs:
-            entry = json.loads(log)
-            ts = entry.get("timestamp")
-            if ts:
-                try:
-                    ts_dt = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-                except Exception:
-                    continue
-                if ts_dt > one_hour_ago:
-                    total_count += 1
-                    if entry.get("event") == "fallback":
-                        fallback_count += 1
-                    intent = entry.get("intent")
-                    if intent:
-                        top_intents[intent] = top_intents.get(intent, 0) + 1
 
+    counts = last_hour_counts(redis_client)
+    total_count = counts.get("total", 0)
+    fallback_count = counts.get("event:fallback", 0)
     fallback_pct = (fallback_count / total_count * 100) if total_count else 0
-    top_intents_sorted = sorted(top_intents.items(), key=lambda x: x[1], reverse=True)
 
     return {
-        "active_sessions": active_sessions,
+        "active_sessions": active_session_count(redis_client),
         "fallback_pct_last_hour": round(fallback_pct, 2),
-        "top_intents": top_intents_sorted[:5]
+        "top_intents": top_intents(counts)
     }
 
 # --- 4. Rasa Train Trigger ---
@@ -168,4 +148,98 @@ async def get_session(user_id: str, _: str = Depends(require_admin)) -> Dict[str
     if not context:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    return context
\ No newline at end of file
+    return context
+
+# --- 8. RAG Retriever Stats / Reload ---
+@router.get("/rag")
+async def get_rag_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    return retriever.stats()
+
+@router.post("/rag/reload")
+async def reload_rag_index(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    try:
+        # Loading the embeddings and index takes seconds; keep the event loop serving meanwhile
+        await asyncio.to_thread(retriever.load, force=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to reload index: {str(e)}")
+    return retriever.stats()
+
+class IngestRequest(BaseModel):
+    paths: List[str]
+    rebuild: bool = False
+
+_ingest_lock = threading.Lock()
+
+def _ingest(paths: List[str], rebuild: bool) -> Dict[str, Any]:
+    report = Ingestor(index_path=VECTOR_INDEX_PATH, docs_root=DOCS_ROOT).run(paths, rebuild)
+    if RAG_INDEX_BACKEND == "mmap":
+        # The mmap store is rebuilt from the FAISS store the ingestion maintains: the new chunks
+        # go into the existing lists (k-means is skipped), but the whole store is read and rewritten
+        from ai.fallback.mmap_index import build_from_faiss
+        report["mmap"] = build_from_faiss(VECTOR_INDEX_PATH, retriever.index_path)
+    return report
+
+@router.post("/rag/ingest")
+async def ingest_documents(body: IngestRequest, _: str = Depends(require_admin)) -> Dict[str, Any]:
+    """
+    Embed new/changed chunks of the given files or directories into the index, then hot-swap it.
+    Paths are relative to RAG_DOCS_ROOT; anything resolving outside it is rejected.
+    """
+    try:
+        paths = resolve_doc_paths(body.paths)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not _ingest_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Ingestion already running")
+    try:
+        report = await asyncio.to_thread(_ingest, paths, body.rebuild)
+        await asyncio.to_thread(retriever.reload_if_changed)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"No such file or directory: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+    finally:
+        _ingest_lock.release()
+    return report
+
+# --- 9. Response Cache Stats / Clear ---
+@router.get("/cache")
+async def get_cache_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    return response_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    response_cache.clear()
+    return response_cache.stats()
+
+# --- 10. Fallback Cascade Stats ---
+@router.get("/cascade")
+async def get_cascade_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    return cascade_stats()
+
+# --- 11. Plugin Sandbox Pool Stats ---
+@router.get("/sandbox")
+async def get_sandbox_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    return sandbox_pool.stats()
+
+# --- 12. In-memory Session / Learning Store Sizes ---
+@router.get("/memory")
+async def get_memory_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    return {"sessions": session_stats(), "learning": memory_stats()}
+
+# --- 13. Background Log Writer Stats ---
+@router.get("/writer")
+async def get_writer_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    if log_writer is None:
+        raise HTTPException(status_code=500, detail="Redis not available")
+    return log_writer.stats()
+
+# --- 14. User Preference Snapshot Cache ---
+@router.get("/prefs")
+async def get_prefs_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    return preference_store.stats()
+
+# --- 15. WebSocket Hub ---
+@router.get("/ws")
+async def get_ws_stats(_: str = Depends(require_admin)) -> Dict[str, Any]:
+    return dict(socket_hub.stats(), backplane=socket_backplane.stats())
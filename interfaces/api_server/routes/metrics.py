@@ -0,0 +1,13 @@
+# interfaces/api_server/routes/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from interfaces.api_server.core.tracing import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus scrape endpoint: per-span and per-request latency histograms.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends
-from interfaces.api_server.auth import get_current_user
-from ai.plugins.plugin_registry import (
-    register_plugin_intents,
-    is_plugin_enabled,
-    enable_plugin,
-    disable_plugin,
-    list_enabled_plugins,
+from interfaces.api_server.routes.auth import get_current_user
+from ai.plugins.plugin_registry import register_plugin_intents
+from interfaces.api_server.routes.admin import (
+    enabled_plugins_for_user,
+    is_plugin_enabled_for_user,
+    set_plugin_enabled_for_user,
 )
+from ai.plugins.loader import reload_plugin_routes, plugin_routes_stats
 """plugin_admin.py - Plugin management routes for admin users
 ✅ Register plugins with intents
 """
@@ -31,9 +31,9 @@ async def enable_plugin_for_user(
     current_user: str = Depends(get_current_user)
 ):
     """
-    Enable a plugin for a user (in-memory).
+    Enable a plugin for a user (persisted; cached snapshots are invalidated).
     """
-    enable_plugin(user_id, plugin_name)
+    set_plugin_enabled_for_user(user_id, plugin_name, True)
     return {"user_id": user_id, "plugin": plugin_name, "enabled": True}
 
 @router.post("/disable")
@@ -43,9 +43,9 @@ async def disable_plugin_for_user(
     current_user: str = Depends(get_current_user)
 ):
     """
-    Disable a plugin for a user (in-memory).
+    Disable a plugin for a user (persisted; cached snapshots are invalidated).
     """
-    disable_plugin(user_id, plugin_name)
+    set_plugin_enabled_for_user(user_id, plugin_name, False)
     return {"user_id": user_id, "plugin": plugin_name, "enabled": False}
 
 @router.get("/enabled/{user_id}")
@@ -54,9 +54,9 @@ async def get_enabled_plugins(
     current_user: str = Depends(get_current_user)
 ):
     """
-    List enabled plugins for a user (in-memory).
+    List enabled plugins for a user.
     """
-    plugins = list_enabled_plugins(user_id)
+    plugins = enabled_plugins_for_user(user_id)
     return {"user_id": user_id, "enabled_plugins": plugins}
 
 @router.get("/is-enabled")
@@ -66,7 +66,21 @@ async def check_plugin_enabled(
     current_user: str = Depends(get_current_user)
 ):
     """
-    Check if a plugin is enabled for a user (in-memory).
+    Check if a plugin is enabled for a user.
     """
-    enabled = is_plugin_enabled(user_id, plugin_name)
-    return {"user_id": user_id, "plugin": plugin_name, "enabled": enabled}
\ No newline at end of file
+    enabled = is_plugin_enabled_for_user(user_id, plugin_name)
+    return {"user_id": user_id, "plugin": plugin_name, "enabled": enabled}
+
+@router.post("/reload")
+async def reload_plugins(current_user: str = Depends(get_current_user)):
+    """
+    Rebuild the intent → plugin routing table (plugin_config.yaml, registrations, installed plugins).
+    """
+    return reload_plugin_routes()
+
+@router.get("/routes")
+async def get_plugin_routes(current_user: str = Depends(get_current_user)):
+    """
+    Show the compiled intent → plugin routing table.
+    """
+    return plugin_routes_stats()
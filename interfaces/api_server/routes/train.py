@@ -1,7 +1,7 @@
 # interfaces/api_server/routes/train.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from interfaces.api_server.auth import get_current_user
+from interfaces.api_server.routes.auth import get_current_user
 from ai.rasa.train_model import train_rasa_model
 
 router = APIRouter(prefix="/train", tags=["rasa"])
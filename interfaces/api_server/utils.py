@@ -18,9 +18,16 @@ def safe_decode(val):
 def capped_redis_list(redis_client, key: str, entry: Dict[str, Any], cap: int = 50):
     """
     Push a log entry to a Redis list and trim it to a maximum length.
+    Writes to the shared client go through the background log writer.
     """
-    redis_client.lpush(key, json.dumps(entry))
-    redis_client.ltrim(key, 0, cap - 1)
+    from interfaces.api_server.core.redis_writer import log_writer
+    if log_writer is not None and redis_client is log_writer.redis:
+        log_writer.push_capped(key, json.dumps(entry), cap)
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.lpush(key, json.dumps(entry))
+    pipe.ltrim(key, 0, cap - 1)
+    pipe.execute()
 
 def parse_yaml_file(path: str) -> Optional[Dict]:
     """
@@ -57,19 +64,19 @@ Stored per-user in Redis for admin review, or printed in dev mode.
 
 try:
     from interfaces.api_server.session import redis_client
+    from interfaces.api_server.core.redis_writer import log_writer
     USE_REDIS = True
 except ImportError:
     redis_client = None
+    log_writer = None
     USE_REDIS = False
 
 def log_fallback_source(user_id: str, source: str):
     """
     Logs fallback source (PLUGIN, RASA, RAG, LLM, LOCAL) to Redis or prints in dev mode.
+    The Redis write is queued on the background log writer.
     """
-    if USE_REDIS and redis_client:
-        try:
-            redis_client.set(f"fallback:{user_id}", source)
-        except Exception as e:
-            print(f"[Fallback Log][REDIS ERROR] {user_id} → {source} ({e})")
+    if USE_REDIS and log_writer:
+        log_writer.set(f"fallback:{user_id}", source)
     else:
         print(f"[Fallback Log] {user_id} → {source}")
\ No newline at end of file
@@ -1,60 +1,88 @@
 # interfaces/api_server/middleware/logging.py
+import os
 import time
 import json
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from interfaces.api_server.session import redis_client  # assumes redis_client is a Redis instance
-from interfaces.api_server.auth import get_current_user
-from fastapi import status
-
-class RequestLoggerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+from typing import Any, Callable, Dict, Optional, Tuple
+from interfaces.api_server.core.log_index import index_log_entry
+from interfaces.api_server.core.redis_writer import log_writer
+from interfaces.api_server.core.tracing import end_trace, request_seconds, start_trace
+
+# Bytes of an error response body kept in the log entry
+ERROR_BODY_LIMIT = 512
+# Add the request's spans (tier timings) to its log entry
+TRACE_IN_LOGS = os.getenv("TRACE_IN_LOGS", "false").lower() == "true"
+
+def redis_log_sink(log_entry: Dict[str, Any]):
+    """Queue the entry on the background writer: capped logs:{sender} list + hourly stats index."""
+    if log_writer is None:
+        return
+    sender_id = log_entry["sender_id"]
+    log_writer.push_capped(f"logs:{sender_id}", json.dumps(log_entry), 50)
+    log_writer.call(index_log_entry, log_entry)
+
+class RequestLoggerMiddleware:
+    """
+    Pure ASGI request logger for /generate-reply.
+
+    Nothing is read from the request: the sender, intent and confidence come from
+    request.state (set by the route after authenticating) or the request's trace, and
+    the status code and error body are taken from the response as it is sent. The
+    finished entry goes to `sink`, which must not block (the default queues it for Redis).
+    Each request runs inside a trace (see core/tracing.py); its duration is observed in
+    rtca_request_seconds and, with trace_in_logs, its spans are added to the entry.
+    """
+
+    def __init__(self, app, sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 path_suffixes: Tuple[str, ...] = ("/generate-reply",), trace_in_logs: bool = TRACE_IN_LOGS):
+        self.app = app
+        self.sink = sink or redis_log_sink
+        self.path_suffixes = path_suffixes
+        self.trace_in_logs = trace_in_logs
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].endswith(self.path_suffixes):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
         timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        path = request.url.path
-        ip = request.client.host
-        sender_id = None
+        state = scope.setdefault("state", {})
+        response = {"status_code": 500, "error": b""}
 
-        # Only log /api/generate-reply
-        if path.endswith("/generate-reply"):
-            try:
-                body = await request.json()
-                sender_id = body.get("sender_id")
-            except Exception:
-                sender_id = None
-
-            # Try to get sender_id from JWT if not in body
-            if not sender_id:
-                try:
-                    user = await get_current_user(request)
-                    sender_id = user
-                except Exception:
-                    sender_id = "anonymous"
-
-        response = await call_next(request)
-
-        if path.endswith("/generate-reply"):
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                response["status_code"] = message["status"]
+            elif message["type"] == "http.response.body" and response["status_code"] >= 400:
+                if len(response["error"]) < ERROR_BODY_LIMIT:
+                    response["error"] += message.get("body", b"")[:ERROR_BODY_LIMIT - len(response["error"])]
+            await send(message)
+
+        trace, token = start_trace()
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            end_trace(token)
+            status_code = response["status_code"]
+            client = scope.get("client")
+            duration_us = (time.perf_counter_ns() - start) // 1000
             log_entry = {
                 "timestamp": timestamp,
-                "sender_id": sender_id or "unknown",
-                "event": "error" if response.status_code >= 400 else "reply_sent",
-                "intent": None,  # Optionally fill in route logic
-                "confidence": None,
+                "sender_id": state.get("sender_id") or "anonymous",
+                "event": "error" if status_code >= 400 else "reply_sent",
+                "intent": state.get("intent", trace.attrs.get("intent")),
+                "confidence": state.get("confidence", trace.attrs.get("confidence")),
                 "message": None,
-                "path": path,
-                "ip": ip,
-                "status_code": response.status_code
+                "path": scope["path"],
+                "ip": client[0] if client else None,
+                "status_code": status_code,
+                "duration_us": duration_us,
             }
-            # If error, try to extract reason
-            if response.status_code >= 400:
-                try:
-                    body = await response.body()
-                    log_entry["error"] = body.decode()
-                except Exception:
-                    log_entry["error"] = "Unknown error"
-
-            # Store in Redis (capped list)
-            redis_client.lpush(f"logs:{sender_id}", json.dumps(log_entry))
-            redis_client.ltrim(f"logs:{sender_id}", 0, 49)
-
-        return response
\ No newline at end of file
+            if status_code >= 400:
+                log_entry["error"] = response["error"].decode("utf-8", "replace") or "Unknown error"
+            if self.trace_in_logs:
+                log_entry["trace"] = trace.as_dict()
+            request_seconds.observe(duration_us / 1e6, scope["path"], str(status_code))
+            try:
+                self.sink(log_entry)
+            except Exception as e:
+                print(f"[REQUEST LOG ERROR] {e}")
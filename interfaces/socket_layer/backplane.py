@@ -0,0 +1,294 @@
+"""
+backplane.py - WebSocket delivery across workers
+
+The hub only knows the sockets of its own process. With several uvicorn workers or
+containers, a message for a user whose socket lives on another worker goes through Redis:
+- presence: ws:presence:{user} is a sorted set of worker ids scored by expiry time. A worker
+  adds itself when a user's first socket opens there, removes itself when the last one
+  closes, and refreshes all its users every WS_PRESENCE_HEARTBEAT seconds, so the entries
+  of a crashed worker lapse after WS_PRESENCE_TTL.
+- routing: send_to_user()/send_to_peer() deliver to local sockets right away and queue the
+  message for the other workers. The queue is flushed after WS_PUBLISH_INTERVAL seconds (at
+  once when WS_PUBLISH_BATCH messages are waiting) in two round trips: one pipeline with the
+  pending presence changes and the presence lookups of all receivers, then one PUBLISH per
+  target worker carrying all its messages as one JSON list.
+- every worker subscribes to its own channel ws:worker:{id} and hands what arrives to its hub.
+Select with WS_BACKPLANE=local|redis. The local backplane (the default) delivers within
+the process only, for single-worker runs and tests.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from interfaces.socket_layer.hub import ConnectionHub, hub
+
+WS_BACKPLANE = os.getenv("WS_BACKPLANE", "local").lower()
+WS_PRESENCE_TTL = float(os.getenv("WS_PRESENCE_TTL", "30"))
+WS_PRESENCE_HEARTBEAT = float(os.getenv("WS_PRESENCE_HEARTBEAT", "10"))
+WS_PUBLISH_INTERVAL = float(os.getenv("WS_PUBLISH_INTERVAL", "0.002"))
+WS_PUBLISH_BATCH = int(os.getenv("WS_PUBLISH_BATCH", "500"))
+# Messages waiting for a publish beyond this are dropped (Redis down or too slow)
+WS_PUBLISH_MAX_PENDING = int(os.getenv("WS_PUBLISH_MAX_PENDING", "50000"))
+
+# (user_id, peer_id or None for all of the user's sockets, frame)
+Envelope = Tuple[str, Optional[str], str]
+
+def _presence_key(user_id: str) -> str:
+    return f"ws:presence:{user_id}"
+
+def _channel(worker_id: str) -> str:
+    return f"ws:worker:{worker_id}"
+
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LocalBackplane:
+    """Single process: every socket is in this worker's hub."""
+
+    def __init__(self, hub: ConnectionHub, worker_id: Optional[str] = None):
+        self.hub = hub
+        self.worker_id = worker_id or new_worker_id()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def send_to_user(self, user_id: str, text: str) -> int:
+        """Deliver to every socket of a user. Returns how many local sockets accepted it."""
+        return self.hub.send_to_user(user_id, text)
+
+    def send_to_peer(self, user_id: str, peer_id: str, text: str) -> int:
+        """Deliver to the user's sockets opened for a conversation with peer_id."""
+        return self.hub.send_to_peer(user_id, peer_id, text)
+
+    async def online_workers(self, user_id: str) -> List[str]:
+        """Workers holding a socket of the user."""
+        return [self.worker_id] if self.hub.connections(user_id) else []
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backplane": "local", "worker_id": self.worker_id}
+
+class RedisBackplane(LocalBackplane):
+    def __init__(self, redis, hub: ConnectionHub, worker_id: Optional[str] = None,
+                 presence_ttl: float = WS_PRESENCE_TTL, heartbeat: float = WS_PRESENCE_HEARTBEAT,
+                 publish_interval: float = WS_PUBLISH_INTERVAL, batch_size: int = WS_PUBLISH_BATCH,
+                 max_pending: int = WS_PUBLISH_MAX_PENDING, clock: Callable[[], float] = time.time):
+        super().__init__(hub, worker_id)
+        self.redis = redis
+        self.presence_ttl = presence_ttl
+        self.heartbeat = heartbeat
+        self.publish_interval = publish_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.clock = clock  # wall clock: expiry scores are compared across hosts
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._pending: List[Envelope] = []
+        # user -> True (joined) / False (left) since the last flush
+        self._presence: Dict[str, bool] = {}
+        self._stats = {"queued": 0, "dropped": 0, "published": 0, "publishes": 0, "flushes": 0,
+                       "undeliverable": 0, "received": 0, "delivered": 0, "errors": 0}
+
+    # --- lifecycle ---
+    async def start(self):
+        """Subscribe to this worker's channel and start publishing presence (call on startup)."""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.hub.add_presence_listener(self._on_presence)
+        for user_id in self.hub.users():
+            self._presence[user_id] = True
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{_channel(self.worker_id): self._on_message})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            # Local sockets still get their messages; other workers can't reach this one
+            print(f"[BACKPLANE PUBSUB ERROR] {e}")
+        self._heartbeat = asyncio.ensure_future(self._heartbeat_loop())
+        self._schedule_flush()
+
+    async def stop(self):
+        """Publish what is queued, withdraw this worker's presence and unsubscribe (call on shutdown)."""
+        if self._loop is None:
+            return
+        self.hub.remove_presence_listener(self._on_presence)
+        for task in (self._heartbeat, self._flusher):
+            if task is not None:
+                task.cancel()
+        self._heartbeat = self._flusher = None
+        for user_id in self.hub.users():
+            self._presence[user_id] = False
+        while self._pending or self._presence:
+            await self._flush_once()
+        if self._listener is not None:
+            self._listener.stop()
+        self._listener = None
+        self._loop = None
+
+    # --- sending ---
+    def send_to_user(self, user_id: str, text: str) -> int:
+        """
+        Deliver to every socket of a user, on any worker. Local sockets get the frame now and
+        the count covers only them; other workers get it with the next publish.
+        """
+        self._queue((user_id, None, text))
+        return self.hub.send_to_user(user_id, text)
+
+    def send_to_peer(self, user_id: str, peer_id: str, text: str) -> int:
+        self._queue((user_id, peer_id, text))
+        return self.hub.send_to_peer(user_id, peer_id, text)
+
+    def _queue(self, envelope: Envelope):
+        if self._loop is None:
+            return  # not started: single worker
+        if len(self._pending) >= self.max_pending:
+            self._stats["dropped"] += 1
+            return
+        self._pending.append(envelope)
+        self._stats["queued"] += 1
+        self._schedule_flush()
+
+    def _on_presence(self, user_id: str, online: bool):
+        self._presence[user_id] = online
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is None and (self._pending or self._presence):
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def _flush_loop(self):
+        try:
+            while self._pending or self._presence:
+                if len(self._pending) < self.batch_size:
+                    # Let the messages of this loop turn (and the next few) join the batch
+                    await asyncio.sleep(self.publish_interval)
+                await self._flush_once()
+        finally:
+            self._flusher = None
+
+    async def _flush_once(self):
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        presence, self._presence = self._presence, {}
+        try:
+            published, publishes, undeliverable = await asyncio.to_thread(self._publish, batch, presence)
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"[BACKPLANE ERROR] publish of {len(batch)} messages failed: {e}")
+            return
+        self._stats["flushes"] += 1
+        self._stats["published"] += published
+        self._stats["publishes"] += publishes
+        self._stats["undeliverable"] += undeliverable
+
+    def _publish(self, batch: List[Envelope], presence: Dict[str, bool]) -> Tuple[int, int, int]:
+        """Runs in a thread: write presence changes, look up receivers, publish per worker."""
+        now = self.clock()
+        users = list({user_id for user_id, _, _ in batch})
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id, online in presence.items():
+            self._write_presence(pipe, user_id, online, now)
+        for user_id in users:
+            pipe.zrangebyscore(_presence_key(user_id), now, "+inf")
+        results = pipe.execute()
+        if not batch:
+            return 0, 0, 0
+        workers = dict(zip(users, results[len(results) - len(users):]))
+
+        by_worker: Dict[str, List[Envelope]] = {}
+        published = undeliverable = 0
+        for envelope in batch:
+            holders = [_decode(worker_id) for worker_id in workers[envelope[0]] or ()]
+            if not holders:
+                undeliverable += 1  # offline everywhere (this worker registers itself too)
+            targets = [worker_id for worker_id in holders if worker_id != self.worker_id]
+            for worker_id in targets:
+                by_worker.setdefault(worker_id, []).append(envelope)
+            published += bool(targets)
+        if by_worker:
+            pipe = self.redis.pipeline(transaction=False)
+            for worker_id, envelopes in by_worker.items():
+                pipe.publish(_channel(worker_id), json.dumps(envelopes))
+            pipe.execute()
+        return published, len(by_worker), undeliverable
+
+    def _write_presence(self, pipe, user_id: str, online: bool, now: float):
+        key = _presence_key(user_id)
+        if online:
+            pipe.zadd(key, {self.worker_id: now + self.presence_ttl})
+            pipe.expire(key, int(self.presence_ttl) + 1)
+        else:
+            pipe.zrem(key, self.worker_id)
+
+    # --- presence heartbeat ---
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            users = self.hub.users()
+            if not users:
+                continue
+            try:
+                await asyncio.to_thread(self._refresh_presence, users)
+            except Exception as e:
+                self._stats["errors"] += 1
+                print(f"[BACKPLANE ERROR] presence heartbeat: {e}")
+
+    def _refresh_presence(self, users: List[str]):
+        now = self.clock()
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in users:
+            self._write_presence(pipe, user_id, True, now)
+            # Drop the entries of workers that stopped refreshing
+            pipe.zremrangebyscore(_presence_key(user_id), "-inf", now)
+        pipe.execute()
+
+    async def online_workers(self, user_id: str) -> List[str]:
+        members = await asyncio.to_thread(self.redis.zrangebyscore, _presence_key(user_id), self.clock(), "+inf")
+        return [_decode(member) for member in members]
+
+    # --- receiving ---
+    def _on_message(self, message: Dict[str, Any]):
+        """Runs in the pub/sub thread: hand the batch to the event loop that owns the hub."""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._deliver, message["data"])
+
+    def _deliver(self, data: Any):
+        try:
+            envelopes = json.loads(data)
+        except ValueError as e:
+            print(f"[BACKPLANE ERROR] bad message: {e}")
+            return
+        for user_id, peer_id, text in envelopes:
+            self._stats["received"] += 1
+            if peer_id is None:
+                self._stats["delivered"] += self.hub.send_to_user(user_id, text)
+            else:
+                self._stats["delivered"] += self.hub.send_to_peer(user_id, peer_id, text)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, backplane="redis", worker_id=self.worker_id, pending=len(self._pending),
+                    listening=self._listener is not None)
+
+def _make_backplane() -> LocalBackplane:
+    if WS_BACKPLANE == "redis":
+        try:
+            from interfaces.api_server.session import redis_client
+            return RedisBackplane(redis_client, hub)
+        except Exception as e:
+            print(f"[BACKPLANE ERROR] Redis unavailable, delivering locally only: {e}")
+    return LocalBackplane(hub)
+
+backplane = _make_backplane()
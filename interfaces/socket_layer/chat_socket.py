@@ -1,27 +1,35 @@
 import json
-import asyncio
-from fastapi import WebSocket, WebSocketDisconnect
-from ai.assistant_engine.ai_router import route_message
+from contextlib import aclosing
+from fastapi import APIRouter, WebSocket
+from ai.assistant_engine.ai_router import route_message_stream
+from interfaces.socket_layer.backplane import backplane
+from interfaces.socket_layer.hub import Connection, hub
 
-active_connections = {}
+router = APIRouter()
 
-async def connect(websocket: WebSocket, sender_id: str, receiver_id: str):
-    await websocket.accept()
-    active_connections[(sender_id, receiver_id)] = websocket
+async def send_personal_message(message: str, sender_id: str, receiver_id: str):
+    """Send to the socket(s) sender_id opened for the conversation with receiver_id, on any worker."""
+    backplane.send_to_peer(sender_id, receiver_id, message)
 
-async def disconnect(sender_id: str, receiver_id: str):
-    active_connections.pop((sender_id, receiver_id), None)
+async def send_to_user(message: str, user_id: str) -> int:
+    """Send to every open socket of a user (all devices/tabs, any worker). Returns the local count."""
+    return backplane.send_to_user(user_id, message)
 
-async def send_personal_message(message: str, sender_id: str, receiver_id: str):
-    ws = active_connections.get((sender_id, receiver_id))
-    if ws:
-        await ws.send_text(message)
+async def stream_reply(connection: Connection, message: str):
+    """Queue the reply as {"type": "chunk", "delta"} frames followed by {"type": "done", "reply"}."""
+    parts = []
+    async with aclosing(route_message_stream(message, connection.user_id, connection.peer_id)) as chunks:
+        async for chunk in chunks:
+            parts.append(chunk)
+            if not connection.send(json.dumps({"type": "chunk", "delta": chunk})):
+                return  # evicted or gone: closing the stream stops the generation
+    connection.send(json.dumps({"type": "done", "reply": "".join(parts)}))
 
-async def receive_and_reply(websocket: WebSocket, user_id: str):
-    try:
-        while True:
-            data = await websocket.receive_text()
-            reply = route_message(data)
-            await websocket.send_text(json.dumps({"reply": reply}))
-    except WebSocketDisconnect:
-        await disconnect_user(user_id)
\ No newline at end of file
+@router.websocket("/ws/{sender_id}/{receiver_id}")
+async def chat_websocket(websocket: WebSocket, sender_id: str, receiver_id: str):
+    """
+    Chat socket. Each text frame is a message; replies are streamed back as JSON frames.
+    The server also sends {"type": "ping"} frames; reply {"type": "pong"} (or send anything)
+    to stay connected. A disconnect cancels the reply being generated.
+    """
+    await hub.serve(websocket, sender_id, receiver_id, stream_reply)
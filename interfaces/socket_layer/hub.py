@@ -0,0 +1,286 @@
+"""
+hub.py - WebSocket connection hub
+
+Every socket is registered as a Connection, indexed by user so a message can be fanned out
+to all of a user's sockets. Per connection:
+- receive: the endpoint's own task only reads frames, so pongs and new messages are seen
+  while a reply is being computed
+- compute: incoming messages are handled in order by a task started on demand (at most
+  WS_MAX_PENDING waiting); a disconnect cancels it
+- send: frames go to a bounded outbox drained by a task started on demand, so a slow
+  client never blocks the code producing frames. When the outbox is full the client is
+  a slow consumer and is evicted (closed with 1013).
+Idle sockets therefore cost no tasks besides their receive loop. One hub-wide heartbeat
+sends {"type": "ping"} to sockets quiet for WS_PING_INTERVAL seconds; a client that sends
+nothing (a {"type": "pong"} reply counts) for WS_PING_INTERVAL + WS_PONG_TIMEOUT is closed.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "8"))
+WS_MAX_CONNECTIONS_PER_USER = int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "16"))
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))
+WS_PONG_TIMEOUT = float(os.getenv("WS_PONG_TIMEOUT", "20"))
+# Sockets handled per event-loop turn by the heartbeat
+WS_SWEEP_SLICE = int(os.getenv("WS_SWEEP_SLICE", "500"))
+
+CLOSE_GOING_AWAY = 1001
+CLOSE_TRY_AGAIN_LATER = 1013
+
+PING_FRAME = json.dumps({"type": "ping"})
+BUSY_FRAME = json.dumps({"type": "error", "error": "too many pending messages"})
+
+MessageHandler = Callable[["Connection", str], Awaitable[None]]
+# Called with (user_id, True) when a user's first socket opens, (user_id, False) when the last closes
+PresenceListener = Callable[[str, bool], None]
+
+class Connection:
+    __slots__ = ("id", "user_id", "peer_id", "websocket", "hub", "outbox", "inbox", "last_seen",
+                 "closed", "_sender", "_worker")
+
+    def __init__(self, hub: "ConnectionHub", websocket: WebSocket, user_id: str, peer_id: Optional[str]):
+        self.id = next(hub._ids)
+        self.hub = hub
+        self.websocket = websocket
+        self.user_id = user_id
+        self.peer_id = peer_id
+        self.outbox: Deque[str] = deque()
+        self.inbox: Deque[str] = deque()
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self._sender: Optional[asyncio.Task] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def send(self, text: str) -> bool:
+        """Queue a frame without waiting. False if the connection is closed or was just evicted."""
+        if self.closed:
+            return False
+        if len(self.outbox) >= self.hub.send_queue_size:
+            self.hub.evict(self, CLOSE_TRY_AGAIN_LATER, "slow_consumer")
+            return False
+        self.outbox.append(text)
+        self.hub._stats["frames_queued"] += 1
+        if self._sender is None:
+            self._sender = asyncio.ensure_future(self._drain())
+        return True
+
+    async def _drain(self):
+        try:
+            while self.outbox and not self.closed:
+                await self.websocket.send_text(self.outbox.popleft())
+                self.hub._stats["frames_sent"] += 1
+        except Exception:
+            self.hub.evict(self, CLOSE_GOING_AWAY, "send_failed")
+        finally:
+            self._sender = None
+
+    def submit(self, message: str, handler: MessageHandler):
+        if len(self.inbox) >= self.hub.max_pending:
+            self.hub._stats["busy_rejections"] += 1
+            self.send(BUSY_FRAME)
+            return
+        self.inbox.append(message)
+        if self._worker is None:
+            self._worker = asyncio.ensure_future(self._work(handler))
+
+    async def _work(self, handler: MessageHandler):
+        try:
+            while self.inbox and not self.closed:
+                message = self.inbox.popleft()
+                try:
+                    await handler(self, message)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[WS HANDLER ERROR] {self.user_id}: {e}")
+        finally:
+            self._worker = None
+
+    def _cancel_tasks(self):
+        self.inbox.clear()
+        self.outbox.clear()
+        for task in (self._worker, self._sender):
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+
+class ConnectionHub:
+    def __init__(self, send_queue_size: int = WS_SEND_QUEUE_SIZE, max_pending: int = WS_MAX_PENDING,
+                 max_per_user: int = WS_MAX_CONNECTIONS_PER_USER, ping_interval: float = WS_PING_INTERVAL,
+                 pong_timeout: float = WS_PONG_TIMEOUT):
+        self.send_queue_size = send_queue_size
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self.ping_interval = ping_interval
+        self.pong_timeout = pong_timeout
+        self._ids = itertools.count(1)
+        self._by_user: Dict[str, Set[Connection]] = {}
+        self._count = 0
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._presence_listeners: List[PresenceListener] = []
+        self._stats = {"accepted": 0, "rejected": 0, "closed": 0, "frames_queued": 0, "frames_sent": 0,
+                       "busy_rejections": 0, "evicted_slow_consumer": 0, "evicted_heartbeat": 0,
+                       "evicted_send_failed": 0}
+
+    # --- registry ---
+    async def register(self, websocket: WebSocket, user_id: str, peer_id: Optional[str] = None) -> Optional[Connection]:
+        """Accept the socket and track it, or refuse it if the user already has too many."""
+        connections = self._by_user.get(user_id)
+        if connections is not None and len(connections) >= self.max_per_user:
+            self._stats["rejected"] += 1
+            await websocket.close(CLOSE_TRY_AGAIN_LATER)
+            return None
+        await websocket.accept()
+        connection = Connection(self, websocket, user_id, peer_id)
+        if connections is None:
+            connections = self._by_user[user_id] = set()
+            self._notify(user_id, True)
+        connections.add(connection)
+        self._count += 1
+        self._stats["accepted"] += 1
+        self._ensure_heartbeat()
+        return connection
+
+    def unregister(self, connection: Connection):
+        connections = self._by_user.get(connection.user_id)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self._by_user[connection.user_id]
+            self._notify(connection.user_id, False)
+        self._count -= 1
+        self._stats["closed"] += 1
+        connection.closed = True
+        connection._cancel_tasks()
+
+    def evict(self, connection: Connection, code: int, reason: str):
+        if connection.closed:
+            return
+        key = f"evicted_{reason}"
+        self._stats[key] = self._stats.get(key, 0) + 1
+        self.unregister(connection)
+        asyncio.ensure_future(self._close(connection.websocket, code))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int):
+        try:
+            # A stalled client can't block eviction
+            await asyncio.wait_for(websocket.close(code), 1.0)
+        except Exception:
+            pass
+
+    def add_presence_listener(self, listener: PresenceListener):
+        self._presence_listeners.append(listener)
+
+    def remove_presence_listener(self, listener: PresenceListener):
+        if listener in self._presence_listeners:
+            self._presence_listeners.remove(listener)
+
+    def _notify(self, user_id: str, online: bool):
+        for listener in self._presence_listeners:
+            try:
+                listener(user_id, online)
+            except Exception as e:
+                print(f"[WS PRESENCE ERROR] {user_id}: {e}")
+
+    def users(self) -> List[str]:
+        """Users with at least one open socket on this worker."""
+        return list(self._by_user)
+
+    def connections(self, user_id: str) -> List[Connection]:
+        return list(self._by_user.get(user_id, ()))
+
+    def all_connections(self) -> List[Connection]:
+        return [connection for connections in self._by_user.values() for connection in connections]
+
+    # --- delivery ---
+    def send_to_user(self, user_id: str, text: str) -> int:
+        """Fan a frame out to every socket of a user. Returns how many accepted it."""
+        return sum(connection.send(text) for connection in self.connections(user_id))
+
+    def send_to_peer(self, user_id: str, peer_id: str, text: str) -> int:
+        """Send to the user's sockets opened for a conversation with peer_id."""
+        return sum(connection.send(text) for connection in self.connections(user_id)
+                   if connection.peer_id == peer_id)
+
+    # --- serving ---
+    async def serve(self, websocket: WebSocket, user_id: str, peer_id: Optional[str], handler: MessageHandler):
+        """Run a socket until it disconnects: read frames here, handle and send them in the background."""
+        connection = await self.register(websocket, user_id, peer_id)
+        if connection is None:
+            return
+        try:
+            while not connection.closed:
+                text = await websocket.receive_text()
+                connection.last_seen = time.monotonic()
+                if text.startswith("{") and _is_pong(text):
+                    continue
+                connection.submit(text, handler)
+        except (WebSocketDisconnect, RuntimeError):
+            # RuntimeError: the hub already closed the socket (eviction)
+            pass
+        finally:
+            self.unregister(connection)
+
+    # --- heartbeat ---
+    def _ensure_heartbeat(self):
+        if self.ping_interval > 0 and (self._heartbeat is None or self._heartbeat.done()):
+            self._heartbeat = asyncio.ensure_future(self._heartbeat_loop())
+
+    async def _heartbeat_loop(self):
+        while self._count:
+            await asyncio.sleep(self.ping_interval)
+            # In slices, so a sweep over many thousand sockets doesn't stall the event loop
+            connections = self.all_connections()
+            for start in range(0, len(connections), WS_SWEEP_SLICE):
+                self.sweep(connections=connections[start:start + WS_SWEEP_SLICE])
+                await asyncio.sleep(0)
+
+    def sweep(self, now: Optional[float] = None, connections: Optional[List[Connection]] = None) -> int:
+        """
+        Close sockets silent for too long and ping the ones quiet for a ping interval
+        (sockets that sent something recently need no ping). Returns how many were closed.
+        """
+        now = time.monotonic() if now is None else now
+        deadline = now - self.ping_interval - self.pong_timeout
+        quiet_since = now - self.ping_interval
+        closed = 0
+        for connection in self.all_connections() if connections is None else connections:
+            if connection.closed:
+                continue
+            if connection.last_seen < deadline:
+                self.evict(connection, CLOSE_GOING_AWAY, "heartbeat")
+                closed += 1
+            elif connection.last_seen < quiet_since:
+                connection.send(PING_FRAME)
+        return closed
+
+    async def shutdown(self):
+        for connection in self.all_connections():
+            self.evict(connection, CLOSE_GOING_AWAY, "shutdown")
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        queued = [len(c.outbox) for connections in self._by_user.values() for c in connections]
+        return dict(self._stats, connections=self._count, users=len(self._by_user),
+                    outbox_frames=sum(queued), outbox_max=max(queued, default=0),
+                    send_queue_size=self.send_queue_size)
+
+def _is_pong(text: str) -> bool:
+    try:
+        frame = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(frame, dict) and frame.get("type") == "pong"
+
+hub = ConnectionHub()
@@ -4,12 +4,14 @@ from typing import Any, Text, Dict, List
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
+import os
 import time
 import json
 import redis
 
 redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
 redis_client = redis.Redis.from_url(redis_url)
+FALLBACK_INDEX_MAX = int(os.getenv("FALLBACK_INDEX_MAX", "1000"))
 
 class ActionHandleHelp(Action):
     def name(self) -> Text:
@@ -64,8 +66,14 @@ class ActionDynamicReply(Action):
                 "message": last_messages[-1] if last_messages else "",
                 "last_3_messages": last_messages
             }
-            redis_client.lpush(f"fallbacks:{sender_id}", json.dumps(log_entry))
-            redis_client.ltrim(f"fallbacks:{sender_id}", 0, 49)
+            # Same writes as interfaces/api_server/core/log_index.index_fallback_entry
+            # (the action server runs in its own container without the API package)
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.lpush(f"fallbacks:{sender_id}", json.dumps(log_entry))
+            pipe.ltrim(f"fallbacks:{sender_id}", 0, 49)
+            pipe.zadd("index:fallbacks", {json.dumps(dict(log_entry, user_id=sender_id), sort_keys=True): time.time()})
+            pipe.zremrangebyrank("index:fallbacks", 0, -(FALLBACK_INDEX_MAX + 1))
+            pipe.execute()
 
         # ... your dynamic reply logic ...
         dispatcher.utter_message(text="Here's a dynamic response based on your recent activity.")
@@ -0,0 +1,130 @@
+"""Test doubles shared by several test modules (Redis, clock, WebSocket)."""
+
+import asyncio
+import fnmatch
+from starlette.websockets import WebSocketDisconnect
+
+class FakeRedis:
+    """Just the commands the Redis-backed stores use; the pipeline runs commands immediately."""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, value)
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def hincrby(self, key, field, amount):
+        bucket = self.data.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + amount
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def hsetnx(self, key, field, value):
+        self.data.setdefault(key, {}).setdefault(field, value)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def zremrangebyrank(self, key, start, end):
+        ranked = sorted(self.data.get(key, {}).items(), key=lambda x: x[1])
+        for member, _ in ranked[start:max(0, len(ranked) + end + 1)]:
+            del self.data[key][member]
+
+    def zrevrange(self, key, start, end):
+        ranked = sorted(self.data.get(key, {}).items(), key=lambda x: x[1], reverse=True)
+        return [member for member, _ in ranked[start:end + 1]]
+
+    def zrem(self, key, member):
+        self.data.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        low = float(low)
+        for member, score in list(self.data.get(key, {}).items()):
+            if low <= score <= float(high):
+                del self.data[key][member]
+
+    def zunionstore(self, dest, keys, aggregate=None):
+        merged = {}
+        for key in keys:
+            for member, score in self.data.get(key, {}).items():
+                merged[member] = max(score, merged.get(member, score)) if aggregate == "MAX" else \
+                    merged.get(member, 0) + score
+        self.data[dest] = merged
+
+    def zcount(self, key, low, high):
+        return sum(float(low) <= score <= float(high) for score in self.data.get(key, {}).values())
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def scan_iter(self, match, count=None):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.results.append(getattr(self.redis, name)(*args, **kwargs))
+        return call
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeWebSocket:
+    """Client side: put frames in `incoming`, read what the server sent from `sent`."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+        self.close_code = None
+        self.send_gate = asyncio.Event()
+        self.send_gate.set()
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        self.close_code = code
+        await self.incoming.put(None)
+
+    async def receive_text(self):
+        text = await self.incoming.get()
+        if text is None:
+            raise WebSocketDisconnect(1000)
+        return text
+
+    async def send_text(self, text):
+        await self.send_gate.wait()
+        self.sent.append(text)
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
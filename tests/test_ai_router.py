@@ -0,0 +1,101 @@
+import asyncio
+import functools
+import threading
+import numpy as np
+import pytest
+from ai.assistant_engine import ai_router
+from ai.assistant_engine.cascade import run_cascade
+from ai.assistant_engine.response_cache import ResponseCache
+from ai.fallback import rag_search
+from ai.fallback.mmap_index import META_FILE, build_index, load_mmap_store
+
+class KeywordEmbeddings:
+    """Two-dimensional "embedding": refund questions on one axis, everything else on the other."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0] if "refund" in text.lower() else [0.0, 1.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+@pytest.fixture
+def router(tmp_path, monkeypatch):
+    build_index(str(tmp_path), np.array([[1, 0], [0, 1]], dtype=np.float32),
+                [("Refunds are paid within 5 days.", {}), ("Shipping is free.", {})], nlist=1, dtype="float32")
+    retriever = rag_search.DocumentRetriever(index_path=str(tmp_path), embeddings_loader=lambda name: KeywordEmbeddings(),
+                                             store_loader=load_mmap_store, reload_check_interval=0,
+                                             index_files=(META_FILE,))
+    llm_prompts = []
+    fallback_sources = []
+
+    async def call_llm(prompt):
+        llm_prompts.append(prompt)
+        return None
+
+    monkeypatch.setattr(rag_search, "retriever", retriever)
+    monkeypatch.setattr(ai_router, "RASA_ENABLED", False)
+    monkeypatch.setattr(ai_router, "response_cache", ResponseCache())
+    monkeypatch.setattr(ai_router, "call_llm", call_llm)
+    # Recorded here instead of queued on the shared Redis log writer
+    monkeypatch.setattr(ai_router, "log_fallback_source", lambda user_id, source: fallback_sources.append(source))
+    return retriever, llm_prompts, fallback_sources
+
+def test_route_message_answers_from_the_batched_rag_tier(router):
+    retriever, llm_prompts, fallback_sources = router
+
+    async def ask():
+        return await asyncio.gather(*(ai_router.route_message(text, f"user{i}", "")
+                                      for i, text in enumerate(["How long does a refund take?"] * 3)))
+
+    replies = asyncio.run(ask())
+    assert all(reply.startswith("📘") for reply in replies)
+    assert replies[0].splitlines()[1] == "Refunds are paid within 5 days."
+    assert retriever.stats()["queries"] == 3 and retriever.stats()["batches"] == 1  # one index search
+    assert llm_prompts == []
+    assert fallback_sources == ["RAG"] * 3
+
+def test_cache_embeddings_run_off_the_event_loop(router, monkeypatch):
+    embed_threads = []
+
+    def embed(text):
+        embed_threads.append(threading.get_ident())
+        return KeywordEmbeddings().embed_query(text)
+
+    cache = ResponseCache(embed_fn=embed)
+    monkeypatch.setattr(ai_router, "response_cache", cache)
+
+    async def ask():
+        reply = await ai_router.route_message("Can I get a refund?", "user1", "")
+        return reply, threading.get_ident()
+
+    reply, loop_thread = asyncio.run(ask())
+    assert cache.get("Can I get a refund?").reply == reply
+    assert embed_threads and loop_thread not in embed_threads  # get (miss) and put
+
+def test_only_the_cascade_winner_is_cached(router, monkeypatch):
+    async def slow_rasa(text, sender_id):
+        await asyncio.sleep(0.05)
+        return "rasa answer"
+
+    async def no_rag(text):
+        return None
+
+    async def fast_llm(text):
+        return "llm answer"
+
+    cache = ResponseCache()
+    monkeypatch.setattr(ai_router, "RASA_ENABLED", True)
+    monkeypatch.setattr(ai_router, "query_rasa", slow_rasa)
+    monkeypatch.setattr(ai_router, "search_documents_async", no_rag)
+    monkeypatch.setattr(ai_router, "call_llm", fast_llm)
+    monkeypatch.setattr(ai_router, "response_cache", cache)
+    monkeypatch.setattr(ai_router, "run_cascade", functools.partial(run_cascade, hedge_delay=0))
+
+    assert asyncio.run(ai_router.route_message("Where is my parcel?", "user1", "")) == "rasa answer"
+    assert router[2] == ["RASA"]
+    assert cache.get("Where is my parcel?") is None  # the hedged LLM answered first but lost
+
+    monkeypatch.setattr(ai_router, "RASA_ENABLED", False)
+    assert asyncio.run(ai_router.route_message("Where is my parcel?", "user1", "")) == "llm answer"
+    cached = cache.get("Where is my parcel?")
+    assert (cached.reply, cached.source) == ("llm answer", "LLM")
@@ -0,0 +1,39 @@
+from client.privacy.anonymizer import PrivacyEngine, luhn_valid
+
+def test_single_pass_masks_all_kinds_with_report():
+    engine = PrivacyEngine()
+    text = "Mail me at jo@example.org, call +91 98765 43210, card 4111-1111-1111-1111 from 10.0.0.7"
+    result = engine.anonymize_with_report(text)
+    assert result.text == "Mail me at [email], call [phone], card [card] from [ip]"
+    assert [span.rule for span in result.spans] == ["email", "phone", "card", "ipv4"]
+    first = result.spans[0]
+    assert text[first.start:first.end] == "jo@example.org"
+    assert engine.anonymize(text) == result.text
+
+def test_validators_and_names():
+    engine = PrivacyEngine()
+    assert luhn_valid("4111 1111 1111 1111") and not luhn_valid("1234 5678 9012 3456")
+    assert engine.anonymize("ref 1234 5678 9012 3456") == "ref 1234 5678 9012 3456"
+    assert engine.anonymize("build 300.1.1.1") == "build 300.1.1.1"
+    assert engine.anonymize("Hi, my name is John and I am happy") == "Hi, my name is [name] and I am happy"
+    assert engine.anonymize("Please call me Priya.") == "Please call me [name]."
+
+def test_ordinary_sentences_keep_their_words():
+    engine = PrivacyEngine()
+    for text in ["call me tomorrow", "Call me Tomorrow", "I am Sorry for the delay", "I'm Looking for a refund",
+                 "This is Important", "I am happy"]:
+        assert engine.anonymize(text) == text
+
+def test_user_rules_and_batch():
+    engine = PrivacyEngine()
+    engine.add_rule("order", r"ORD-(?P<value>\d{6})", "[order]")
+    lines = ["order ORD-123456 shipped", "no pii here", "ping 8.8.8.8"]
+    assert list(engine.anonymize_many(lines)) == ["order ORD-[order] shipped", "no pii here", "ping [ip]"]
+
+def test_phone_and_ip_forms():
+    engine = PrivacyEngine()
+    assert engine.anonymize("call (415) 555-0134 or 4155550134") == "call [phone] or [phone]"
+    assert engine.anonymize("host ::1 and fe80::1ff:fe23:4567:890a up") == "host [ip] and [ip] up"
+    assert engine.anonymize("meet at 10:30 today") == "meet at 10:30 today"
+    spans = engine.scan("user+tag@mail.example.com")
+    assert [(span.rule, span.start) for span in spans] == [("email", 0)]
@@ -0,0 +1,87 @@
+import asyncio
+import time
+from ai.assistant_engine.cascade import Tier, run_cascade
+
+def tier(name, delay, reply=None, fail=False, log=None):
+    async def run():
+        if log is not None:
+            log.append(name)
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("boom")
+        return (reply, name) if reply else None
+    return Tier(name, run)
+
+def test_priority_wins_over_faster_tier():
+    tiers = [tier("RASA", 0.2, "rasa"), tier("RAG", 0.01, "rag")]
+    result = asyncio.run(run_cascade(tiers, hedge_delay=0.05))
+    assert (result.reply, result.winner) == ("rasa", "RASA")
+    assert result.outcomes["RAG"] == "answered"
+
+def test_hedge_overlaps_slow_miss():
+    tiers = [tier("RASA", 0.3), tier("RAG", 0.3, "rag")]
+    start = time.perf_counter()
+    result = asyncio.run(run_cascade(tiers, hedge_delay=0.05))
+    assert result.source == "RAG"
+    assert time.perf_counter() - start < 0.5  # sequential would be 0.6s
+
+def test_sequential_without_hedge_and_losers_cancelled():
+    started = []
+    tiers = [tier("RASA", 0.01, fail=True, log=started), tier("RAG", 0.01, "rag", log=started),
+             tier("LLM", 0.5, "llm", log=started)]
+    result = asyncio.run(run_cascade(tiers, hedge_delay=None))
+    assert result.winner == "RAG"
+    assert started == ["RASA", "RAG"]
+    assert result.outcomes == {"RASA": "error", "RAG": "answered", "LLM": "not_started"}
+
+def test_running_lower_tiers_cancelled_when_higher_answers():
+    tiers = [tier("RASA", 0.1, "rasa"), tier("LLM", 5, "llm")]
+    result = asyncio.run(run_cascade(tiers, hedge_delay=0))
+    assert result.winner == "RASA"
+    assert result.outcomes["LLM"] == "cancelled"
+
+def test_no_answer():
+    result = asyncio.run(run_cascade([tier("RAG", 0), tier("LLM", 0)], hedge_delay=0))
+    assert result.reply is None and result.winner is None
+
+def test_no_new_tiers_after_lower_tier_answered():
+    started = []
+    tiers = [tier("RASA", 0.3, log=started), tier("CACHE", 0, "cached", log=started),
+             tier("LLM", 0, "llm", log=started)]
+    result = asyncio.run(run_cascade(tiers, hedge_delay=0.05))
+    assert result.winner == "CACHE"
+    assert started == ["RASA", "CACHE"]
+
+def test_fast_speculative_miss_starts_next_tier_immediately():
+    started = {}
+    begin = time.perf_counter()
+
+    def stamped(name, delay, reply=None):
+        async def run():
+            started[name] = time.perf_counter() - begin
+            await asyncio.sleep(delay)
+            return (reply, name) if reply else None
+        return Tier(name, run)
+
+    tiers = [stamped("RASA", 0.4), stamped("CACHE", 0), stamped("RAG", 0.05, "rag")]
+    result = asyncio.run(run_cascade(tiers, hedge_delay=0.1))
+    assert result.winner == "RAG"
+    assert started["RAG"] < 0.2  # not a second hedge_delay after the cache miss
+
+def test_cancelled_tiers_finish_unwinding_before_the_result():
+    closed = []
+
+    async def llm():
+        try:
+            await asyncio.sleep(5)
+        finally:
+            await asyncio.sleep(0.01)  # e.g. closing the backend request
+            closed.append("LLM")
+
+    async def scenario():
+        result = await run_cascade([tier("RASA", 0.05, "rasa"), Tier("LLM", llm)], hedge_delay=0)
+        return result, list(closed)
+
+    result, closed_at_return = asyncio.run(scenario())
+    assert result.winner == "RASA" and result.outcomes["LLM"] == "cancelled"
+    assert closed_at_return == ["LLM"]
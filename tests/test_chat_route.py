@@ -0,0 +1,82 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from ai.assistant_engine import ai_router
+from interfaces.api_server.core.http_client import BackendClient
+from interfaces.api_server.core.rate_limit import limiter
+from interfaces.api_server.core.redis_writer import RedisWriter
+from interfaces.api_server.routes import chat
+from interfaces.api_server.routes.auth import get_current_user
+from tests.fakes import FakeRedis
+
+class WriterRedis(FakeRedis):
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def lpush(self, key, *values):
+        for value in values:
+            super().lpush(key, value)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+
+class RasaHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        body = json.dumps([{"text": f"rasa: {payload['message']}"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def rasa_backend(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RasaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = BackendClient("test-rasa-route", f"http://127.0.0.1:{server.server_address[1]}", timeout=5)
+    monkeypatch.setattr(ai_router, "rasa_backend", backend)
+    yield backend
+    server.shutdown()
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(chat, "is_assist_enabled", lambda user_id: True)
+    monkeypatch.setattr(limiter, "enabled", False)
+    # Fallback-source writes go to a fake, never to the shared writer's Redis
+    redis = WriterRedis()
+    monkeypatch.setattr(chat, "log_writer", RedisWriter(redis, batch_size=1000, flush_interval=60))
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[get_current_user] = lambda: "alice"
+    client = TestClient(app)
+    client.redis = redis
+    return client
+
+def test_generate_reply_asks_rasa_through_the_pooled_client(client, rasa_backend):
+    response = client.post("/chat/generate-reply",
+                           json={"sender_id": "alice", "receiver_id": "bob", "message": "where is my order"})
+    assert response.status_code == 200
+    assert response.json()["reply"] == "rasa: where is my order"
+    assert rasa_backend.stats()["requests"] == 1
+    chat.log_writer.stop()
+    assert client.redis.data["fallback:alice"] == "rasa"
+
+def test_generate_reply_streams_server_sent_events(client, monkeypatch):
+    async def route_message_stream(message, sender_id, receiver_id):
+        for chunk in ("Hel", "lo"):
+            yield chunk
+
+    monkeypatch.setattr(chat, "route_message_stream", route_message_stream)
+    response = client.post("/chat/generate-reply?stream=true",
+                           json={"sender_id": "alice", "receiver_id": "bob", "message": "hi"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == ('data: {"delta": "Hel"}\n\ndata: {"delta": "lo"}\n\n'
+                             'event: done\ndata: {}\n\n')
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from interfaces.api_server.core.http_client import BackendClient
+
+DELAY = 0.3
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(DELAY)
+        body = json.dumps([{"text": "ok"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+async def fire(client, n):
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[client.post("/webhooks/rest/webhook", json={"message": "hi"}) for _ in range(n)])
+    await client.aclose()
+    return time.perf_counter() - start, responses
+
+def test_concurrent_requests_overlap(stub_server):
+    client = BackendClient("test-concurrent", stub_server, timeout=5, max_concurrency=8)
+    elapsed, responses = asyncio.run(fire(client, 6))
+    assert all(r.json()[0]["text"] == "ok" for r in responses)
+    assert elapsed < DELAY * 3  # serial calls would take 6 * DELAY
+
+def test_concurrency_limit(stub_server):
+    client = BackendClient("test-limited", stub_server, timeout=5, max_concurrency=1)
+    elapsed, _ = asyncio.run(fire(client, 3))
+    assert elapsed >= DELAY * 3
+    assert client.stats()["requests"] == 3
+
+def test_client_replaced_on_a_new_event_loop_is_closed(stub_server):
+    client = BackendClient("test-loops", stub_server, timeout=5, max_concurrency=2)
+
+    async def post():
+        await client.post("/webhooks/rest/webhook", json={"message": "hi"})
+        return client._client
+
+    first = asyncio.run(post())
+
+    async def post_then_settle():
+        second = await post()
+        await asyncio.sleep(0)  # let the close task run
+        await client.aclose()
+        return second
+
+    second = asyncio.run(post_then_settle())
+    assert first is not second and first.is_closed
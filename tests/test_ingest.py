@@ -0,0 +1,141 @@
+import io
+import json
+import os
+import pytest
+from ai.fallback.ingest import Ingestor, fingerprint, iter_chunks, iter_files, resolve_doc_paths
+
+class MemoryWriter:
+    """Store kept in a dict; only what save() wrote survives a reopen (like the files on disk)."""
+
+    def __init__(self):
+        self.saved = {}
+        self.live = {}
+
+    def open(self):
+        self.live = dict(self.saved)
+
+    def fingerprints(self):
+        return {fp: i for fp, (i, _) in self.live.items()}
+
+    def add(self, ids, vectors, chunks):
+        for i, (fp, text, _) in zip(ids, chunks):
+            self.live[fp] = (i, text)
+
+    def remove(self, fingerprints):
+        for fp in fingerprints:
+            self.live.pop(fp, None)
+
+    def save(self):
+        self.saved = dict(self.live)
+
+    def size(self):
+        return len(self.live)
+
+    def texts(self):
+        return sorted(text for _, text in self.saved.values())
+
+class Embedder:
+    def __init__(self, fail_on_call=None):
+        self.batches = []
+        self.fail_on_call = fail_on_call
+
+    def __call__(self, texts):
+        if len(self.batches) + 1 == self.fail_on_call:
+            raise RuntimeError("worker crashed")
+        self.batches.append(list(texts))
+        return [[float(len(text)), 0.0] for text in texts]
+
+    def embedded(self):
+        return [text for batch in self.batches for text in batch]
+
+def make_ingestor(tmp_path, writer, embedder, **kwargs):
+    return Ingestor(index_path=str(tmp_path / "index"), workers=0, batch_size=2, chunk_size=30, overlap=0,
+                    embed_fn=embedder, writer=writer, **kwargs)
+
+def write_docs(docs, files):
+    docs.mkdir(exist_ok=True)
+    for name, paragraphs in files.items():
+        (docs / name).write_text("\n\n".join(paragraphs))
+
+def test_iter_chunks_streams_with_overlap_at_boundaries():
+    text = " ".join(f"word{i:03d}" for i in range(200))
+    chunks = list(iter_chunks(io.StringIO(text), chunk_size=100, overlap=10, block_size=7))
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.split()[-1].startswith("word") and len(chunk.split()[-1]) == 7 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous[-5:] in chunk  # consecutive chunks overlap
+    assert chunks[0].startswith("word000") and chunks[-1].endswith("word199")
+    with pytest.raises(ValueError):
+        list(iter_chunks(io.StringIO(text), chunk_size=100, overlap=60))
+
+def test_only_new_and_changed_chunks_are_embedded(tmp_path):
+    docs, writer = tmp_path / "docs", MemoryWriter()
+    write_docs(docs, {"a.md": ["alpha paragraph one", "alpha paragraph two"],
+                      "b.txt": ["bravo paragraph", "shared paragraph"],
+                      "c.md": ["charlie paragraph", "shared paragraph"]})
+    first = Embedder()
+    report = make_ingestor(tmp_path, writer, first).run([str(docs)])
+    assert report["files_scanned"] == 3 and report["chunks"] == 6
+    assert report["chunks_embedded"] == 5 and report["chunks_reused"] == 1  # "shared paragraph" once
+    assert report["bytes_embedded"] == sum(len(t) for t in first.embedded())
+
+    again = Embedder()
+    report = make_ingestor(tmp_path, writer, again).run([str(docs)])
+    assert again.batches == [] and report["files_unchanged"] == 3
+
+    write_docs(docs, {"a.md": ["alpha paragraph one", "alpha paragraph 2"]})
+    (docs / "b.txt").unlink()
+    changed = Embedder()
+    report = make_ingestor(tmp_path, writer, changed).run([str(docs)])
+    assert changed.embedded() == ["alpha paragraph 2"]
+    assert report["files_removed"] == 1 and report["chunks_removed"] == 2  # old alpha two, bravo
+    assert writer.texts() == ["alpha paragraph 2", "alpha paragraph one", "charlie paragraph", "shared paragraph"]
+    manifest = json.loads((tmp_path / "index" / "manifest.json").read_text())
+    assert sorted(manifest["files"]) == [str(docs / "a.md"), str(docs / "c.md")]
+    assert manifest["files"][str(docs / "c.md")]["chunks"] == [fingerprint("charlie paragraph"),
+                                                               fingerprint("shared paragraph")]
+
+def test_rerun_after_crash_resumes_from_checkpoint(tmp_path):
+    docs, writer = tmp_path / "docs", MemoryWriter()
+    write_docs(docs, {f"{name}.md": [f"{name} first paragraph", f"{name} second paragraph"] for name in ("a", "b", "c")})
+
+    crashing = Embedder(fail_on_call=3)
+    with pytest.raises(RuntimeError):
+        make_ingestor(tmp_path, writer, crashing, checkpoint_seconds=0).run([str(docs)])
+    assert len(crashing.batches) == 2  # a and b made it to a checkpoint
+
+    resumed = Embedder()
+    report = make_ingestor(tmp_path, writer, resumed).run([str(docs)])
+    assert resumed.embedded() == ["c first paragraph", "c second paragraph"]
+    assert report["files_unchanged"] == 2 and report["vectors"] == 6
+
+def test_rebuild_keeps_the_saved_store_until_it_finishes(tmp_path):
+    docs, writer = tmp_path / "docs", MemoryWriter()
+    write_docs(docs, {f"{name}.md": [f"{name} first paragraph", f"{name} second paragraph"] for name in ("a", "b")})
+    make_ingestor(tmp_path, writer, Embedder()).run([str(docs)])
+    before = writer.texts()
+
+    with pytest.raises(RuntimeError):
+        make_ingestor(tmp_path, writer, Embedder(fail_on_call=2), checkpoint_seconds=0).run([str(docs)], rebuild=True)
+    assert writer.texts() == before
+
+    rebuilt = Embedder()
+    report = make_ingestor(tmp_path, writer, rebuilt, checkpoint_seconds=0).run([str(docs)], rebuild=True)
+    assert len(rebuilt.embedded()) == 4 and report["vectors"] == 4 and writer.texts() == before
+
+def test_doc_paths_are_confined_to_the_docs_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root, outside = tmp_path / "docs", tmp_path / "secret"
+    (root / "guides").mkdir(parents=True)
+    outside.mkdir()
+    (root / "guides" / "a.md").write_text("a")
+    (outside / "keys.txt").write_text("secret")
+    os.symlink(outside / "keys.txt", root / "guides" / "keys.txt")
+    os.symlink(outside, root / "linked")
+
+    assert resolve_doc_paths(["guides", str(root / "guides" / "a.md")], str(root)) == [
+        os.path.join("docs", "guides"), os.path.join("docs", "guides", "a.md")]
+    for path in ["../secret/keys.txt", str(outside / "keys.txt"), "/etc/passwd", "linked", "guides/keys.txt"]:
+        with pytest.raises(ValueError):
+            resolve_doc_paths([path], str(root))
+    assert list(iter_files(["docs/guides"], "docs")) == [os.path.join("docs", "guides", "a.md")]
@@ -0,0 +1,28 @@
+from ai.core_nlp.intent_classifier import (
+    IntentIndex,
+    classify_intent_difflib,
+    classify_intents,
+    normalize_message,
+)
+
+INTENTS = [
+    {"tag": "greeting", "patterns": ["hi", "hello", "hey", "good morning"]},
+    {"tag": "goodbye", "patterns": ["bye", "goodbye", "see you"]},
+    {"tag": "help", "patterns": ["i need help", "can you help me"]},
+    {"tag": "empty", "patterns": []},
+]
+
+def test_index_matches_difflib():
+    index = IntentIndex(INTENTS)
+    for message in ["Hello", "  good mornin ", "goodbye!", "can u help me", "weather today", "", "hey there"]:
+        tag, confidence = index.classify(normalize_message(message))
+        assert tag == classify_intent_difflib(message, INTENTS)
+        assert (confidence >= 0.7) == (tag != "unknown")
+
+def test_exact_match_confidence():
+    index = IntentIndex(INTENTS)
+    assert index.classify("see you") == ("goodbye", 1.0)
+
+def test_classify_intents_batch():
+    results = classify_intents(["hello", "bye", "hello"])
+    assert [tag for tag, _ in results] == ["greeting", "goodbye", "greeting"]
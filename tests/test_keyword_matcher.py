@@ -0,0 +1,46 @@
+import json
+import random
+from ai.core_nlp import analyzer
+from ai.core_nlp.keyword_matcher import KeywordMatcher
+
+RULES = {
+    "tone": {"positive": ["great", "thank you", "thank"], "urgent": ["now", "asap"]},
+    "emotion": {"happy": ["great", "glad"], "angry": ["mad"]},
+}
+
+def naive_first_match(text):
+    found = {}
+    for category, labels in RULES.items():
+        for label, keywords in labels.items():
+            if any(k in text for k in keywords):
+                found[category] = label
+                break
+    return found
+
+def test_first_match_same_as_substring_scan():
+    rng = random.Random(3)
+    words = ["great", "thank you", "made", "nowhere", "glad", "xyz", "asap", "thanks", "a"]
+    matcher = KeywordMatcher(RULES)
+    for _ in range(200):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+        assert matcher.first_match(text) == naive_first_match(text)
+
+def test_hits_count_overlapping_keywords():
+    matcher = KeywordMatcher(RULES)
+    hits = matcher.hits("thank you, great, great now")
+    assert hits["tone"] == {"positive": 4, "urgent": 1}
+    assert hits["emotion"] == {"happy": 2}
+
+def test_tone_rules_reload(tmp_path, monkeypatch):
+    rules_path = tmp_path / "tone_rules.json"
+    rules_path.write_text(json.dumps({"tones": {"calm": {"keywords": ["breeze"]}}}))
+    # restore the real rules after the test
+    monkeypatch.setattr(analyzer, "_keyword_matcher", analyzer._keyword_matcher)
+    monkeypatch.setattr(analyzer, "tone_data", analyzer.tone_data)
+    monkeypatch.setattr(analyzer, "TONE_PATH", str(rules_path))
+    monkeypatch.setattr(analyzer, "TONE_RELOAD_INTERVAL", 0)
+    assert analyzer.detect_tone("a gentle breeze") == "calm"
+
+    rules_path.write_text(json.dumps({"tones": {"stormy": {"keywords": ["breeze"]}}}))
+    monkeypatch.setattr(analyzer, "_tone_rules_mtime", 0)
+    assert analyzer.detect_tone("a gentle breeze") == "stormy"
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from interfaces.api_server.ai import llm_fallback
+from interfaces.api_server.core.http_client import BackendClient
+from interfaces.api_server.routes import chat
+from interfaces.socket_layer import chat_socket
+from interfaces.socket_layer.hub import ConnectionHub
+from tests.fakes import FakeWebSocket, settle
+
+CHUNKS = ["Hel", "lo ", "the", "re", "!"]
+CHUNK_DELAY = 0.2
+
+class NDJSONHandler(BaseHTTPRequestHandler):
+    aborted = threading.Event()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for i, text in enumerate(CHUNKS):
+                line = {"response": text, "done": i == len(CHUNKS) - 1}
+                self.wfile.write((json.dumps(line) + "\n").encode())
+                self.wfile.flush()
+                time.sleep(CHUNK_DELAY)
+        except (BrokenPipeError, ConnectionResetError):
+            NDJSONHandler.aborted.set()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), NDJSONHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+    monkeypatch.setattr(llm_fallback, "llm_backend", BackendClient("test-llm-stream", url, timeout=5))
+    NDJSONHandler.aborted.clear()
+    yield
+    server.shutdown()
+
+def test_stream_yields_before_completion(llm_stub):
+    async def consume():
+        start = time.perf_counter()
+        first_at, parts = None, []
+        async for chunk in llm_fallback.stream_llm("hi"):
+            first_at = first_at or time.perf_counter() - start
+            parts.append(chunk)
+        return first_at, time.perf_counter() - start, parts
+
+    first_at, total, parts = asyncio.run(consume())
+    assert "".join(parts) == "".join(CHUNKS)
+    assert first_at < total / 2
+
+def test_closing_stream_aborts_backend(llm_stub):
+    async def consume_one():
+        stream = llm_fallback.stream_llm("hi")
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(consume_one()) == CHUNKS[0]
+    assert NDJSONHandler.aborted.wait(timeout=len(CHUNKS) * CHUNK_DELAY + 1)
+
+class StubRouter:
+    """Stands in for ai_router.route_message_stream; records whether the stream was closed early."""
+
+    def __init__(self, chunks, gate=None):
+        self.chunks = chunks
+        self.gate = gate
+        self.closed_early = False
+
+    async def __call__(self, message, sender_id, receiver_id):
+        sent = 0
+        try:
+            for chunk in self.chunks:
+                yield chunk
+                sent += 1
+                if self.gate is not None:
+                    await self.gate.wait()
+        finally:
+            self.closed_early = sent < len(self.chunks)
+
+class FakeRequest:
+    def __init__(self, disconnect_after):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks > self.disconnect_after
+
+def test_sse_events_and_client_disconnect(monkeypatch):
+    router = StubRouter(CHUNKS)
+    monkeypatch.setattr(chat, "route_message_stream", router)
+
+    async def collect(request):
+        return [event async for event in chat.stream_reply_events(request, "hi", "alice", "bob")]
+
+    events = asyncio.run(collect(FakeRequest(disconnect_after=len(CHUNKS))))
+    assert events == [f"data: {json.dumps({'delta': c})}\n\n" for c in CHUNKS] + ["event: done\ndata: {}\n\n"]
+    assert not router.closed_early
+
+    events = asyncio.run(collect(FakeRequest(disconnect_after=2)))
+    assert len(events) == 2 and router.closed_early  # no "done"; the router stream was closed
+
+def test_socket_streams_chunks_then_done(monkeypatch):
+    router = StubRouter(CHUNKS)
+    monkeypatch.setattr(chat_socket, "route_message_stream", router)
+
+    async def scenario():
+        hub, ws = ConnectionHub(ping_interval=0), FakeWebSocket()
+        serving = asyncio.ensure_future(hub.serve(ws, "alice", "bob", chat_socket.stream_reply))
+        await ws.incoming.put("hi")
+        await settle()
+        await ws.incoming.put(None)
+        await serving
+        return [json.loads(frame) for frame in ws.sent]
+
+    frames = asyncio.run(scenario())
+    assert frames == [{"type": "chunk", "delta": c} for c in CHUNKS] + [{"type": "done", "reply": "".join(CHUNKS)}]
+
+def test_socket_disconnect_closes_the_reply_stream(monkeypatch):
+    router = StubRouter(CHUNKS, gate=asyncio.Event())  # never released: stuck after the first chunk
+    monkeypatch.setattr(chat_socket, "route_message_stream", router)
+
+    async def scenario():
+        hub, ws = ConnectionHub(ping_interval=0), FakeWebSocket()
+        serving = asyncio.ensure_future(hub.serve(ws, "alice", "bob", chat_socket.stream_reply))
+        await ws.incoming.put("hi")
+        await settle()
+        await ws.incoming.put(None)
+        await serving
+        await settle()
+        return ws.sent
+
+    sent = asyncio.run(scenario())
+    assert [json.loads(frame)["delta"] for frame in sent] == CHUNKS[:1]
+    assert router.closed_early
@@ -0,0 +1,92 @@
+import json
+import time
+from interfaces.api_server.core import log_index
+from tests.fakes import FakeRedis
+
+def ts(epoch):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+def test_fallback_index_is_newest_first_and_capped(monkeypatch):
+    monkeypatch.setattr(log_index, "FALLBACK_INDEX_MAX", 3)
+    redis = FakeRedis()
+    pipe = redis.pipeline()
+    for i in range(5):
+        log_index.index_fallback_entry(pipe, f"u{i}", {"timestamp": ts(1_700_000_000 + i), "event": "fallback"})
+    pipe.execute()
+    assert [e["user_id"] for e in log_index.recent_fallbacks(redis)] == ["u4", "u3", "u2"]
+
+def test_last_hour_counts_weights_previous_bucket():
+    redis = FakeRedis()
+    now = 1_700_002_800 + 900  # a quarter into the hour
+    pipe = redis.pipeline()
+    for epoch, intent in [(now - 60, "greet"), (now - 60, "greet"), (now - 1800, "bye")]:
+        log_index.index_log_entry(pipe, {"timestamp": ts(epoch), "event": "reply_sent", "intent": intent})
+    pipe.execute()
+    counts = log_index.last_hour_counts(redis, now=now)
+    assert counts["intent:greet"] == 2
+    assert counts["intent:bye"] == 0.75
+    assert log_index.top_intents(counts) == [("greet", 2), ("bye", 1)]
+
+def test_backfill_builds_indexes_from_existing_keys():
+    redis = FakeRedis()
+    now = time.time()
+    redis.lpush("logs:alice", json.dumps({"timestamp": ts(now - 5), "event": "fallback", "intent": "help"}))
+    redis.lpush("logs:alice", json.dumps({"timestamp": ts(now - 10 * 86400), "event": "fallback"}))
+    redis.lpush("fallbacks:bob", json.dumps({"timestamp": ts(now), "event": "fallback"}))
+    redis.data["user:alice:context"] = {"last_intent": "help"}
+    redis.data["user:bob:context"] = {}
+
+    summary = log_index.backfill(redis)
+    assert summary == {"log_entries": 1, "fallback_entries": 1, "sessions": 2, "hour_buckets": 1}
+    assert log_index.active_session_count(redis) == 2
+    assert log_index.recent_fallbacks(redis)[0]["user_id"] == "bob"
+    assert round(log_index.last_hour_counts(redis)["event:fallback"]) == 1
+
+    # Re-running rebuilds rather than double counts
+    log_index.backfill(redis)
+    assert round(log_index.last_hour_counts(redis)["event:fallback"]) == 1
+
+def test_backfill_keeps_what_is_indexed_while_it_scans():
+    class LiveRedis(FakeRedis):
+        """Logs a reply for carol (list + live indexes) as soon as the scan starts."""
+
+        def scan_iter(self, match, count=None):
+            if match == "logs:*" and "logs:carol" not in self.data:
+                entry = {"timestamp": ts(time.time() + 1), "event": "reply_sent", "intent": "greet"}
+                self.lpush("logs:carol", json.dumps(entry))
+                pipe = self.pipeline()
+                log_index.index_log_entry(pipe, entry)
+                log_index.index_fallback_entry(pipe, "carol", entry)
+                log_index.index_session(pipe, "carol")
+                pipe.execute()
+            return super().scan_iter(match, count)
+
+    redis = LiveRedis()
+    now = time.time()
+    redis.lpush("logs:alice", json.dumps({"timestamp": ts(now - 5), "event": "reply_sent", "intent": "greet"}))
+    pipe = redis.pipeline()
+    log_index.index_log_entry(pipe, {"timestamp": ts(now - 5), "event": "reply_sent", "intent": "greet"})
+    pipe.execute()
+    redis.data["user:alice:context"] = {}
+
+    log_index.backfill(redis)
+    assert round(log_index.last_hour_counts(redis, now=now + 1)["intent:greet"]) == 2  # alice once, carol once
+    assert [e["user_id"] for e in log_index.recent_fallbacks(redis)] == ["carol"]
+    assert log_index.active_session_count(redis) == 2
+
+def test_backfill_never_lowers_live_counters():
+    redis = FakeRedis()
+    now = time.time()
+    pipe = redis.pipeline()
+    for i in range(60):
+        entry = {"timestamp": ts(now - 5), "event": "reply_sent", "intent": "greet"}
+        log_index.index_log_entry(pipe, entry)
+        if i >= 10:  # logs:{sender} keeps only the newest 50
+            redis.lpush("logs:anonymous", json.dumps(entry))
+    log_index.index_log_entry(pipe, {"timestamp": "not a time", "intent": "bye"})
+    pipe.execute()
+
+    log_index.backfill(redis)
+    counts = log_index.last_hour_counts(redis, now=now)
+    assert round(counts["intent:greet"]) == 60
+    assert round(counts["intent:bye"]) == 1
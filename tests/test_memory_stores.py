@@ -0,0 +1,38 @@
+from ai.memory import learning_memory
+from ai.memory.bounded_store import BoundedStore
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_lru_cap_and_idle_ttl():
+    clock = FakeClock()
+    store = BoundedStore(dict, max_entries=2, ttl=60, clock=clock)
+    store.get("a", create=True)
+    store.get("b", create=True)
+    store.get("a")  # a is now most recently used
+    store.get("c", create=True)
+    assert "b" not in store and "a" in store
+
+    clock.now = 61
+    assert store.get("a") is None
+    stats = store.stats()
+    assert (stats["entries"], stats["evictions"], stats["expirations"], stats["bytes"]) == (0, 1, 2, 0)
+
+def test_facts_deduplicated_and_capped(monkeypatch):
+    monkeypatch.setattr(learning_memory, "MEMORY_MAX_FACTS", 3)
+    monkeypatch.setattr(learning_memory, "user_memory",
+                        BoundedStore(learning_memory.UserProfile, max_entries=10, ttl=60,
+                                     sizeof=learning_memory._profile_size))
+    for fact in ["a", "b", "a", "c", "d"]:
+        learning_memory.add_fact("u1", fact)
+    assert learning_memory.get_user_profile("u1")["known_facts"] == ["b", "c", "d"]
+
+    store = learning_memory.user_memory
+    measured = learning_memory._profile_size(store.get("u1"))
+    assert abs(store.stats()["bytes"] - measured) < 256
+    learning_memory.clear_user_profile("u1")
+    assert store.stats()["entries"] == 0
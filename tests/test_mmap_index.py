@@ -0,0 +1,94 @@
+import os
+import numpy as np
+from ai.fallback import mmap_index
+from ai.fallback.mmap_index import (META_FILE, MmapVectorStore, build_index, load_mmap_store, read_meta,
+                                    reusable_centroids)
+from ai.fallback.rag_search import DocumentRetriever
+
+def clustered(count=2000, dim=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32) * 5
+    return centers[rng.integers(0, clusters, count)] + rng.standard_normal((count, dim)).astype(np.float32)
+
+def exact_top(vectors, queries, k):
+    distances = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    return np.argsort(distances, axis=1)[:, :k]
+
+def texts_of(results):
+    return [[doc.page_content for doc in docs] for docs in results]
+
+def test_full_probe_is_exact_and_records_follow_their_vectors(tmp_path):
+    vectors = clustered()
+    records = [(f"doc {i}", {"source": f"file{i % 3}.md", "chunk": i}) for i in range(len(vectors))]
+    meta = build_index(str(tmp_path), vectors, records, nlist=16, dtype="float32")
+    store = MmapVectorStore(str(tmp_path), nprobe=16)
+    queries = vectors[:50] + 0.01
+
+    results = store.search_by_vectors(queries, k=5)
+    assert texts_of(results) == [[f"doc {i}" for i in row] for row in exact_top(vectors, queries, 5)]
+    assert results[7][0].metadata == {"source": "file1.md", "chunk": 7}
+    assert meta["count"] == 2000 and store.index.list_offsets[-1] == 2000
+
+def test_int8_lists_keep_recall_with_a_few_probes(tmp_path):
+    vectors = clustered(seed=1)
+    records = [(f"doc {i}", {}) for i in range(len(vectors))]
+    build_index(str(tmp_path), vectors, records, nlist=20, dtype="int8")
+    store = MmapVectorStore(str(tmp_path), nprobe=4)
+    queries = clustered(count=100, seed=2)
+
+    truth = exact_top(vectors, queries, 10)
+    _, found = store.index.search(queries, 10)
+    recall = np.mean([len(set(t) & set(f)) / 10 for t, f in zip(truth.tolist(), found.tolist())])
+    assert recall >= 0.9
+    assert store.index.codes.dtype == np.int8 and store.index.vector_bytes == vectors.size
+
+def test_retriever_serves_and_hot_swaps_the_mmap_store(tmp_path):
+    class Embeddings:
+        def embed_documents(self, texts):
+            return [[float(t), 0.0] for t in texts]
+
+        def embed_query(self, text):
+            return [float(text), 0.0]
+
+    path = str(tmp_path)
+    build_index(path, np.array([[0, 0], [10, 0]], dtype=np.float32), [("zero", {}), ("ten", {})],
+                nlist=1, dtype="float16")
+    retriever = DocumentRetriever(index_path=path, embeddings_loader=lambda name: Embeddings(),
+                                  store_loader=load_mmap_store, reload_check_interval=0, index_files=(META_FILE,))
+    assert texts_of(retriever.search_batch(["9", "1"], k=1)) == [["ten"], ["zero"]]
+    assert [d.page_content for d in retriever.search("8", k=2)] == ["ten", "zero"]
+
+    build_index(path, np.array([[0, 0], [20, 0]], dtype=np.float32), [("zero", {}), ("twenty", {})],
+                nlist=1, dtype="float16")
+    os.utime(os.path.join(path, META_FILE), ns=(1, 1))
+    assert texts_of(retriever.search_batch(["19"], k=1)) == [["twenty"]]
+    stats = retriever.stats()
+    assert stats["index_loads"] == 2 and stats["backend"] == "mmap" and stats["index_disk_bytes"] > 0
+    assert len(os.listdir(path)) == 15  # meta.json + two generations of 7 files (no scales for float16)
+
+    # The previous generation stays until the next build, for workers that read the old meta.json
+    previous = read_meta(path)["generation"]
+    build_index(path, np.array([[0, 0], [30, 0]], dtype=np.float32), [("zero", {}), ("thirty", {})],
+                nlist=1, dtype="float16")
+    generations = {name.split(".")[1] for name in os.listdir(path) if name != META_FILE}
+    assert generations == {previous, read_meta(path)["generation"]}
+
+def test_rebuild_reuses_the_centroids_until_the_corpus_outgrows_them(tmp_path, monkeypatch):
+    path = str(tmp_path)
+    vectors = clustered(count=500)
+    build_index(path, vectors, [(f"doc {i}", {}) for i in range(500)], nlist=8, dtype="float32")
+
+    def no_training(*args, **kwargs):
+        raise AssertionError("k-means ran again")
+
+    monkeypatch.setattr(mmap_index, "train_centroids", no_training)
+    more = np.concatenate([vectors, clustered(count=300, seed=3)])
+    centroids, trained_on = reusable_centroids(path, len(more), more.shape[1])
+    meta = build_index(path, more, [(f"doc {i}", {}) for i in range(800)], dtype="float32",
+                       centroids=centroids, trained_on=trained_on)
+    assert (meta["count"], meta["nlist"], meta["trained_on"]) == (800, 8, 500)
+    store = MmapVectorStore(path, nprobe=8)
+    assert texts_of(store.search_by_vectors(more[650:651], k=1)) == [["doc 650"]]
+
+    assert reusable_centroids(path, 1001, more.shape[1]) == (None, None)  # grew past RAG_MMAP_RETRAIN_GROWTH
+    assert reusable_centroids(path, 800, 32) == (None, None)
@@ -0,0 +1,32 @@
+import dataclasses
+import pytest
+from ai.core_nlp.analyzer import detect_emotion, detect_purpose, detect_tone
+from ai.core_nlp.intent_classifier import classify_intent
+from ai.core_nlp.pipeline import analyze_message, register_stage_hook, unregister_stage_hook
+from client.privacy.privacy_guard import enforce_privacy
+
+def test_analysis_matches_individual_stages():
+    message = "Hello, can you help me asap? I'm glad"
+    analysis = analyze_message(message)
+    sanitized = enforce_privacy(message)
+    assert analysis.sanitized_text == sanitized
+    assert analysis.tone == detect_tone(sanitized)
+    assert analysis.emotion == detect_emotion(sanitized)
+    assert analysis.purpose == detect_purpose(sanitized)
+    assert analysis.intent == classify_intent(sanitized)
+
+def test_analysis_is_frozen():
+    analysis = analyze_message("hi")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        analysis.intent = "other"
+
+def test_stage_hooks_receive_timings():
+    seen = []
+    hook = lambda stage, seconds: seen.append(stage)
+    register_stage_hook(hook)
+    try:
+        analysis = analyze_message("hey there")
+    finally:
+        unregister_stage_hook(hook)
+    assert seen == ["privacy", "normalize", "keywords", "purpose", "intent"]
+    assert set(seen) <= set(analysis.timings)
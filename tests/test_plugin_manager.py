@@ -0,0 +1,48 @@
+from ai.plugins.installed.plugin_manager import PluginManager
+
+TEMPLATE = '''
+from ai.plugins.base_plugin import BasePlugin
+
+class Plugin(BasePlugin):
+    probes = []
+
+    def meta(self):
+        return {{"name": "{name}"{intents}}}
+
+    def should_handle(self, intent):
+        Plugin.probes.append(intent)
+        {should_handle}
+
+    def run(self, message, sender_id):
+        return "{name}"
+'''
+
+def write_plugin(directory, filename, name, intents=None, should_handle="return False"):
+    declared = f', "intents": {intents!r}' if intents is not None else ""
+    (directory / filename).write_text(TEMPLATE.format(name=name, intents=declared, should_handle=should_handle))
+
+def test_declared_intents_are_indexed(tmp_path):
+    write_plugin(tmp_path, "a_weather.py", "Weather", intents=["weather"])
+    write_plugin(tmp_path, "b_other_weather.py", "OtherWeather", intents=["weather", "forecast"])
+    manager = PluginManager(plugin_dir=str(tmp_path))
+    assert manager.run_plugin("weather", "hi", "u1") == "Weather"
+    assert manager.run_plugin("forecast", "hi", "u1") == "OtherWeather"
+    assert manager.get_plugin_for_intent("unknown") is None
+    assert manager.dispatch_stats()["indexed_intents"] == 2
+
+def test_dynamic_plugins_keep_load_order_and_are_memoized(tmp_path):
+    write_plugin(tmp_path, "a_dynamic.py", "Dynamic", should_handle="return intent.startswith('w')")
+    write_plugin(tmp_path, "b_weather.py", "Weather", intents=["weather"])
+    write_plugin(tmp_path, "c_broken.py", "Broken", should_handle="raise RuntimeError('boom')")
+    manager = PluginManager(plugin_dir=str(tmp_path))
+
+    # An earlier dynamic plugin still wins, as with the old linear scan
+    assert manager.run_plugin("weather", "hi", "u1") == "Dynamic"
+    assert manager.get_plugin_for_intent("news") is None
+    probes = type(manager.plugins[0]).probes
+    manager.get_plugin_for_intent("weather")
+    manager.get_plugin_for_intent("news")
+    assert probes == ["weather", "news"]
+
+    manager.reload_plugins()
+    assert manager.dispatch_stats()["cached_intents"] == 0
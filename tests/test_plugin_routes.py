@@ -0,0 +1,60 @@
+import os
+from ai.plugins import loader, plugin_registry
+
+class FakeInstalled:
+    def meta(self):
+        return {"name": "FakeInstalled"}
+
+class FakeManager:
+    def __init__(self):
+        self.probes = []
+
+    def get_plugin_for_intent(self, intent):
+        self.probes.append(intent)
+        return FakeInstalled() if intent == "greet" else None
+
+    def plugin_name(self, plugin):
+        return plugin.meta()["name"]
+
+def use_config(monkeypatch, path):
+    monkeypatch.setattr(loader, "PLUGIN_CONFIG_PATH", str(path))
+    monkeypatch.setattr(loader, "PLUGIN_RELOAD_INTERVAL", 0)
+    monkeypatch.setattr(loader, "_routing", None)
+
+def test_yaml_read_once_and_rebuilt_on_change(tmp_path, monkeypatch):
+    config = tmp_path / "plugin_config.yaml"
+    config.write_text("weather: weather_plugin\n")
+    use_config(monkeypatch, config)
+    builds = loader._routing_stats["builds"]
+
+    for _ in range(3):
+        assert loader.get_plugin_route("weather").plugin_name == "weather_plugin"
+    assert loader._routing_stats["builds"] == builds + 1
+
+    config.write_text("weather: forecast_plugin\n")
+    os.utime(config, ns=(1, 1))
+    assert loader.get_plugin_route("weather").plugin_name == "forecast_plugin"
+    assert loader.load_plugin_mapping() == {"weather": "forecast_plugin"}
+
+def test_merges_config_registry_and_installed(tmp_path, monkeypatch):
+    config = tmp_path / "plugin_config.yaml"
+    config.write_text("weather: weather_plugin\n")
+    use_config(monkeypatch, config)
+    manager = FakeManager()
+    monkeypatch.setattr(loader, "plugin_manager", manager)
+    monkeypatch.setattr(plugin_registry, "_intent_plugin_map", plugin_registry.defaultdict(set))
+
+    plugin_registry.register_plugin_intents("stocks_plugin", ["stocks", "weather"])
+    assert loader.get_plugin_route("weather").source == "config"
+    assert loader.get_plugin_route("stocks").source == "registry"
+    assert loader.get_plugin_route("greet").handler is not None
+    assert loader.get_plugin_route("greet").source == "installed"
+    assert loader.get_plugin_route("unknown") is None
+    assert loader.get_plugin_route("unknown") is None
+    assert manager.probes == ["greet", "unknown"]
+
+def test_missing_config_means_no_mapping(tmp_path, monkeypatch):
+    use_config(monkeypatch, tmp_path / "missing.yaml")
+    monkeypatch.setattr(loader, "plugin_manager", None)
+    assert loader.load_plugin_mapping() == {}
+    assert loader.get_plugin_route("weather") is None
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+from ai.fallback.micro_batch import MicroBatcher
+from ai.fallback.rag_search import DocumentRetriever
+
+class FakeDoc:
+    def __init__(self, text):
+        self.page_content = text
+
+class FakeStore:
+    def __init__(self, label):
+        self.label = label
+
+    def similarity_search(self, query, k=3):
+        return [FakeDoc(f"{self.label}:{query}")][:k]
+
+def make_retriever(tmp_path, loads):
+    def store_loader(path, embeddings):
+        loads.append(path)
+        return FakeStore(f"v{len(loads)}")
+
+    return DocumentRetriever(
+        index_path=str(tmp_path),
+        embeddings_loader=lambda name: object(),
+        store_loader=store_loader,
+        reload_check_interval=0,
+    )
+
+def test_index_loaded_once(tmp_path):
+    (tmp_path / "index.faiss").write_bytes(b"a")
+    loads = []
+    retriever = make_retriever(tmp_path, loads)
+    for _ in range(5):
+        retriever.search("hello")
+    assert len(loads) == 1
+    assert retriever.stats()["queries"] == 5
+
+def test_index_hot_swapped_on_change(tmp_path):
+    index_file = tmp_path / "index.faiss"
+    index_file.write_bytes(b"a")
+    loads = []
+    retriever = make_retriever(tmp_path, loads)
+    assert retriever.search("q")[0].page_content == "v1:q"
+
+    index_file.write_bytes(b"bb")
+    os.utime(index_file, ns=(1, 1))
+    assert retriever.search("q")[0].page_content == "v2:q"
+    assert retriever.stats()["index_loads"] == 2
+
+class FakeIndex:
+    """Flat L2 index over a NumPy matrix, like faiss.IndexFlatL2."""
+
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.ntotal, self.d = self.vectors.shape
+        self.batches = []
+
+    def search(self, queries, k):
+        self.batches.append(queries.shape)
+        distances = ((queries[:, None, :] - self.vectors[None, :, :]) ** 2).sum(axis=2)
+        ids = np.argsort(distances, axis=1)[:, :k]
+        return np.take_along_axis(distances, ids, axis=1), ids
+
+class FakeDocstore:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def search(self, doc_id):
+        return self.docs[doc_id]
+
+class FakeFaissStore:
+    def __init__(self, texts, vectors):
+        self.index = FakeIndex(vectors)
+        self.index_to_docstore_id = {i: f"doc{i}" for i in range(len(texts))}
+        self.docstore = FakeDocstore({f"doc{i}": FakeDoc(text) for i, text in enumerate(texts)})
+
+class FakeEmbeddings:
+    """Embeds "x,y" as the vector [x, y]."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return [[float(v) for v in text.split(",")] for text in texts]
+
+def test_concurrent_queries_share_one_embedding_call_and_index_search(tmp_path):
+    (tmp_path / "index.faiss").write_bytes(b"a")
+    embeddings = FakeEmbeddings()
+    store = FakeFaissStore(["origin", "east", "north"], [[0, 0], [10, 0], [0, 10]])
+    retriever = DocumentRetriever(index_path=str(tmp_path), embeddings_loader=lambda name: embeddings,
+                                  store_loader=lambda path, emb: store)
+    batcher = MicroBatcher(lambda items: retriever.search_batch(items, k=2), max_batch=8, max_wait=0.05)
+
+    async def ask_all():
+        return await asyncio.gather(*(batcher.run(q) for q in ["9,1", "1,9", "0,1"]))
+
+    results = asyncio.run(ask_all())
+    assert [[d.page_content for d in docs] for docs in results] == [
+        ["east", "origin"], ["north", "origin"], ["origin", "north"]]
+    assert embeddings.calls == [3] and store.index.batches == [(3, 2)]
+    assert retriever.stats()["queries"] == 3 and retriever.stats()["batches"] == 1
+
+def test_batcher_splits_at_max_batch_and_propagates_errors():
+    seen = []
+
+    def batch_fn(items):
+        seen.append(len(items))
+        if "boom" in items:
+            raise ValueError("boom")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch=2, max_wait=0.05)
+    futures = [batcher.submit(item) for item in ["a", "b", "c"]]
+    assert [f.result(5) for f in futures] == ["A", "B", "C"]
+    assert seen == [2, 1]
+    with pytest.raises(ValueError):
+        batcher.call("boom", timeout=5)
+    assert batcher.stats()["errors"] == 1 and batcher.stats()["items"] == 4
@@ -0,0 +1,80 @@
+import time
+from interfaces.api_server.core import analytics_logger
+from interfaces.api_server.core.redis_writer import RedisWriter
+from tests.fakes import FakeRedis
+
+class RecordingRedis(FakeRedis):
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.pipelines = 0
+        self.delay = delay
+
+    def pipeline(self, transaction=True):
+        self.pipelines += 1
+        time.sleep(self.delay)
+        return super().pipeline(transaction)
+
+    def lpush(self, key, *values):
+        for value in values:
+            super().lpush(key, value)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+def test_flush_coalesces_into_one_pipeline():
+    redis = RecordingRedis()
+    writer = RedisWriter(redis, batch_size=1000, flush_interval=60)
+    for i in range(5):
+        writer.push_capped("logs:u1", f"entry {i}", cap=3)
+        writer.incr("analytics:intent_counts", "greet")
+        writer.set("fallback:u1", f"source {i}")
+    assert writer.stats()["queue_depth"] == 7  # 5 pushes + 1 counter + 1 set
+
+    writer.stop()
+    assert redis.pipelines == 1
+    assert redis.data["logs:u1"] == ["entry 4", "entry 3", "entry 2"]
+    assert redis.data["analytics:intent_counts"] == {"greet": 5}
+    assert redis.data["fallback:u1"] == "source 4"
+    assert writer.stats()["queue_depth"] == 0
+
+def test_background_flush_and_drop_when_full():
+    redis = RecordingRedis()
+    writer = RedisWriter(redis, max_queue=3, batch_size=100, flush_interval=0.3)
+    for i in range(5):
+        writer.push_capped("logs:u1", str(i))
+    assert writer.stats()["dropped"] == 2
+
+    deadline = time.time() + 2
+    while writer.stats()["queue_depth"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert writer.stats()["written"] == 3
+    assert redis.data["logs:u1"] == ["2", "1", "0"]
+    writer.stop()
+
+def test_enqueue_does_not_wait_for_slow_redis():
+    redis = RecordingRedis(delay=0.2)
+    writer = RedisWriter(redis, batch_size=1, flush_interval=0.01)
+    start = time.perf_counter()
+    for i in range(50):
+        writer.push_capped("logs:u1", str(i))
+    assert time.perf_counter() - start < 0.1
+    writer.stop()
+    assert len(redis.data["logs:u1"]) == 50
+
+def test_analytics_counters_go_through_the_writer(monkeypatch):
+    monkeypatch.setattr(analytics_logger, "log_writer", None)
+    analytics_logger.increment_intent("greet")  # no Redis, nothing recorded
+
+    redis = RecordingRedis()
+    writer = RedisWriter(redis, batch_size=1000, flush_interval=60)
+    monkeypatch.setattr(analytics_logger, "log_writer", writer)
+    analytics_logger.increment_intent("greet")
+    analytics_logger.increment_intent("greet")
+    analytics_logger.increment_plugin_usage("weather")
+    writer.stop()
+    assert redis.data["analytics:intent_counts"] == {"greet": 2}
+    assert redis.data["analytics:plugin_usage"] == {"weather": 1}
+    assert writer.stats()["written"] == 2
@@ -0,0 +1,43 @@
+import asyncio
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from interfaces.middleware.logging import RequestLoggerMiddleware
+
+def make_app(entries):
+    app = FastAPI()
+
+    @app.post("/api/generate-reply")
+    async def generate_reply(request: Request):
+        payload = await request.json()
+        request.state.sender_id = payload["sender_id"]
+        if payload["message"] == "fail":
+            raise HTTPException(status_code=400, detail="bad message")
+        return {"reply": "ok"}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    app.add_middleware(RequestLoggerMiddleware, sink=entries.append)
+    return app
+
+async def post_all(app, requests):
+    transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 1234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [await client.request(method, path, json=body) for method, path, body in requests]
+
+def test_logs_reply_and_error_from_route_state():
+    entries = []
+    responses = asyncio.run(post_all(make_app(entries), [
+        ("POST", "/api/generate-reply", {"sender_id": "alice", "message": "hi"}),
+        ("POST", "/api/generate-reply", {"sender_id": "bob", "message": "fail"}),
+        ("GET", "/health", None),
+    ]))
+    assert [r.status_code for r in responses] == [200, 400, 200]
+    assert len(entries) == 2  # /health is not logged
+
+    ok, failed = entries
+    assert (ok["sender_id"], ok["event"], ok["ip"]) == ("alice", "reply_sent", "10.0.0.1")
+    assert isinstance(ok["duration_us"], int) and "error" not in ok
+    assert (failed["sender_id"], failed["event"], failed["status_code"]) == ("bob", "error", 400)
+    assert "bad message" in failed["error"]
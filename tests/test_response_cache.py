@@ -0,0 +1,44 @@
+from ai.assistant_engine.response_cache import ResponseCache
+
+VECTORS = {
+    "how do i reset my password": [1.0, 0.0, 0.0],
+    "how can i reset my password": [0.99, 0.1, 0.0],
+    "what is the refund policy": [0.0, 1.0, 0.0],
+}
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_cache(**kwargs):
+    return ResponseCache(embed_fn=lambda text: VECTORS.get(text, [0.0, 0.0, 1.0]), **kwargs)
+
+def test_exact_and_semantic_hits():
+    cache = make_cache(similarity_threshold=0.95)
+    cache.put("How do I reset my   password", "Use the reset link.", "RAG")
+    assert cache.get("how do i reset my password").reply == "Use the reset link."
+    assert cache.get("How can I reset my password").source == "RAG"
+    assert cache.get("What is the refund policy") is None
+    stats = cache.stats()
+    assert (stats["hits_exact"], stats["hits_semantic"], stats["misses"]) == (1, 1, 1)
+
+def test_ttl_expiry():
+    clock = Clock()
+    cache = make_cache(ttl=10, clock=clock)
+    cache.put("what is the refund policy", "30 days.", "LLM")
+    clock.now += 11
+    assert cache.get("what is the refund policy") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_lru_eviction():
+    cache = make_cache(max_entries=2)
+    cache.put("how do i reset my password", "a", "RAG")
+    cache.put("what is the refund policy", "b", "LLM")
+    cache.get("how do i reset my password")
+    cache.put("something else", "c", "LLM")
+    assert cache.get("what is the refund policy") is None
+    assert cache.get("how do i reset my password").reply == "a"
+    assert cache.stats()["evictions"] == 1
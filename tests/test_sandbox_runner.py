@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+import pytest
+from ai.plugins.sandbox_runner import SandboxPool, PLUGIN_TIMEOUT_REPLY, PLUGIN_NO_RESPONSE_REPLY
+
+PLUGINS = {
+    "echo": "import os\ndef handle(text):\n    return f'{os.getpid()}:{text}'\n",
+    "slow": "import time\ndef handle(text):\n    time.sleep(5)\n",
+    "crash": "import os\ndef handle(text):\n    os._exit(1)\n",
+    "broken": "def handle(text):\n    raise ValueError('bad input')\n",
+}
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    package = tmp_path / "sandbox_test_plugins"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    for name, source in PLUGINS.items():
+        (package / f"{name}.py").write_text(source)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    pool = SandboxPool(size=2, timeout=2, max_calls=3, module_prefix="sandbox_test_plugins")
+    yield pool
+    pool.shutdown()
+
+def test_workers_are_reused_and_recycled(pool):
+    pids = [pool.run("echo", "hi").split(":")[0] for _ in range(6)]
+    assert len(set(pids)) <= 4  # 2 workers, each replaced once after 3 calls
+    assert pool.stats()["recycled"] == 2
+    assert pool.stats()["plugins"]["echo"]["calls"] == 6
+
+def test_timeout_and_crash_replace_the_worker(pool):
+    assert pool.run("slow", "x", timeout=0.2) == PLUGIN_TIMEOUT_REPLY
+    assert pool.run("crash", "x") == PLUGIN_NO_RESPONSE_REPLY
+    assert pool.run("broken", "x").startswith("[PLUGIN ERROR] bad input")
+    assert pool.run("echo", "still works").endswith(":still works")
+    stats = pool.stats()
+    assert (stats["timeouts"], stats["crashes"], stats["idle"]) == (1, 1, 2)
+    assert stats["plugins"]["broken"]["errors"] == 1
+
+def test_async_calls_share_the_pool(pool):
+    async def main():
+        return await asyncio.gather(*(pool.arun("echo", str(i)) for i in range(4)))
+
+    replies = asyncio.run(main())
+    assert [r.split(":")[1] for r in replies] == ["0", "1", "2", "3"]
+
+def test_waiting_for_a_busy_pool_times_out(pool):
+    pool.start()
+    busy = [threading.Thread(target=pool.run, args=("slow", "x", 0.5)) for _ in range(2)]
+    for thread in busy:
+        thread.start()
+    time.sleep(0.1)
+    began = time.perf_counter()
+    assert pool.run("echo", "x", timeout=0.1) == PLUGIN_TIMEOUT_REPLY
+    assert time.perf_counter() - began < 0.4
+    for thread in busy:
+        thread.join()
+    stats = pool.stats()
+    assert (stats["queue_timeouts"], stats["timeouts"], stats["waiting"]) == (1, 2, 0)
+
+def test_dead_worker_is_not_reused_when_its_replacement_fails(pool, monkeypatch):
+    pool.start()
+    spawn = pool._spawn
+
+    def failing_spawn():
+        raise OSError("fork failed")
+
+    monkeypatch.setattr(pool, "_spawn", failing_spawn)
+    assert pool.run("crash", "x") == PLUGIN_NO_RESPONSE_REPLY
+    assert pool.stats()["idle"] == 1 and pool.stats()["workers"] == 1
+    for i in range(3):
+        assert pool.run("echo", str(i)).endswith(f":{i}")  # never handed the dead worker
+
+    monkeypatch.setattr(pool, "_spawn", spawn)
+    assert pool.run("echo", "x").endswith(":x")
+    stats = pool.stats()
+    assert stats["idle"] == 2 and stats["workers"] == 2 and stats["spawn_errors"] >= 1
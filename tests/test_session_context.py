@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from ai.memory import session_context
+from ai.memory.session_context import LocalContextStore, RedisContextStore
+from tests.fakes import FakeClock, FakeRedis
+
+class CountingRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+
+    def hgetall(self, key):
+        self.round_trips += 1
+        return super().hgetall(key)
+
+    def pipeline(self, transaction=True):
+        self.round_trips += 1
+        return super().pipeline(transaction)
+
+def test_batched_updates_write_once(monkeypatch):
+    redis = CountingRedis()
+    store = RedisContextStore(redis, clock=FakeClock())
+    monkeypatch.setattr(session_context, "context_store", store)
+
+    with session_context.batched_updates():
+        session_context.update_context("u1", "last_intent", "greet")
+        session_context.update_context("u1", "last_tone", None)
+        assert session_context.get_context("u1")["last_intent"] == "greet"
+        assert redis.round_trips == 1  # the read above; nothing written yet
+    assert redis.round_trips == 2
+    assert redis.data["user:u1:context"]["last_intent"] == "greet"
+    assert redis.data["user:u1:context"]["last_tone"] == ""
+    assert "u1" in redis.data["index:sessions"]
+
+def test_redis_reads_are_cached_briefly():
+    redis = CountingRedis()
+    clock = FakeClock()
+    store = RedisContextStore(redis, cache_ttl=2, clock=clock)
+    redis.data["user:u1:context"] = {b"last_intent": b"greet", b"last_updated": b"12.5"}
+
+    assert store.get("u1") == {"last_intent": "greet", "last_updated": 12.5}
+    store.get("u1")
+    assert redis.round_trips == 1
+    store.update("u1", {"last_intent": "bye"})
+    assert store.get("u1")["last_intent"] == "bye"  # own write visible without a read
+
+    clock.now = 3
+    store.get("u1")
+    assert redis.round_trips == 3
+    assert store.stats()["cache_hits"] == 2
+
+def test_local_store_returns_copies():
+    store = LocalContextStore(max_users=10, ttl=60)
+    store.update("u1", {"last_intent": "greet"})
+    store.get("u1")["last_intent"] = "changed"
+    assert store.get("u1") == {"last_intent": "greet"}
+    store.clear("u1")
+    assert store.get("u1") == {}
+
+class ThreadRecordingRedis(CountingRedis):
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def hgetall(self, key):
+        self.threads.append(threading.get_ident())
+        return super().hgetall(key)
+
+    def pipeline(self, transaction=True):
+        self.threads.append(threading.get_ident())
+        return super().pipeline(transaction)
+
+def test_async_batched_updates_run_off_the_event_loop(monkeypatch):
+    redis = ThreadRecordingRedis()
+    redis.data["user:u2:context"] = {b"last_tone": b"calm"}
+    monkeypatch.setattr(session_context, "context_store", RedisContextStore(redis, clock=FakeClock()))
+
+    async def request():
+        async with session_context.batched_updates_async():
+            session_context.update_context("u1", "last_intent", "greet")
+            session_context.update_context("u1", "last_tone", "calm")
+            assert redis.threads == []
+        return await session_context.get_context_async("u2"), threading.get_ident()
+
+    receiver, loop_thread = asyncio.run(request())
+    assert receiver == {"last_tone": "calm"}
+    assert redis.round_trips == 2 and loop_thread not in redis.threads  # one write, one read
+    assert redis.data["user:u1:context"]["last_intent"] == "greet"
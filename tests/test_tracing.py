@@ -0,0 +1,71 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from interfaces.api_server.core import tracing
+from interfaces.api_server.core.tracing import Histogram, annotate, span
+from interfaces.middleware.logging import RequestLoggerMiddleware
+
+def test_histogram_renders_prometheus_text():
+    histogram = Histogram("test_seconds", "Test histogram.", ("span",), buckets=(0.1, 1.0), register=False)
+    histogram.observe(0.05, "rag")
+    histogram.observe(0.5, "rag")
+    histogram.observe(3, 'say "hi"')
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP test_seconds Test histogram.", "# TYPE test_seconds histogram"]
+    assert 'test_seconds_bucket{span="rag",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{span="rag",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{span="rag",le="+Inf"} 2' in lines
+    assert 'test_seconds_count{span="rag"} 2' in lines
+    assert 'test_seconds_bucket{span="say \\"hi\\"",le="+Inf"} 1' in lines
+
+def test_spans_follow_the_request_across_tasks_and_threads():
+    async def handle():
+        trace, token = tracing.start_trace()
+        try:
+            with span("privacy"):
+                pass
+            with pytest.raises(ValueError):
+                with span("rasa"):
+                    raise ValueError("down")
+
+            def rag():
+                with span("rag"):
+                    return "doc"
+
+            await asyncio.gather(asyncio.to_thread(rag), asyncio.ensure_future(asyncio.sleep(0)))
+            annotate(intent="greet")
+        finally:
+            tracing.end_trace(token)
+        return trace
+
+    trace = asyncio.run(handle())
+    assert [(s["name"], s["status"]) for s in trace.as_dict()["spans"]] == [
+        ("privacy", "ok"), ("rasa", "error"), ("rag", "ok")]
+    assert trace.attrs == {"intent": "greet"}
+    assert tracing.current_trace() is None
+    assert tracing.span_seconds.snapshot()[("rasa", "error")]["count"] >= 1
+
+def test_request_log_gets_intent_and_trace():
+    entries = []
+    app = FastAPI()
+
+    @app.post("/api/generate-reply")
+    async def generate_reply(request: Request):
+        request.state.sender_id = "alice"
+        annotate(intent="greet", confidence=0.9)
+        with span("local"):
+            return {"reply": "hi"}
+
+    app.add_middleware(RequestLoggerMiddleware, sink=entries.append, trace_in_logs=True)
+
+    async def post():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/generate-reply", json={})
+
+    assert asyncio.run(post()).status_code == 200
+    entry = entries[0]
+    assert (entry["intent"], entry["confidence"]) == ("greet", 0.9)
+    assert [s["name"] for s in entry["trace"]["spans"]] == ["local"]
+    assert 'rtca_request_seconds_count{path="/api/generate-reply",status_code="200"}' in tracing.render_metrics()
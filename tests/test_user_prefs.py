@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from interfaces.api_server.core.user_prefs import ASSIST_FIELD, LEGACY_MIGRATED_KEY, PreferenceStore, plugin_field
+from tests.fakes import FakeClock, FakeRedis
+
+class PubSubRedis(FakeRedis):
+    """FakeRedis with GET and a pub/sub that delivers to every subscribed store."""
+
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+        self.handlers = []
+
+    def pipeline(self, transaction=True):
+        self.round_trips += 1
+        return super().pipeline(transaction)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def publish(self, channel, message):
+        for handler in self.handlers:
+            handler({"channel": channel, "data": message.encode()})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def subscribe(self, **handlers):
+        self.redis.handlers.extend(handlers.values())
+
+    def run_in_thread(self, sleep_time=0, daemon=False):
+        return self
+
+    def stop(self):
+        pass
+
+def test_snapshot_is_one_round_trip_and_cached():
+    redis = PubSubRedis()
+    clock = FakeClock()
+    store = PreferenceStore(redis, cache_ttl=5, clock=clock)
+    redis.data["user:u1:prefs"] = {b"assist_enabled": b"0", b"plugin:hello": b"1"}
+
+    assert store.get("u1", ASSIST_FIELD, True) is False
+    assert store.get("u1", plugin_field("hello")) is True
+    assert store.get("u1", plugin_field("other")) is False
+    assert redis.round_trips == 1
+
+    clock.now = 6
+    store.get("u1", ASSIST_FIELD, True)
+    assert redis.round_trips == 2
+
+def test_toggle_in_one_worker_invalidates_the_others():
+    redis = PubSubRedis()
+    worker_a = PreferenceStore(redis, cache_ttl=60, clock=FakeClock())
+    worker_b = PreferenceStore(redis, cache_ttl=60, clock=FakeClock())
+    assert worker_b.get("u1", plugin_field("hello")) is False
+
+    worker_a.set_pref("u1", plugin_field("hello"), True)
+    assert worker_b.get("u1", plugin_field("hello")) is True
+    assert worker_b.stats()["invalidations"] == 1
+
+def test_legacy_assist_key_and_memory_backend():
+    redis = PubSubRedis()
+    redis.data["user:u2:assist_enabled"] = b"0"
+    assert PreferenceStore(redis).get("u2", ASSIST_FIELD, True) is False
+
+    local = PreferenceStore(None)
+    assert local.get("u1", ASSIST_FIELD, True) is True
+    local.set_pref("u1", ASSIST_FIELD, False)
+    assert local.get("u1", ASSIST_FIELD, True) is False
+
+def test_legacy_plugin_keys_are_migrated_once():
+    redis = PubSubRedis()
+    redis.data.update({"plugin:u1:hello": b"1", "plugin:u1:weather": b"0", "plugin:u2:hello": b"1",
+                       "user:u2:prefs": {"plugin:hello": "0"}})
+    store = PreferenceStore(redis)
+    assert store.get("u1", plugin_field("hello")) is False  # cached before the migration
+
+    assert store.migrate_legacy_plugin_keys() == 3
+    assert store.get("u1", plugin_field("hello")) is True
+    assert store.get("u1", plugin_field("weather"), True) is False
+    assert store.get("u2", plugin_field("hello")) is False  # set through the hash since
+    assert redis.data[LEGACY_MIGRATED_KEY] == "1"
+
+    redis.data["plugin:u3:hello"] = b"1"
+    assert store.migrate_legacy_plugin_keys() == 0
+
+def test_async_get_fetches_off_the_event_loop():
+    class ThreadRecordingRedis(PubSubRedis):
+        def hgetall(self, key):
+            fetch_threads.append(threading.get_ident())
+            return super().hgetall(key)
+
+    fetch_threads = []
+    redis = ThreadRecordingRedis()
+    redis.data["user:u1:prefs"] = {"plugin:hello": "1"}
+    store = PreferenceStore(redis, cache_ttl=60, clock=FakeClock())
+
+    async def check():
+        first = await store.get_async("u1", plugin_field("hello"))
+        second = await store.get_async("u1", plugin_field("hello"))  # cached, no thread hop
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(check())
+    assert first is second is True
+    assert len(fetch_threads) == 1 and fetch_threads[0] != loop_thread
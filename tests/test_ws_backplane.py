@@ -0,0 +1,131 @@
+import asyncio
+from interfaces.socket_layer.backplane import LocalBackplane, RedisBackplane
+from interfaces.socket_layer.hub import ConnectionHub
+from tests.fakes import FakeClock, FakeRedis, FakeWebSocket, settle
+
+class BrokerRedis(FakeRedis):
+    """FakeRedis shared by several workers: sorted-set range reads and per-channel pub/sub."""
+
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+        self.published = []
+        self.channels = {}
+
+    def pipeline(self, transaction=True):
+        self.round_trips += 1
+        return super().pipeline(transaction)
+
+    def zrangebyscore(self, key, low, high):
+        ranked = sorted(self.data.get(key, {}).items(), key=lambda x: x[1])
+        return [member.encode() for member, score in ranked if float(low) <= score <= float(high)]
+
+    def publish(self, channel, message):
+        self.published.append(channel)
+        for handler in self.channels.get(channel, ()):
+            handler({"channel": channel.encode(), "data": message.encode()})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def subscribe(self, **handlers):
+        for channel, handler in handlers.items():
+            self.redis.channels.setdefault(channel, []).append(handler)
+
+    def run_in_thread(self, sleep_time=0, daemon=False):
+        return self
+
+    def stop(self):
+        pass
+
+async def wait_for_flush(*backplanes):
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+        if all(b._flusher is None and not b._pending for b in backplanes):
+            break
+    await settle()
+
+def test_messages_reach_the_worker_holding_the_socket():
+    async def scenario():
+        redis = BrokerRedis()
+        hub_a, hub_b = ConnectionHub(ping_interval=0), ConnectionHub(ping_interval=0)
+        a = RedisBackplane(redis, hub_a, worker_id="a", publish_interval=0.005)
+        b = RedisBackplane(redis, hub_b, worker_id="b", publish_interval=0.005)
+        await a.start()
+        await b.start()
+        alice, also_alice = FakeWebSocket(), FakeWebSocket()
+        await hub_a.register(alice, "alice", "bob")
+        await hub_b.register(also_alice, "alice", "carol")
+        await wait_for_flush(a, b)
+        assert sorted(await b.online_workers("alice")) == ["a", "b"]
+
+        redis.round_trips = 0
+        assert b.send_to_peer("alice", "bob", "one") == 0  # alice's bob socket lives on worker a
+        b.send_to_peer("alice", "bob", "two")
+        assert b.send_to_user("alice", "everywhere") == 1
+        b.send_to_user("nobody", "lost")
+        await wait_for_flush(a, b)
+        round_trips, published = redis.round_trips, list(redis.published)
+
+        await a.stop()
+        await b.stop()
+        return alice, also_alice, round_trips, published, a.stats(), b.stats(), redis
+
+    alice, also_alice, round_trips, published, a_stats, b_stats, redis = asyncio.run(scenario())
+    assert alice.sent == ["one", "two", "everywhere"]
+    assert also_alice.sent == ["everywhere"]  # delivered locally, not published back to b
+    # One lookup pipeline and one publish pipeline; the three messages for a go as one PUBLISH
+    assert round_trips == 2 and published == ["ws:worker:a"]
+    assert b_stats["published"] == 3 and b_stats["undeliverable"] == 1
+    assert a_stats["received"] == 3 and a_stats["delivered"] == 3
+    assert redis.data["ws:presence:alice"] == {}  # both workers withdrew on stop
+
+def test_presence_follows_sockets_and_expires():
+    async def scenario():
+        redis, clock = BrokerRedis(), FakeClock()
+        clock.now = 1000.0
+        hub = ConnectionHub(ping_interval=0)
+        worker = RedisBackplane(redis, hub, worker_id="a", presence_ttl=30, heartbeat=3600, clock=clock)
+        await worker.start()
+        ws = FakeWebSocket()
+        connection = await hub.register(ws, "alice")
+        await wait_for_flush(worker)
+        online = await worker.online_workers("alice")
+
+        # A crashed worker's entry stops counting once its expiry passes, and the refresh drops it
+        redis.zadd("ws:presence:alice", {"crashed": 1010.0})
+        clock.now += 20
+        seen_later = await worker.online_workers("alice")
+        worker._refresh_presence(hub.users())
+        refreshed = dict(redis.data["ws:presence:alice"])
+
+        hub.unregister(connection)
+        await wait_for_flush(worker)
+        offline = await worker.online_workers("alice")
+        await worker.stop()
+        return online, seen_later, refreshed, offline
+
+    online, seen_later, refreshed, offline = asyncio.run(scenario())
+    assert online == ["a"]
+    assert seen_later == ["a"]
+    assert refreshed == {"a": 1050.0}
+    assert offline == []
+
+def test_local_backplane_delivers_in_process():
+    async def scenario():
+        hub = ConnectionHub(ping_interval=0)
+        local = LocalBackplane(hub, worker_id="solo")
+        ws = FakeWebSocket()
+        await hub.register(ws, "alice", "bob")
+        counts = (local.send_to_peer("alice", "bob", "hi"), local.send_to_user("nobody", "lost"))
+        online = (await local.online_workers("alice"), await local.online_workers("nobody"))
+        await settle()
+        return ws.sent, counts, online
+
+    sent, counts, online = asyncio.run(scenario())
+    assert sent == ["hi"] and counts == (1, 0)
+    assert online == (["solo"], [])
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from interfaces.socket_layer.hub import CLOSE_GOING_AWAY, CLOSE_TRY_AGAIN_LATER, ConnectionHub
+from tests.fakes import FakeWebSocket, settle
+
+def test_receives_while_computing_and_replies_in_order():
+    async def scenario():
+        hub = ConnectionHub(ping_interval=0)
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(connection, message):
+            if message == "slow":
+                await release.wait()
+            handled.append(message)
+            connection.send(f"re:{message}")
+
+        ws = FakeWebSocket()
+        serving = asyncio.ensure_future(hub.serve(ws, "alice", "bob", handler))
+        await ws.incoming.put("slow")
+        await ws.incoming.put('{"type": "pong"}')
+        await ws.incoming.put("fast")
+        await settle()
+        assert ws.incoming.empty() and handled == []  # all read while "slow" is still computing
+        release.set()
+        await settle()
+        await ws.incoming.put(None)
+        await serving
+        return ws.sent, hub.stats()
+
+    sent, stats = asyncio.run(scenario())
+    assert sent == ["re:slow", "re:fast"]
+    assert stats["connections"] == 0 and stats["closed"] == 1
+
+def test_slow_consumer_is_evicted():
+    async def scenario():
+        hub = ConnectionHub(send_queue_size=3, ping_interval=0)
+        ws = FakeWebSocket()
+        ws.send_gate.clear()
+        connection = await hub.register(ws, "alice")
+        accepted = [connection.send(f"frame {i}") for i in range(6)]
+        await settle()
+        return accepted, ws.close_code, hub.stats()
+
+    accepted, close_code, stats = asyncio.run(scenario())
+    # Three frames fill the outbox (the client reads none of them), the fourth overflows
+    assert accepted == [True, True, True, False, False, False]
+    assert close_code == CLOSE_TRY_AGAIN_LATER
+    assert stats["evicted_slow_consumer"] == 1 and stats["connections"] == 0
+
+def test_fan_out_heartbeat_and_per_user_limit():
+    async def scenario():
+        hub = ConnectionHub(max_per_user=2, ping_interval=10, pong_timeout=5)
+        phone, laptop, third = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        a = await hub.register(phone, "alice", "bob")
+        b = await hub.register(laptop, "alice", "carol")
+        assert await hub.register(third, "alice") is None
+        assert hub.send_to_user("alice", "hello") == 2
+        assert hub.send_to_peer("alice", "carol", "only laptop") == 1
+        await settle()
+
+        a.last_seen = 100.0
+        b.last_seen = 104.0
+        assert hub.sweep(now=116.0) == 1  # phone silent for 16s > 10 + 5, laptop gets pinged
+        await settle()
+        await hub.shutdown()
+        return phone, laptop, third, hub.stats()
+
+    phone, laptop, third, stats = asyncio.run(scenario())
+    assert third.close_code == CLOSE_TRY_AGAIN_LATER and stats["rejected"] == 1
+    assert phone.sent == ["hello"] and phone.close_code == CLOSE_GOING_AWAY
+    assert laptop.sent == ["hello", "only laptop", json.dumps({"type": "ping"})]
+    assert stats["evicted_heartbeat"] == 1 and stats["connections"] == 0